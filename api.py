@@ -0,0 +1,226 @@
+"""HTTP API for the CV Analyzer.
+
+Exposes jobs, applications, submission and rankings over ASGI, reusing the data
+functions and analysis pipeline from app.py. Run with:
+
+    uvicorn api:app --host 0.0.0.0 --port 8000 --workers 1
+
+Submissions are accepted immediately (202) with a tracking ID; the CV is analyzed
+on a background worker pool and the outcome can be polled at /submissions/{tracking_id}.
+Set API_KEY to require an X-API-Key header on every request except /health.
+"""
+import base64
+import contextlib
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+import app as cv_analyzer
+
+API_KEY = os.getenv("API_KEY")
+SUBMISSION_WORKERS = int(os.getenv("API_SUBMISSION_WORKERS", "8"))
+MAX_RANKINGS = 100
+
+# Replaced by the load test with a stub client factory
+client_factory = cv_analyzer.get_groq_client
+
+submission_executor = ThreadPoolExecutor(max_workers=SUBMISSION_WORKERS, thread_name_prefix="submission")
+
+
+def error(status_code, message):
+    return JSONResponse({'error': message}, status_code=status_code)
+
+
+def int_param(value):
+    """Parse an integer query/path parameter, returning None if it is missing or invalid."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def store_upload(encoded: str) -> str:
+    """Decode a base64 upload into the blob store; returns its key."""
+    return cv_analyzer.store_blob(io.BytesIO(base64.b64decode(encoded, validate=True)), 'application/pdf')[0]
+
+
+async def health(request):
+    return JSONResponse({'status': 'ok'})
+
+
+async def list_jobs(request):
+    return JSONResponse(await run_in_threadpool(cv_analyzer.get_all_jobs))
+
+
+async def get_job(request):
+    job = await run_in_threadpool(cv_analyzer.get_job_by_id, request.path_params['job_id'])
+    if not job:
+        return error(404, "Job not found")
+    return JSONResponse(job)
+
+
+async def job_rankings(request):
+    job_id = request.path_params['job_id']
+    limit = int_param(request.query_params.get('limit', 20))
+    if limit is None or not 1 <= limit <= MAX_RANKINGS:
+        return error(400, f"limit must be between 1 and {MAX_RANKINGS}")
+    if not await run_in_threadpool(cv_analyzer.get_job_by_id, job_id):
+        return error(404, "Job not found")
+    return JSONResponse(await run_in_threadpool(cv_analyzer.get_job_rankings, job_id, limit))
+
+
+async def list_applications(request):
+    hr_id = int_param(request.query_params.get('hr_id'))
+    if hr_id is None:
+        return error(400, "hr_id is required")
+    return JSONResponse(await run_in_threadpool(cv_analyzer.get_applications_for_hr, hr_id))
+
+
+def float_param(value, default=None):
+    """Parse a float query parameter, returning default if it is missing and None if it is invalid."""
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+async def shortlist(request):
+    params = request.query_params
+    hr_id = int_param(params.get('hr_id'))
+    if hr_id is None:
+        return error(400, "hr_id is required")
+    k = int_param(params.get('k', 20))
+    if k is None or not 1 <= k <= MAX_RANKINGS:
+        return error(400, f"k must be between 1 and {MAX_RANKINGS}")
+    job_ids = [int_param(job_id) for job_id in params.getlist('job_id')]
+    weights = {name: float_param(params.get(f"w_{name}"), default)
+               for name, default in (('match', 1.0), ('skills', 0.0), ('experience', 0.0))}
+    min_skills = float_param(params.get('min_skills'), 0.0)
+    min_experience = float_param(params.get('min_experience'), 0.0)
+    if None in job_ids or None in weights.values() or min_skills is None or min_experience is None:
+        return error(400, "job_id must be an integer; weights and minimum scores must be numbers")
+    return JSONResponse(await run_in_threadpool(cv_analyzer.get_shortlist, hr_id, job_ids or None, k, weights,
+                                                min_skills, min_experience))
+
+
+async def submit_application(request):
+    try:
+        payload = await request.json()
+    except ValueError:
+        return error(400, "Request body must be JSON")
+    if not isinstance(payload, dict):
+        return error(400, "Request body must be a JSON object")
+
+    job_id = int_param(payload.get('job_id'))
+    candidate_id = int_param(payload.get('candidate_id'))
+    if job_id is None or candidate_id is None:
+        return error(400, "job_id and candidate_id are required")
+
+    cv_text = payload.get('cv_text')
+    cv_base64 = payload.get('cv_base64')
+    if cv_text is not None and not isinstance(cv_text, str):
+        return error(400, "cv_text must be a string")
+    if cv_base64 is not None and not isinstance(cv_base64, str):
+        return error(400, "cv_base64 must be a base64 string")
+    if not (cv_text and cv_text.strip()) and not cv_base64:
+        return error(400, "cv_text or cv_base64 (PDF) is required")
+
+    applicant_info = payload.get('applicant') or {}
+    if not isinstance(applicant_info, dict):
+        return error(400, "applicant must be a JSON object")
+
+    # get_job_by_id only returns active jobs, so closed postings are rejected here too
+    job = await run_in_threadpool(cv_analyzer.get_job_by_id, job_id)
+    if not job:
+        return error(404, "Job not found")
+    if not await run_in_threadpool(cv_analyzer.get_user_by_id, candidate_id):
+        return error(404, "Candidate not found")
+
+    # An uploaded PDF is stored as is; its text is extracted later by the submission worker
+    cv_blob = None
+    if not (cv_text and cv_text.strip()):
+        cv_text = None
+        try:
+            cv_blob = await run_in_threadpool(store_upload, cv_base64)
+        except ValueError as e:
+            return error(400, f"Could not store CV: {str(e)}")
+
+    tracking_id = await run_in_threadpool(cv_analyzer.create_submission, job_id, candidate_id)
+    submission_executor.submit(cv_analyzer.run_submission, tracking_id, job, candidate_id, cv_text,
+                               applicant_info, client_factory(), cv_blob)
+    return JSONResponse({'tracking_id': tracking_id, 'status': 'queued',
+                         'status_url': f"/submissions/{tracking_id}"}, status_code=202)
+
+
+async def generate_content(request):
+    try:
+        payload = await request.json()
+    except ValueError:
+        return error(400, "Request body must be JSON")
+    if not isinstance(payload, dict):
+        return error(400, "Request body must be a JSON object")
+
+    hr_id = int_param(payload.get('hr_id'))
+    application_ids = payload.get('application_ids')
+    if hr_id is None or not isinstance(application_ids, list) or not application_ids:
+        return error(400, "hr_id and a list of application_ids are required")
+    application_ids = [int_param(application_id) for application_id in application_ids]
+    if None in application_ids or len(application_ids) > MAX_RANKINGS:
+        return error(400, f"application_ids must be at most {MAX_RANKINGS} integers")
+
+    content, stats = await run_in_threadpool(cv_analyzer.generate_candidate_content, hr_id, application_ids,
+                                             client_factory(), None, bool(payload.get('refresh')))
+    return JSONResponse({'content': {str(application_id): values for application_id, values in content.items()},
+                         'stats': stats})
+
+
+async def get_submission(request):
+    submission = await run_in_threadpool(cv_analyzer.get_submission, request.path_params['tracking_id'])
+    if not submission:
+        return error(404, "Submission not found")
+    return JSONResponse(submission)
+
+
+class APIKeyMiddleware:
+    """Reject requests without the configured X-API-Key header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and API_KEY and scope['path'] != '/health':
+            headers = dict(scope['headers'])
+            if headers.get(b'x-api-key', b'').decode() != API_KEY:
+                await error(401, "Invalid or missing API key")(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(asgi_app):
+    cv_analyzer.init_database()
+    yield
+    submission_executor.shutdown(wait=True)
+
+
+routes = [
+    Route('/health', health),
+    Route('/jobs', list_jobs),
+    Route('/jobs/{job_id:int}', get_job),
+    Route('/jobs/{job_id:int}/rankings', job_rankings),
+    Route('/applications', list_applications),
+    Route('/shortlist', shortlist),
+    Route('/applications', submit_application, methods=['POST']),
+    Route('/applications/content', generate_content, methods=['POST']),
+    Route('/submissions/{tracking_id}', get_submission),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan)
+app.add_middleware(APIKeyMiddleware)
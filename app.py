@@ -2,29 +2,44 @@ import streamlit as st
 import os
 from dotenv import load_dotenv
 import tempfile
-import pandas as pd
-import PyPDF2
 import time
 import re
 import datetime
-from dateutil import parser
-from dateutil.relativedelta import relativedelta
 import json
-import plotly.express as px
-import plotly.graph_objects as go
-from groq import Groq
 import sqlite3
+import contextlib
+import csv
 import hashlib
+import heapq
+import importlib.util
+import io
+import math
+import mmap
+import random
+import shutil
+import subprocess
+import sys
+import threading
 import uuid
-from typing import Dict, List, Optional
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 # Load environment variables
 load_dotenv()
 
+DB_PATH = os.getenv("CV_ANALYZER_DB", "cv_analyzer.db")
+
 # Updated Database setup function with better error handling
-def init_database():
-    """Initialize SQLite database with necessary tables and handle migrations."""
-    conn = sqlite3.connect('cv_analyzer.db')
+def init_database(require_unique_applications: bool = True):
+    """Initialize SQLite database with necessary tables and handle migrations.
+
+    Databases holding duplicate applications raise RuntimeError until `python cli.py dedupe-applications`
+    has removed them; that command calls this with require_unique_applications=False.
+    """
+    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
     try:
@@ -54,6 +69,8 @@ def init_database():
                 created_by INTEGER,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 is_active BOOLEAN DEFAULT 1,
+                external_id TEXT,
+                terms_indexed BOOLEAN DEFAULT 0,
                 FOREIGN KEY (created_by) REFERENCES users (id)
             )
         ''')
@@ -81,10 +98,251 @@ def init_database():
                 current_salary TEXT,
                 expected_salary TEXT,
                 total_experience TEXT,
+                -- Set once cv_text and analysis_result have moved to the archive database
+                archived_at TIMESTAMP,
+                -- Earlier application from another account with a near-identical CV
+                duplicate_of INTEGER,
+                duplicate_similarity REAL,
+                -- SHA-256 of the uploaded CV file in the blob store
+                cv_blob TEXT,
+                FOREIGN KEY (job_id) REFERENCES jobs (id),
+                FOREIGN KEY (candidate_id) REFERENCES users (id)
+            )
+        ''')
+        
+        # Inverted index of precomputed job term vectors for recommendations
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS job_terms (
+                term TEXT NOT NULL,
+                job_id INTEGER NOT NULL,
+                weight REAL NOT NULL,
+                PRIMARY KEY (term, job_id),
+                FOREIGN KEY (job_id) REFERENCES jobs (id)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_job_terms_job ON job_terms (job_id)')
+        
+        # Candidate term vectors built from their most recent CV
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS candidate_vectors (
+                candidate_id INTEGER PRIMARY KEY,
+                vector TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (candidate_id) REFERENCES users (id)
+            )
+        ''')
+        
+        # MinHash signatures of submitted CVs and their LSH band buckets for near-duplicate lookup
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cv_signatures (
+                application_id INTEGER PRIMARY KEY,
+                job_id INTEGER,
+                candidate_id INTEGER,
+                signature BLOB NOT NULL,
+                work_experience TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (application_id) REFERENCES applications (id)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cv_lsh_buckets (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                application_id INTEGER NOT NULL,
+                PRIMARY KEY (band, bucket, application_id)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Uploaded CV files in the content-addressed blob store, with the number of applications using each
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cv_blobs (
+                sha256 TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                content_type TEXT,
+                refcount INTEGER NOT NULL DEFAULT 0,
+                stored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) WITHOUT ROWID
+        ''')
+        
+        # Status and score changes of applications, recorded by a trigger, for live dashboard deltas
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS application_changes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                application_id INTEGER NOT NULL,
+                job_id INTEGER,
+                old_status TEXT,
+                new_status TEXT,
+                old_score REAL,
+                new_score REAL,
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # OCR text of scanned PDF pages, keyed by the SHA-256 of the rendered page
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ocr_cache (
+                page_hash TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                seconds REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) WITHOUT ROWID
+        ''')
+        
+        # Generated interview questions and candidate feedback, one row per application, kind and prompt version
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS generated_content (
+                application_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                content TEXT NOT NULL,
+                model TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (application_id, kind, prompt_version),
+                FOREIGN KEY (application_id) REFERENCES applications (id)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Per job and score dimension KLL sketches of all application scores, for percentiles
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS score_sketches (
+                job_id INTEGER NOT NULL,
+                dimension TEXT NOT NULL,
+                sketch TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (job_id, dimension),
+                FOREIGN KEY (job_id) REFERENCES jobs (id)
+            ) WITHOUT ROWID
+        ''')
+        # Sampled call stacks of profiled page runs, the latest PROFILE_KEEP per page
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS page_profiles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                page TEXT NOT NULL,
+                user_id INTEGER,
+                duration_ms REAL NOT NULL,
+                samples INTEGER NOT NULL,
+                stacks TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_page_profiles_page ON page_profiles (page, id)')
+        
+        # LLM usage - one row per Groq call (or local fallback) with tokens, latency and cost
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS llm_usage (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                application_id INTEGER,
+                job_id INTEGER,
+                hr_id INTEGER,
+                candidate_id INTEGER,
+                call_type TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_tokens INTEGER DEFAULT 0,
+                completion_tokens INTEGER DEFAULT 0,
+                total_tokens INTEGER DEFAULT 0,
+                latency_ms REAL DEFAULT 0,
+                queue_ms REAL DEFAULT 0,
+                cost_usd REAL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (application_id) REFERENCES applications (id),
                 FOREIGN KEY (job_id) REFERENCES jobs (id),
+                FOREIGN KEY (hr_id) REFERENCES users (id),
                 FOREIGN KEY (candidate_id) REFERENCES users (id)
             )
         ''')
+        cursor.execute("PRAGMA table_info(llm_usage)")
+        if 'queue_ms' not in [column[1] for column in cursor.fetchall()]:
+            cursor.execute('ALTER TABLE llm_usage ADD COLUMN queue_ms REAL DEFAULT 0')
+            print("Added missing column: queue_ms to llm_usage table")
+            for view in ('llm_usage_by_application', 'llm_usage_by_job', 'llm_usage_by_hr', 'llm_usage_by_day'):
+                cursor.execute(f'DROP VIEW IF EXISTS {view}')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_usage_hr_created ON llm_usage (hr_id, created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_usage_job ON llm_usage (job_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_usage_application ON llm_usage (application_id)')
+        
+        # Aggregate usage views
+        usage_columns = '''
+            COUNT(*) AS calls,
+            SUM(CASE WHEN model = 'local' THEN 0 ELSE 1 END) AS llm_calls,
+            SUM(prompt_tokens) AS prompt_tokens,
+            SUM(completion_tokens) AS completion_tokens,
+            SUM(total_tokens) AS total_tokens,
+            SUM(latency_ms) AS latency_ms,
+            SUM(queue_ms) AS queue_ms,
+            SUM(cost_usd) AS cost_usd
+        '''
+        cursor.execute(f'''
+            CREATE VIEW IF NOT EXISTS llm_usage_by_application AS
+            SELECT application_id, job_id, hr_id, {usage_columns}
+            FROM llm_usage WHERE application_id IS NOT NULL
+            GROUP BY application_id
+        ''')
+        cursor.execute(f'''
+            CREATE VIEW IF NOT EXISTS llm_usage_by_job AS
+            SELECT job_id, hr_id, COUNT(DISTINCT application_id) AS applications, {usage_columns}
+            FROM llm_usage
+            GROUP BY job_id
+        ''')
+        cursor.execute(f'''
+            CREATE VIEW IF NOT EXISTS llm_usage_by_hr AS
+            SELECT hr_id, COUNT(DISTINCT application_id) AS applications, {usage_columns}
+            FROM llm_usage
+            GROUP BY hr_id
+        ''')
+        cursor.execute(f'''
+            CREATE VIEW IF NOT EXISTS llm_usage_by_day AS
+            SELECT hr_id, DATE(created_at) AS day, COUNT(DISTINCT application_id) AS applications, {usage_columns}
+            FROM llm_usage
+            GROUP BY hr_id, DATE(created_at)
+        ''')
+        
+        # Model cascade decisions, one row per cascaded application
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cascade_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                application_id INTEGER,
+                job_id INTEGER,
+                first_tier TEXT NOT NULL,
+                first_score REAL,
+                escalated INTEGER NOT NULL,
+                final_model TEXT,
+                first_latency_ms REAL,
+                escalation_latency_ms REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (application_id) REFERENCES applications (id),
+                FOREIGN KEY (job_id) REFERENCES jobs (id)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_cascade_runs_job ON cascade_runs (job_id)')
+        
+        # Asynchronous submissions made through the HTTP API
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS submissions (
+                tracking_id TEXT PRIMARY KEY,
+                job_id INTEGER,
+                candidate_id INTEGER,
+                status TEXT NOT NULL,
+                application_id INTEGER,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (job_id) REFERENCES jobs (id),
+                FOREIGN KEY (candidate_id) REFERENCES users (id),
+                FOREIGN KEY (application_id) REFERENCES applications (id)
+            )
+        ''')
+        
+        # Per-HR LLM budgets (NULL means use the environment default)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS llm_budgets (
+                hr_id INTEGER PRIMARY KEY,
+                daily_limit_usd REAL,
+                monthly_limit_usd REAL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (hr_id) REFERENCES users (id)
+            )
+        ''')
         
         # Handle existing database migration
         # Check for missing columns and add them
@@ -104,7 +362,11 @@ def init_database():
             ('applicant_phone', 'TEXT'),
             ('current_salary', 'TEXT'),
             ('expected_salary', 'TEXT'),
-            ('total_experience', 'TEXT')
+            ('total_experience', 'TEXT'),
+            ('archived_at', 'TIMESTAMP'),
+            ('duplicate_of', 'INTEGER'),
+            ('duplicate_similarity', 'REAL'),
+            ('cv_blob', 'TEXT')
         ]
         
         # Add missing columns
@@ -137,6 +399,95 @@ def init_database():
                 if "duplicate column name" not in str(e):
                     print(f"Warning: Could not add is_active column: {e}")
         
+        if 'external_id' not in existing_job_columns:
+            try:
+                cursor.execute('ALTER TABLE jobs ADD COLUMN external_id TEXT')
+                print("Added missing column: external_id to jobs table")
+            except sqlite3.OperationalError as e:
+                if "duplicate column name" not in str(e):
+                    print(f"Warning: Could not add external_id column: {e}")
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_external_id ON jobs (external_id)
+            WHERE external_id IS NOT NULL
+        ''')
+        
+        if 'terms_indexed' not in existing_job_columns:
+            try:
+                cursor.execute('ALTER TABLE jobs ADD COLUMN terms_indexed BOOLEAN DEFAULT 0')
+                cursor.execute('UPDATE jobs SET terms_indexed = 1 WHERE id IN (SELECT DISTINCT job_id FROM job_terms)')
+                print("Added missing column: terms_indexed to jobs table")
+            except sqlite3.OperationalError as e:
+                if "duplicate column name" not in str(e):
+                    print(f"Warning: Could not add terms_indexed column: {e}")
+        # Jobs still waiting for a term vector, so the startup check below is a single index probe
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_terms_pending ON jobs (id) WHERE terms_indexed = 0')
+        
+        # Paged application table: HR jobs and their applications by date
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_created_by ON jobs (created_by)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_applications_job_applied ON applications (job_id, applied_at)')
+        
+        # Covering index for per-job top-K shortlists
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_applications_job_score
+            ON applications (job_id, match_score DESC, skills_score, experience_score)
+        ''')
+        
+        # Applications still holding their blobs, for the archiver
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_applications_unarchived_applied ON applications (applied_at)
+            WHERE archived_at IS NULL
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_applications_unarchived_job ON applications (job_id)
+            WHERE archived_at IS NULL
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_applications_changed
+            AFTER UPDATE OF status, match_score ON applications
+            WHEN OLD.status IS NOT NEW.status OR OLD.match_score IS NOT NEW.match_score
+            BEGIN
+                INSERT INTO application_changes (application_id, job_id, old_status, new_status, old_score, new_score)
+                VALUES (NEW.id, NEW.job_id, OLD.status, NEW.status, OLD.match_score, NEW.match_score);
+            END
+        ''')
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_applications_release_blob
+            AFTER DELETE ON applications
+            WHEN OLD.cv_blob IS NOT NULL
+            BEGIN
+                UPDATE cv_blobs SET refcount = refcount - 1 WHERE sha256 = OLD.cv_blob;
+            END
+        ''')
+        
+        # One application per candidate and job; duplicates are rejected with ON CONFLICT, so the
+        # index must exist. Databases from before it may hold duplicates, which are never deleted here
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_applications_job_candidate'")
+        if cursor.fetchone() is None:
+            duplicates = count_duplicate_applications(cursor)
+            if not duplicates:
+                cursor.execute('''
+                    CREATE UNIQUE INDEX idx_applications_job_candidate ON applications (job_id, candidate_id)
+                ''')
+            elif require_unique_applications:
+                raise RuntimeError(f"The database holds {duplicates} duplicate applications (same job and candidate). "
+                                   "Run `python cli.py dedupe-applications --dry-run` to review them, then "
+                                   "`python cli.py dedupe-applications` to remove them.")
+        
+        # Sketch the scores of databases that have applications but no sketches yet (needs the score columns above)
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM applications), EXISTS (SELECT 1 FROM score_sketches)')
+        has_applications, has_sketches = cursor.fetchone()
+        if has_applications and not has_sketches:
+            built = build_score_sketches(cursor)
+            print(f"Built score sketches for {built} existing jobs")
+        
+        # Index jobs created before recommendations existed, or bulk imported
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM jobs WHERE terms_indexed = 0)')
+        if cursor.fetchone()[0]:
+            indexed = index_missing_job_terms(cursor)
+            print(f"Built term vectors for {indexed} jobs")
+        
         conn.commit()
         print("Database initialization completed successfully!")
         
@@ -147,6 +498,72 @@ def init_database():
     finally:
         conn.close()
 
+def count_duplicate_applications(cursor) -> int:
+    """Number of applications that repeat an earlier one for the same job and candidate."""
+    cursor.execute('''
+        SELECT COALESCE(SUM(copies - 1), 0) FROM (
+            SELECT COUNT(*) AS copies FROM applications GROUP BY job_id, candidate_id HAVING COUNT(*) > 1
+        )
+    ''')
+    return cursor.fetchone()[0]
+
+def dedupe_applications(dry_run: bool = False) -> Dict:
+    """Keep the earliest application of each (job, candidate) pair and add the unique application index.
+
+    References to a removed application (submissions, duplicate_of, LLM usage) move to the kept one;
+    its derived rows and archived copy are deleted and the affected jobs' score sketches rebuilt.
+    With dry_run nothing is changed. Returns the duplicates found and the jobs they belong to.
+    """
+    init_database(require_unique_applications=False)
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            CREATE TEMP TABLE duplicate_applications AS
+            SELECT a.id, a.job_id, k.keep_id FROM applications a
+            JOIN (
+                SELECT job_id, candidate_id, MIN(id) AS keep_id FROM applications
+                GROUP BY job_id, candidate_id HAVING COUNT(*) > 1
+            ) k ON k.job_id = a.job_id AND k.candidate_id = a.candidate_id
+            WHERE a.id <> k.keep_id
+        ''')
+        cursor.execute('SELECT id FROM temp.duplicate_applications ORDER BY id')
+        removed_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute('SELECT DISTINCT job_id FROM temp.duplicate_applications')
+        job_ids = [row[0] for row in cursor.fetchall()]
+        stats = {'duplicates': len(removed_ids), 'jobs': len(job_ids), 'dry_run': dry_run}
+        if dry_run:
+            return stats
+
+        for table, column in (('submissions', 'application_id'), ('llm_usage', 'application_id'),
+                              ('applications', 'duplicate_of')):
+            cursor.execute(f'''
+                UPDATE {table}
+                SET {column} = (SELECT keep_id FROM temp.duplicate_applications d WHERE d.id = {table}.{column})
+                WHERE {column} IN (SELECT id FROM temp.duplicate_applications)
+            ''')
+        # A kept application flagged as a duplicate of its own removed copy is not a duplicate
+        cursor.execute('UPDATE applications SET duplicate_of = NULL, duplicate_similarity = NULL WHERE duplicate_of = id')
+        for table in ('cv_signatures', 'cv_lsh_buckets', 'generated_content', 'cascade_runs', 'application_changes'):
+            cursor.execute(f'DELETE FROM {table} WHERE application_id IN (SELECT id FROM temp.duplicate_applications)')
+        cursor.execute('DELETE FROM applications WHERE id IN (SELECT id FROM temp.duplicate_applications)')
+        build_score_sketches(cursor, job_ids)
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_applications_job_candidate ON applications (job_id, candidate_id)
+        ''')
+        conn.commit()
+    finally:
+        conn.close()
+
+    # After the main commit, so a crash in between leaves only unreferenced archive rows
+    if removed_ids and os.path.exists(get_archive_path()):
+        archive = connect_archive()
+        archive.executemany('DELETE FROM archived_applications WHERE application_id = ?',
+                            [(application_id,) for application_id in removed_ids])
+        archive.commit()
+        archive.close()
+    return stats
+
 # Authentication functions
 def hash_password(password: str) -> str:
     """Hash password using SHA256."""
@@ -159,7 +576,7 @@ def verify_password(password: str, hashed: str) -> bool:
 def create_user(username: str, email: str, password: str, full_name: str, role: str = 'candidate') -> bool:
     """Create a new user."""
     try:
-        conn = sqlite3.connect('cv_analyzer.db')
+        conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO users (username, email, password_hash, full_name, role)
@@ -173,7 +590,7 @@ def create_user(username: str, email: str, password: str, full_name: str, role:
 
 def authenticate_user(username: str, password: str) -> Optional[Dict]:
     """Authenticate user and return user data."""
-    conn = sqlite3.connect('cv_analyzer.db')
+    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     cursor.execute('''
         SELECT id, username, email, full_name, role FROM users 
@@ -192,10 +609,28 @@ def authenticate_user(username: str, password: str) -> Optional[Dict]:
         }
     return None
 
+def get_user_by_id(user_id: int) -> Optional[Dict]:
+    """Get user by ID."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('SELECT id, username, email, full_name, role FROM users WHERE id = ?', (user_id,))
+    user = cursor.fetchone()
+    conn.close()
+
+    if user:
+        return {
+            'id': user[0],
+            'username': user[1],
+            'email': user[2],
+            'full_name': user[3],
+            'role': user[4]
+        }
+    return None
+
 # Job functions
 def get_all_jobs() -> List[Dict]:
     """Get all active jobs."""
-    conn = sqlite3.connect('cv_analyzer.db')
+    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     cursor.execute('''
         SELECT j.id, j.title, j.description, j.requirements, j.department, j.location, 
@@ -222,7 +657,7 @@ def get_all_jobs() -> List[Dict]:
 
 def get_job_by_id(job_id: int) -> Optional[Dict]:
     """Get job by ID."""
-    conn = sqlite3.connect('cv_analyzer.db')
+    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     cursor.execute('''
         SELECT j.id, j.title, j.description, j.requirements, j.department, j.location, 
@@ -252,26 +687,27 @@ def get_job_by_id(job_id: int) -> Optional[Dict]:
 def create_job(title: str, description: str, requirements: str, department: str, location: str, salary_range: str, created_by: int) -> bool:
     """Create a new job posting."""
     try:
-        conn = sqlite3.connect('cv_analyzer.db')
+        conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO jobs (title, description, requirements, department, location, salary_range, created_by)
             VALUES (?, ?, ?, ?, ?, ?, ?)
         ''', (title, description, requirements, department, location, salary_range, created_by))
+        index_job_terms(cursor, cursor.lastrowid, title, description, requirements)
         conn.commit()
         conn.close()
         return True
     except:
         return False
 
-def get_jobs_by_creator(creator_id: int) -> List[Dict]:
+def get_jobs_by_creator(creator_id: int, include_inactive: bool = False) -> List[Dict]:
     """Get jobs created by a specific HR user."""
-    conn = sqlite3.connect('cv_analyzer.db')
+    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     cursor.execute('''
         SELECT id, title, description, requirements, department, location, salary_range, created_at
-        FROM jobs WHERE created_by = ? AND is_active = 1 ORDER BY created_at DESC
-    ''', (creator_id,))
+        FROM jobs WHERE created_by = ? AND (is_active = 1 OR ?) ORDER BY created_at DESC
+    ''', (creator_id, include_inactive))
     jobs = cursor.fetchall()
     conn.close()
     
@@ -288,28 +724,32 @@ def get_jobs_by_creator(creator_id: int) -> List[Dict]:
 
 # Application functions
 def submit_application(job_id: int, candidate_id: int, cv_text: str, analysis_result: Dict, 
-                      applicant_info: Dict) -> bool:
-    """Submit a job application with additional applicant information."""
+                      applicant_info: Dict, usage_log: Optional[List[Dict]] = None,
+                      cv_fingerprint: Optional[Dict] = None, cv_blob: Optional[str] = None) -> bool:
+    """Submit a job application with additional applicant information and its LLM usage.
+
+    cv_fingerprint holds the CV's MinHash signature, extracted work experience and any
+    near-duplicate found by process_application; the signature is computed here if missing.
+    cv_blob is the blob store key of the uploaded file, which the application then holds a reference to.
+    """
+    cv_fingerprint = cv_fingerprint or {'signature': compute_minhash(cv_text)}
+    duplicate = cv_fingerprint.get('duplicate')
+    # Only a CV submitted from another account is flagged; a candidate reusing their own CV is expected
+    if duplicate and duplicate['candidate_id'] == candidate_id:
+        duplicate = None
     try:
-        conn = sqlite3.connect('cv_analyzer.db')
+        conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
         
-        # Check if user already applied for this job
-        cursor.execute('''
-            SELECT id FROM applications WHERE job_id = ? AND candidate_id = ?
-        ''', (job_id, candidate_id))
-        
-        if cursor.fetchone():
-            conn.close()
-            return False  # Already applied
-        
+        # The unique (job_id, candidate_id) index rejects a second application atomically
         cursor.execute('''
             INSERT INTO applications 
             (job_id, candidate_id, cv_text, match_score, skills_score, experience_score, 
              matched_skills, missing_skills, analysis_result, experience_summary, status,
              applicant_full_name, applicant_email, applicant_phone, current_salary, 
-             expected_salary, total_experience)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+             expected_salary, total_experience, duplicate_of, duplicate_similarity, cv_blob)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (job_id, candidate_id) DO NOTHING
         ''', (
             job_id, candidate_id, cv_text,
             analysis_result.get('score', 0),
@@ -319,14 +759,34 @@ def submit_application(job_id: int, candidate_id: int, cv_text: str, analysis_re
             json.dumps(analysis_result.get('missing_skills', [])),
             json.dumps(analysis_result),
             analysis_result.get('experience_summary', ''),
-            'reviewed' if analysis_result.get('score', 0) >= 6 else 'rejected',
+            'reviewed' if analysis_result.get('score', 0) >= REVIEW_SCORE_THRESHOLD else 'rejected',
             applicant_info.get('full_name', ''),
             applicant_info.get('email', ''),
             applicant_info.get('phone', ''),
             applicant_info.get('current_salary', ''),
             applicant_info.get('expected_salary', ''),
-            applicant_info.get('total_experience', '')
+            applicant_info.get('total_experience', ''),
+            duplicate['application_id'] if duplicate else None,
+            duplicate['similarity'] if duplicate else None,
+            cv_blob
         ))
+        
+        if cursor.rowcount == 0:
+            # Already applied - the analysis calls were still paid for, so keep them in the usage records
+            record_llm_usage(cursor, usage_log, job_id, candidate_id)
+            conn.commit()
+            conn.close()
+            return False
+        
+        application_id = cursor.lastrowid
+        record_llm_usage(cursor, usage_log, job_id, candidate_id, application_id)
+        record_cascade_run(cursor, analysis_result.get('cascade'), job_id, application_id)
+        store_candidate_vector(cursor, candidate_id, cv_text)
+        store_cv_signature(cursor, application_id, job_id, candidate_id, cv_fingerprint.get('signature'),
+                           cv_fingerprint.get('work_experience'))
+        update_score_sketches(cursor, job_id, analysis_result)
+        if cv_blob:
+            cursor.execute('UPDATE cv_blobs SET refcount = refcount + 1 WHERE sha256 = ?', (cv_blob,))
         conn.commit()
         conn.close()
         return True
@@ -336,7 +796,7 @@ def submit_application(job_id: int, candidate_id: int, cv_text: str, analysis_re
 
 def get_applications_for_hr(hr_id: int) -> List[Dict]:
     """Get applications for jobs created by specific HR user."""
-    conn = sqlite3.connect('cv_analyzer.db')
+    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     cursor.execute('''
         SELECT a.id, j.title, u.full_name, u.email, a.match_score, a.skills_score, 
@@ -378,10 +838,10 @@ def get_applications_for_hr(hr_id: int) -> List[Dict]:
 
 def get_user_applications(user_id: int) -> List[Dict]:
     """Get applications for a specific user."""
-    conn = sqlite3.connect('cv_analyzer.db')
+    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     cursor.execute('''
-        SELECT j.title, a.match_score, a.status, a.applied_at, a.skills_score, a.experience_score
+        SELECT j.title, a.match_score, a.status, a.applied_at, a.skills_score, a.experience_score, a.job_id
         FROM applications a
         JOIN jobs j ON a.job_id = j.id
         WHERE a.candidate_id = ?
@@ -396,69 +856,2331 @@ def get_user_applications(user_id: int) -> List[Dict]:
         'status': app[2],
         'applied_at': app[3],
         'skills_score': app[4],
-        'experience_score': app[5]
+        'experience_score': app[5],
+        'job_id': app[6]
     } for app in applications]
 
-# CV Analysis functions
-def extract_text_from_pdf(pdf_file):
-    """Extract text content from a PDF file with robust error handling."""
-    try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text()
-        return text
-    except Exception as e:
-        print(f"Error parsing PDF: {str(e)}")
-        return f"[Error extracting PDF content: {str(e)}. Please check if this is a valid PDF file.]"
+def get_application_id(job_id: int, candidate_id: int) -> Optional[int]:
+    """Get the ID of a candidate's application for a job."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('SELECT id FROM applications WHERE job_id = ? AND candidate_id = ?', (job_id, candidate_id))
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else None
 
-def extract_work_experience(cv_text, client):
-    """Extract work experience durations from the CV text using Groq."""
-    prompt = f"""
-    Extract all work experience entries from the CV text below. For each position, identify the start and end dates.
-    If the end date is "Present" or "Current", use today's date.
-    
-    CV text:
-    {cv_text}
-    
-    Format your response as JSON with the following structure:
-    {{
-        "work_experience": [
-            {{
-                "position": "Job Title",
-                "company": "Company Name",
-                "start_date": "YYYY-MM",
-                "end_date": "YYYY-MM or Present"
-            }},
-            ...
-        ]
-    }}
-    Return only the JSON with no additional text.
+def get_job_rankings(job_id: int, limit: int = 20) -> List[Dict]:
+    """Get the highest scoring applications for a job."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT a.id, a.candidate_id, COALESCE(NULLIF(a.applicant_full_name, ''), u.full_name),
+               a.match_score, a.skills_score, a.experience_score, a.status, a.applied_at
+        FROM applications a
+        LEFT JOIN users u ON a.candidate_id = u.id
+        WHERE a.job_id = ?
+        ORDER BY a.match_score DESC, a.skills_score DESC, a.experience_score DESC
+        LIMIT ?
+    ''', (job_id, limit))
+    applications = cursor.fetchall()
+    conn.close()
+
+    return [{
+        'rank': rank,
+        'application_id': app[0],
+        'candidate_id': app[1],
+        'candidate_name': app[2],
+        'match_score': app[3],
+        'skills_score': app[4],
+        'experience_score': app[5],
+        'status': app[6],
+        'applied_at': app[7]
+    } for rank, app in enumerate(applications, start=1)]
+
+# Columns the application table can be sorted by, mapped to their SQL expressions
+APPLICATION_SORT_COLUMNS = {
+    'applied_at': 'a.applied_at',
+    'match_score': 'a.match_score',
+    'skills_score': 'a.skills_score',
+    'experience_score': 'a.experience_score',
+    'candidate_name': "COALESCE(NULLIF(a.applicant_full_name, ''), u.full_name)",
+    'job_title': 'j.title',
+    'status': 'a.status'
+}
+
+def _application_filters(hr_id: int, job_id: Optional[int] = None, status: Optional[str] = None,
+                         search: Optional[str] = None) -> Tuple[str, List]:
+    """Build the WHERE clause shared by the application table queries."""
+    conditions = ['j.created_by = ?']
+    params = [hr_id]
+    if job_id is not None:
+        conditions.append('a.job_id = ?')
+        params.append(job_id)
+    if status:
+        conditions.append('a.status = ?')
+        params.append(status)
+    if search:
+        conditions.append('(a.applicant_full_name LIKE ? OR a.applicant_email LIKE ? '
+                          'OR u.full_name LIKE ? OR u.email LIKE ?)')
+        params.extend([f"%{search}%"] * 4)
+    return ' AND '.join(conditions), params
+
+def get_applications_page(hr_id: int, job_id: Optional[int] = None, status: Optional[str] = None,
+                          search: Optional[str] = None, sort_by: str = 'applied_at', descending: bool = True,
+                          offset: int = 0, limit: int = 50) -> Tuple[List[Dict], int]:
+    """Get one page of an HR user's applications, filtered and sorted in SQL; returns (rows, total)."""
+    where, params = _application_filters(hr_id, job_id, status, search)
+    order = APPLICATION_SORT_COLUMNS.get(sort_by, 'a.applied_at')
+    direction = 'DESC' if descending else 'ASC'
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT COUNT(*) FROM applications a
+        JOIN jobs j ON a.job_id = j.id
+        JOIN users u ON a.candidate_id = u.id
+        WHERE {where}
+    ''', params)
+    total = cursor.fetchone()[0]
+    cursor.execute(f'''
+        SELECT a.id, COALESCE(NULLIF(a.applicant_full_name, ''), u.full_name),
+               COALESCE(NULLIF(a.applicant_email, ''), u.email), j.title, a.match_score,
+               a.skills_score, a.experience_score, a.status, a.applied_at, a.job_id,
+               a.duplicate_of, a.duplicate_similarity
+        FROM applications a
+        JOIN jobs j ON a.job_id = j.id
+        JOIN users u ON a.candidate_id = u.id
+        WHERE {where}
+        ORDER BY {order} {direction}, a.id {direction}
+        LIMIT ? OFFSET ?
+    ''', params + [limit, offset])
+    applications = cursor.fetchall()
+    conn.close()
+
+    return [{
+        'id': app[0],
+        'candidate_name': app[1],
+        'candidate_email': app[2],
+        'job_title': app[3],
+        'match_score': app[4],
+        'skills_score': app[5],
+        'experience_score': app[6],
+        'status': app[7],
+        'applied_at': app[8],
+        'job_id': app[9],
+        'duplicate_of': app[10],
+        'duplicate_similarity': app[11]
+    } for app in applications], total
+
+def get_application_detail(hr_id: int, application_id: int) -> Optional[Dict]:
+    """Get a single application for one of the HR user's jobs, including its analysis (archived or not)."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT a.id, j.title, u.full_name, u.email, a.match_score, a.skills_score,
+               a.experience_score, a.status, a.applied_at, a.matched_skills, a.missing_skills,
+               a.experience_summary, a.analysis_result, j.id as job_id,
+               a.applicant_full_name, a.applicant_email, a.applicant_phone,
+               a.current_salary, a.expected_salary, a.total_experience, a.archived_at,
+               a.duplicate_of, a.duplicate_similarity
+        FROM applications a
+        JOIN jobs j ON a.job_id = j.id
+        JOIN users u ON a.candidate_id = u.id
+        WHERE a.id = ? AND j.created_by = ?
+    ''', (application_id, hr_id))
+    app = cursor.fetchone()
+    conn.close()
+
+    if app:
+        analysis_result = app[12]
+        if app[20]:
+            archived = load_archived_application(app[0])
+            analysis_result = archived['analysis_result'] if archived else None
+        return {
+            'id': app[0],
+            'job_title': app[1],
+            'candidate_name': app[2],
+            'candidate_email': app[3],
+            'match_score': app[4],
+            'skills_score': app[5],
+            'experience_score': app[6],
+            'status': app[7],
+            'applied_at': app[8],
+            'matched_skills': json.loads(app[9]) if app[9] else [],
+            'missing_skills': json.loads(app[10]) if app[10] else [],
+            'experience_summary': app[11],
+            'analysis_result': json.loads(analysis_result) if analysis_result else {},
+            'job_id': app[13],
+            'applicant_full_name': app[14] or app[2],
+            'applicant_email': app[15] or app[3],
+            'applicant_phone': app[16] or 'Not provided',
+            'current_salary': app[17] or 'Not provided',
+            'expected_salary': app[18] or 'Not provided',
+            'total_experience': app[19] or 'Not provided',
+            'archived_at': app[20],
+            'duplicate_of': app[21],
+            'duplicate_similarity': app[22]
+        }
+    return None
+
+def get_job_application_stats(hr_id: int) -> Dict[int, Dict]:
+    """Application count and average match score per job of an HR user."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT a.job_id, COUNT(*), AVG(a.match_score)
+        FROM applications a
+        JOIN jobs j ON a.job_id = j.id
+        WHERE j.created_by = ?
+        GROUP BY a.job_id
+    ''', (hr_id,))
+    stats = cursor.fetchall()
+    conn.close()
+
+    return {row[0]: {'applications': row[1], 'avg_score': row[2] or 0} for row in stats}
+
+def update_applications_status(hr_id: int, application_ids: List[int], status: str) -> int:
+    """Set the status of several applications for the HR user's jobs; returns the number updated."""
+    if not application_ids:
+        return 0
+    placeholders = ','.join('?' * len(application_ids))
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        UPDATE applications SET status = ?
+        WHERE id IN ({placeholders})
+          AND job_id IN (SELECT id FROM jobs WHERE created_by = ?)
+    ''', [status] + list(application_ids) + [hr_id])
+    updated = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return updated
+
+# Live dashboard functions
+DASHBOARD_RECENT_LIMIT = 5
+DASHBOARD_REFRESH_SECONDS = int(os.getenv("DASHBOARD_REFRESH_SECONDS", "10"))
+
+def _dashboard_recent(cursor, hr_id: int, after_id: int, up_to_id: int) -> List[Dict]:
+    """Most recent applications of an HR user with ids in (after_id, up_to_id]."""
+    # For a delta, CROSS JOIN keeps applications as the outer loop so only the new id range is read
+    join = 'CROSS JOIN' if after_id else 'JOIN'
+    cursor.execute(f'''
+        SELECT a.id, j.title, u.full_name, u.email, a.match_score, a.status, a.applied_at
+        FROM applications a
+        {join} jobs j ON a.job_id = j.id
+        JOIN users u ON a.candidate_id = u.id
+        WHERE a.id > ? AND a.id <= ? AND j.created_by = ?
+        ORDER BY a.applied_at DESC
+        LIMIT ?
+    ''', (after_id, up_to_id, hr_id, DASHBOARD_RECENT_LIMIT))
+    return [{
+        'id': row[0],
+        'job_title': row[1],
+        'candidate_name': row[2],
+        'candidate_email': row[3],
+        'match_score': row[4],
+        'status': row[5],
+        'applied_at': row[6]
+    } for row in cursor.fetchall()]
+
+def get_dashboard_snapshot(hr_id: int) -> Dict:
+    """Full dashboard totals for an HR user, with the markers later deltas continue from."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    # One read transaction, so the markers match the totals
+    cursor.execute('BEGIN')
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM applications')
+    last_application_id = cursor.fetchone()[0]
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM application_changes')
+    last_change_id = cursor.fetchone()[0]
+    cursor.execute('''
+        SELECT COUNT(*), COALESCE(SUM(a.status = 'reviewed'), 0), COUNT(a.match_score), COALESCE(SUM(a.match_score), 0)
+        FROM applications a
+        JOIN jobs j ON a.job_id = j.id
+        WHERE j.created_by = ? AND a.id <= ?
+    ''', (hr_id, last_application_id))
+    applications, reviewed, scored, score_sum = cursor.fetchone()
+    recent = _dashboard_recent(cursor, hr_id, 0, last_application_id)
+    cursor.execute('SELECT COUNT(*) FROM jobs WHERE created_by = ? AND is_active = 1', (hr_id,))
+    jobs = cursor.fetchone()[0]
+    conn.commit()
+    conn.close()
+
+    return {
+        'hr_id': hr_id,
+        'last_application_id': last_application_id,
+        'last_change_id': last_change_id,
+        'jobs': jobs,
+        'applications': applications,
+        'reviewed': reviewed,
+        'scored': scored,
+        'score_sum': score_sum,
+        'recent': recent
+    }
+
+def get_dashboard_delta(hr_id: int, last_application_id: int, last_change_id: int) -> Dict:
+    """Applications added and status/score changes since the given markers.
+
+    Both reads are primary key ranges, so the cost depends on what changed since the last
+    refresh rather than on how many applications exist.
     """
-    
-    try:
-        response = client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="llama3-8b-8192",
-            temperature=0.2,
-            max_tokens=1000
-        )
-        result = response.choices[0].message.content
-        
-        try:
-            experience_data = json.loads(result)
-            return experience_data
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error: {str(e)}")
-            return {"work_experience": []}
-            
-    except Exception as e:
-        print(f"Error extracting work experience: {str(e)}")
-        return {"work_experience": []}
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM applications')
+    up_to_application_id = max(cursor.fetchone()[0], last_application_id)
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM application_changes')
+    up_to_change_id = max(cursor.fetchone()[0], last_change_id)
+
+    cursor.execute('''
+        SELECT COUNT(*), COALESCE(SUM(a.status = 'reviewed'), 0), COUNT(a.match_score), COALESCE(SUM(a.match_score), 0)
+        FROM applications a
+        CROSS JOIN jobs j ON a.job_id = j.id
+        WHERE a.id > ? AND a.id <= ? AND j.created_by = ?
+    ''', (last_application_id, up_to_application_id, hr_id))
+    added, added_reviewed, added_scored, added_score = cursor.fetchone()
+    recent = _dashboard_recent(cursor, hr_id, last_application_id, up_to_application_id) if added else []
+
+    # New applications already carry their current status; only older ones need their changes
+    cursor.execute('''
+        SELECT c.application_id, c.old_status, c.new_status, c.old_score, c.new_score
+        FROM application_changes c
+        CROSS JOIN jobs j ON c.job_id = j.id
+        WHERE c.id > ? AND c.id <= ? AND c.application_id <= ? AND j.created_by = ?
+        ORDER BY c.id
+    ''', (last_change_id, up_to_change_id, last_application_id, hr_id))
+    changes = [{
+        'application_id': row[0],
+        'old_status': row[1],
+        'new_status': row[2],
+        'old_score': row[3],
+        'new_score': row[4]
+    } for row in cursor.fetchall()]
+    cursor.execute('SELECT COUNT(*) FROM jobs WHERE created_by = ? AND is_active = 1', (hr_id,))
+    jobs = cursor.fetchone()[0]
+    conn.commit()
+    conn.close()
+
+    return {
+        'last_application_id': up_to_application_id,
+        'last_change_id': up_to_change_id,
+        'jobs': jobs,
+        'added': added,
+        'added_reviewed': added_reviewed,
+        'added_scored': added_scored,
+        'added_score': added_score,
+        'recent': recent,
+        'changes': changes
+    }
+
+def apply_dashboard_delta(state: Dict, delta: Dict) -> Dict:
+    """Fold a delta into the dashboard state from get_dashboard_snapshot."""
+    state = dict(state, last_application_id=delta['last_application_id'],
+                 last_change_id=delta['last_change_id'], jobs=delta['jobs'])
+    state['applications'] += delta['added']
+    state['reviewed'] += delta['added_reviewed']
+    state['scored'] += delta['added_scored']
+    state['score_sum'] += delta['added_score']
+
+    recent = {app['id']: dict(app) for app in state['recent']}
+    for change in delta['changes']:
+        state['reviewed'] += (change['new_status'] == 'reviewed') - (change['old_status'] == 'reviewed')
+        state['scored'] += (change['new_score'] is not None) - (change['old_score'] is not None)
+        state['score_sum'] += (change['new_score'] or 0) - (change['old_score'] or 0)
+        if change['application_id'] in recent:
+            recent[change['application_id']].update(status=change['new_status'], match_score=change['new_score'])
+
+    recent.update({app['id']: app for app in delta['recent']})
+    state['recent'] = sorted(recent.values(), key=lambda app: app['applied_at'], reverse=True)[:DASHBOARD_RECENT_LIMIT]
+    return state
+
+# Score percentile functions
+SCORE_SKETCH_K = int(os.getenv("SCORE_SKETCH_K", "200"))    # Larger k: more accurate, larger sketches
+SCORE_DIMENSIONS = {'overall': 'match_score', 'skills': 'skills_score', 'experience': 'experience_score'}
+SCORE_DIMENSION_KEYS = {'overall': 'score', 'skills': 'skills_match_score', 'experience': 'experience_relevance_score'}
+
+class KLLSketch:
+    """KLL quantile sketch: a mergeable summary of a stream of numbers in O(k) space.
+
+    Level h holds samples standing for 2**h values each. When the sketch is full, the lowest
+    level over its capacity is sorted and every other sample (from a random offset) moves up a
+    level, so rank and quantile queries cost O(k) however many values were added, with a rank
+    error of about 1-2% at k=200.
+    """
+
+    def __init__(self, k: int = SCORE_SKETCH_K):
+        self.k = k
+        self.n = 0
+        self.levels = [[]]
+
+    def _capacity(self, level: int) -> int:
+        return max(2, math.ceil(self.k * (2 / 3) ** (len(self.levels) - level - 1)))
+
+    def _compress(self):
+        while sum(len(items) for items in self.levels) >= sum(map(self._capacity, range(len(self.levels)))):
+            level = next(h for h, items in enumerate(self.levels) if len(items) >= self._capacity(h))
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+            items = sorted(self.levels[level])
+            # An odd sample out stays behind so the total weight is preserved
+            self.levels[level] = [items.pop()] if len(items) % 2 else []
+            self.levels[level + 1].extend(items[random.randint(0, 1)::2])
+
+    def update(self, value: float):
+        self.levels[0].append(float(value))
+        self.n += 1
+        self._compress()
+
+    def merge(self, other: 'KLLSketch'):
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.n += other.n
+        self._compress()
+
+    def rank(self, value: float) -> float:
+        """Estimated fraction of values below value, counting equal values as half."""
+        below = equal = 0
+        for level, items in enumerate(self.levels):
+            for item in items:
+                if item < value:
+                    below += 1 << level
+                elif item == value:
+                    equal += 1 << level
+        return (below + equal / 2) / self.n if self.n else 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated value at fraction q (0-1) of the distribution."""
+        weighted = sorted((item, 1 << level) for level, items in enumerate(self.levels) for item in items)
+        cumulative = 0
+        for item, weight in weighted:
+            cumulative += weight
+            if cumulative >= q * self.n:
+                return item
+        return weighted[-1][0] if weighted else None
+
+    def to_json(self) -> str:
+        return json.dumps({'k': self.k, 'n': self.n, 'levels': self.levels})
+
+    @classmethod
+    def from_json(cls, text: str) -> 'KLLSketch':
+        data = json.loads(text)
+        sketch = cls(data['k'])
+        sketch.n = data['n']
+        sketch.levels = data['levels']
+        return sketch
+
+def update_score_sketches(cursor, job_id: int, analysis_result: Dict):
+    """Add an application's scores to its job's sketches, inside the caller's write transaction.
+
+    Missing scores are skipped rather than counted as 0.
+    """
+    cursor.execute('SELECT dimension, sketch FROM score_sketches WHERE job_id = ?', (job_id,))
+    sketches = {dimension: KLLSketch.from_json(sketch) for dimension, sketch in cursor.fetchall()}
+    rows = []
+    for dimension, key in SCORE_DIMENSION_KEYS.items():
+        if analysis_result.get(key) is None:
+            continue
+        sketch = sketches.get(dimension) or KLLSketch()
+        sketch.update(analysis_result[key])
+        rows.append((job_id, dimension, sketch.to_json()))
+    cursor.executemany('''
+        INSERT INTO score_sketches (job_id, dimension, sketch, updated_at)
+        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (job_id, dimension) DO UPDATE SET sketch = excluded.sketch, updated_at = excluded.updated_at
+    ''', rows)
+
+def build_score_sketches(cursor, job_ids: Optional[List[int]] = None) -> int:
+    """Rebuild the sketches of the given jobs (or all jobs) from the stored scores; returns the jobs rebuilt.
+
+    Used after re-scoring or a bulk import, and to backfill existing databases. NULL scores
+    (e.g. imported applications not scored yet) are left out of the sketches.
+    """
+    where = '' if job_ids is None else 'WHERE job_id IN (SELECT value FROM json_each(?))'
+    params = () if job_ids is None else (json.dumps(list(job_ids)),)
+    cursor.execute(f'''
+        SELECT job_id, match_score, skills_score, experience_score
+        FROM applications
+        {where}
+        ORDER BY job_id
+    ''', params)
+    sketches = {}
+    for row in cursor:
+        job_sketches = sketches.setdefault(row[0], {dimension: KLLSketch() for dimension in SCORE_DIMENSIONS})
+        for dimension, value in zip(SCORE_DIMENSIONS, row[1:]):
+            if value is not None:
+                job_sketches[dimension].update(value)
+
+    cursor.execute(f'DELETE FROM score_sketches {where}', params)
+    cursor.executemany('INSERT INTO score_sketches (job_id, dimension, sketch) VALUES (?, ?, ?)', [
+        (sketch_job_id, dimension, sketch.to_json())
+        for sketch_job_id, job_sketches in sketches.items()
+        for dimension, sketch in job_sketches.items()
+    ])
+    return len(sketches)
+
+def get_score_sketches(job_ids: List[int]) -> Dict[int, Dict[str, KLLSketch]]:
+    """Load the score sketches of jobs as {job_id: {dimension: sketch}}."""
+    if not job_ids:
+        return {}
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    placeholders = ','.join('?' * len(job_ids))
+    cursor.execute(f'SELECT job_id, dimension, sketch FROM score_sketches WHERE job_id IN ({placeholders})',
+                   list(job_ids))
+    sketches = {}
+    for job_id, dimension, sketch in cursor.fetchall():
+        sketches.setdefault(job_id, {})[dimension] = KLLSketch.from_json(sketch)
+    conn.close()
+    return sketches
+
+def get_score_percentiles(job_id: int, scores: Dict[str, float],
+                          sketches: Optional[Dict[int, Dict[str, KLLSketch]]] = None) -> Dict[str, int]:
+    """Percentile (0-100) of each given dimension score among the job's applicants."""
+    job_sketches = (sketches if sketches is not None else get_score_sketches([job_id])).get(job_id, {})
+    return {dimension: round(100 * job_sketches[dimension].rank(score))
+            for dimension, score in scores.items()
+            if dimension in job_sketches and job_sketches[dimension].n and score is not None}
+
+def get_score_distribution(job_id: int, quantiles=(0.25, 0.5, 0.75, 0.9),
+                           sketches: Optional[Dict[int, Dict[str, KLLSketch]]] = None) -> Dict[str, Dict]:
+    """Estimated score quantiles of a job per dimension, with the number of applications sketched."""
+    job_sketches = (sketches if sketches is not None else get_score_sketches([job_id])).get(job_id, {})
+    return {dimension: {'count': sketch.n, **{q: sketch.quantile(q) for q in quantiles}}
+            for dimension, sketch in job_sketches.items() if sketch.n}
+
+# Shortlist functions
+def get_shortlist(hr_id: int, job_ids: Optional[List[int]] = None, k: int = 20,
+                  weights: Optional[Dict[str, float]] = None, min_skills: Optional[float] = None,
+                  min_experience: Optional[float] = None) -> List[Dict]:
+    """Get the top k applications across jobs by a weighted score of the three scores.
+
+    Applications are read from the covering index idx_applications_job_score into one bounded
+    heap of size k: first the k best of each job by match score, then - when skills or
+    experience carry weight - only the index range whose match score can still beat the k-th
+    best, given that scores are at most 10. job_ids defaults to the HR user's open jobs.
+    """
+    weights = weights or {'match': 1.0}
+    w_match = weights.get('match', 0.0)
+    w_skills = weights.get('skills', 0.0)
+    w_experience = weights.get('experience', 0.0)
+    total_weight = (w_match + w_skills + w_experience) or 1.0
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    if job_ids is None:
+        cursor.execute('SELECT id FROM jobs WHERE created_by = ? AND is_active = 1', (hr_id,))
+    else:
+        placeholders = ','.join('?' * len(job_ids))
+        cursor.execute(f'SELECT id FROM jobs WHERE created_by = ? AND id IN ({placeholders})', [hr_id] + list(job_ids))
+    job_ids = [row[0] for row in cursor.fetchall()]
+
+    heap = []  # (weighted score, application id), smallest on top
+    seen = set()
+
+    def push(rows):
+        for application_id, match_score, skills_score, experience_score in rows:
+            if application_id in seen:
+                continue
+            seen.add(application_id)
+            score = (w_match * (match_score or 0) + w_skills * (skills_score or 0)
+                     + w_experience * (experience_score or 0)) / total_weight
+            if len(heap) < k:
+                heapq.heappush(heap, (score, application_id))
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, (score, application_id))
+
+    # Top k of every job by match score, read straight off the index
+    for job_id in job_ids:
+        cursor.execute('''
+            SELECT id, match_score, skills_score, experience_score
+            FROM applications
+            WHERE job_id = ? AND skills_score >= ? AND experience_score >= ?
+            ORDER BY match_score DESC
+            LIMIT ?
+        ''', (job_id, min_skills or 0, min_experience or 0, k))
+        push(cursor.fetchall())
+
+    # With skills or experience weighted, lower match scores can still make the list; only
+    # rows whose match score leaves room to beat the current k-th best need to be read
+    if (w_skills or w_experience) and len(heap) == k:
+        for job_id in job_ids:
+            cutoff = heap[0][0]
+            min_match = (cutoff * total_weight - (w_skills + w_experience) * 10) / w_match if w_match else 0
+            cursor.execute('''
+                SELECT id, match_score, skills_score, experience_score
+                FROM applications
+                WHERE job_id = ? AND match_score >= ? AND skills_score >= ? AND experience_score >= ?
+                  AND (? * match_score + ? * skills_score + ? * experience_score) / ? > ?
+            ''', (job_id, min_match, min_skills or 0, min_experience or 0,
+                  w_match, w_skills, w_experience, total_weight, cutoff))
+            push(cursor.fetchall())
+
+    ranked = sorted(heap, reverse=True)
+    if not ranked:
+        conn.close()
+        return []
+
+    placeholders = ','.join('?' * len(ranked))
+    cursor.execute(f'''
+        SELECT a.id, COALESCE(NULLIF(a.applicant_full_name, ''), u.full_name), j.title, a.job_id,
+               a.match_score, a.skills_score, a.experience_score, a.status
+        FROM applications a
+        JOIN jobs j ON a.job_id = j.id
+        JOIN users u ON a.candidate_id = u.id
+        WHERE a.id IN ({placeholders})
+    ''', [application_id for _, application_id in ranked])
+    details = {row[0]: row for row in cursor.fetchall()}
+    conn.close()
+
+    return [{
+        'rank': rank,
+        'application_id': application_id,
+        'candidate_name': details[application_id][1],
+        'job_title': details[application_id][2],
+        'job_id': details[application_id][3],
+        'weighted_score': round(score, 2),
+        'match_score': details[application_id][4],
+        'skills_score': details[application_id][5],
+        'experience_score': details[application_id][6],
+        'status': details[application_id][7]
+    } for rank, (score, application_id) in enumerate(ranked, start=1) if application_id in details]
+
+# Archive functions
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "200"))
+ARCHIVE_INTERVAL_SECONDS = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))  # 0 disables the background archiver
+ARCHIVE_BATCH_PAUSE = 0.05  # seconds between batches so other writers get the lock
+
+def get_archive_path() -> str:
+    """Archive database path, next to the main database unless CV_ANALYZER_ARCHIVE_DB is set."""
+    return os.getenv("CV_ANALYZER_ARCHIVE_DB") or os.path.splitext(DB_PATH)[0] + "_archive.db"
+
+def connect_archive():
+    """Open the archive database, creating its table on first use."""
+    conn = sqlite3.connect(get_archive_path())
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archived_applications (
+            application_id INTEGER PRIMARY KEY,
+            job_id INTEGER,
+            candidate_id INTEGER,
+            cv_text BLOB,
+            analysis_result BLOB,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    return conn
+
+def compress_text(text: Optional[str]) -> Optional[bytes]:
+    return zlib.compress(text.encode('utf-8'), 6) if text is not None else None
+
+def decompress_text(data: Optional[bytes]) -> Optional[str]:
+    return zlib.decompress(data).decode('utf-8') if data is not None else None
+
+def close_job(job_id: int, hr_id: int) -> bool:
+    """Deactivate a job; its applications become eligible for archiving."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('UPDATE jobs SET is_active = 0 WHERE id = ? AND created_by = ?', (job_id, hr_id))
+    closed = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+    return closed
+
+def _next_archive_batch(cursor, cutoff: str, batch_size: int) -> List[int]:
+    """IDs of unarchived applications of closed jobs, then of applications older than the cutoff."""
+    cursor.execute('''
+        SELECT a.id FROM jobs j
+        CROSS JOIN applications a ON a.job_id = j.id  -- CROSS JOIN keeps jobs as the outer loop
+        WHERE j.is_active = 0 AND a.archived_at IS NULL
+        LIMIT ?
+    ''', (batch_size,))
+    ids = [row[0] for row in cursor.fetchall()]
+    if len(ids) < batch_size:
+        cursor.execute('''
+            SELECT id FROM applications
+            WHERE archived_at IS NULL AND applied_at < ?
+            LIMIT ?
+        ''', (cutoff, batch_size - len(ids)))
+        ids.extend(row[0] for row in cursor.fetchall() if row[0] not in ids)
+    return ids
+
+def archive_applications(older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE,
+                         max_batches: Optional[int] = None) -> Dict:
+    """Move cv_text and analysis_result of closed-job and aged-out applications to the archive database.
+
+    Rows stay in applications with their scores, so counts, rankings and analytics are
+    unchanged; only the blobs move, compressed. Work is done in small batches, each copied
+    to the archive and committed there before its short UPDATE on the main database, so a
+    crash at any point leaves every blob readable and the next run just repeats the batch.
+    """
+    # applied_at holds SQLite's CURRENT_TIMESTAMP, which is UTC
+    cutoff = (datetime.datetime.now(datetime.timezone.utc)
+              - datetime.timedelta(days=older_than_days)).strftime('%Y-%m-%d %H:%M:%S')
+    stats = {'archived': 0, 'bytes_before': 0, 'bytes_after': 0, 'batches': 0}
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    archive = connect_archive()
+    try:
+        while max_batches is None or stats['batches'] < max_batches:
+            ids = _next_archive_batch(cursor, cutoff, batch_size)
+            if not ids:
+                break
+            placeholders = ','.join('?' * len(ids))
+            cursor.execute(f'''
+                SELECT id, job_id, candidate_id, cv_text, analysis_result FROM applications
+                WHERE id IN ({placeholders})
+            ''', ids)
+            rows = cursor.fetchall()
+            compressed = [(row[0], row[1], row[2], compress_text(row[3]), compress_text(row[4])) for row in rows]
+
+            archive.executemany('''
+                INSERT OR REPLACE INTO archived_applications
+                    (application_id, job_id, candidate_id, cv_text, analysis_result)
+                VALUES (?, ?, ?, ?, ?)
+            ''', compressed)
+            archive.commit()
+
+            cursor.execute(f'''
+                UPDATE applications SET cv_text = NULL, analysis_result = NULL, archived_at = CURRENT_TIMESTAMP
+                WHERE id IN ({placeholders})
+            ''', ids)
+            conn.commit()
+
+            stats['archived'] += len(rows)
+            stats['bytes_before'] += sum(len((row[3] or '').encode('utf-8')) + len((row[4] or '').encode('utf-8'))
+                                         for row in rows)
+            stats['bytes_after'] += sum(len(row[3] or b'') + len(row[4] or b'') for row in compressed)
+            stats['batches'] += 1
+            time.sleep(ARCHIVE_BATCH_PAUSE)
+    finally:
+        archive.close()
+        conn.close()
+    return stats
+
+def load_archived_application(application_id: int) -> Optional[Dict]:
+    """Read an archived application's CV text and analysis back from the archive database."""
+    if not os.path.exists(get_archive_path()):
+        return None
+    archive = connect_archive()
+    row = archive.execute('''
+        SELECT cv_text, analysis_result FROM archived_applications WHERE application_id = ?
+    ''', (application_id,)).fetchone()
+    archive.close()
+
+    if row:
+        return {
+            'cv_text': decompress_text(row[0]),
+            'analysis_result': decompress_text(row[1])
+        }
+    return None
+
+def get_application_cv_text(application_id: int) -> Optional[str]:
+    """Get the CV text of an application, from the archive if it has been archived."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('SELECT cv_text, archived_at FROM applications WHERE id = ?', (application_id,))
+    row = cursor.fetchone()
+    conn.close()
+
+    if not row:
+        return None
+    if row[1]:
+        archived = load_archived_application(application_id)
+        return archived['cv_text'] if archived else None
+    return row[0]
+
+def get_application_analysis(application_id: int) -> Optional[Dict]:
+    """Get the stored analysis of an application, from the archive if it has been archived."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('SELECT analysis_result, archived_at FROM applications WHERE id = ?', (application_id,))
+    row = cursor.fetchone()
+    conn.close()
+
+    if not row:
+        return None
+    analysis_result = row[0]
+    if row[1]:
+        archived = load_archived_application(application_id)
+        analysis_result = archived['analysis_result'] if archived else None
+    return json.loads(analysis_result) if analysis_result else None
+
+def get_archive_stats() -> Dict:
+    """Counts of archived and hot applications and the archive file size."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*), COUNT(archived_at) FROM applications')
+    total, archived = cursor.fetchone()
+    conn.close()
+    path = get_archive_path()
+    return {
+        'applications': total,
+        'archived': archived,
+        'archive_bytes': os.path.getsize(path) if os.path.exists(path) else 0
+    }
+
+class Archiver:
+    """Background thread that archives a few batches at a time every ARCHIVE_INTERVAL_SECONDS."""
+
+    def __init__(self, interval: int = ARCHIVE_INTERVAL_SECONDS, max_batches: int = 50):
+        self.interval = interval
+        self.max_batches = max_batches
+        self.last_run = None
+        self.last_stats = None
+        self.thread = threading.Thread(target=self._run, name="archiver", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.last_stats = archive_applications(max_batches=self.max_batches)
+                self.last_run = datetime.datetime.now()
+            except Exception as e:
+                self.last_stats = None
+                print(f"Error archiving applications: {str(e)}")
+            # Keep going without waiting while there is a backlog
+            if not self.last_stats or self.last_stats['batches'] < self.max_batches:
+                time.sleep(self.interval)
+
+@st.cache_resource
+def get_archiver() -> Optional[Archiver]:
+    """Process-wide background archiver, started once per Streamlit server."""
+    return Archiver() if ARCHIVE_INTERVAL_SECONDS > 0 else None
+
+# CV blob store
+BLOB_MAX_BYTES = int(os.getenv("CV_BLOB_MAX_BYTES", str(10 * 1024 * 1024)))
+BLOB_CHUNK_SIZE = 1024 * 1024
+# Unreferenced blobs younger than this are kept, as a submission may be about to attach them
+BLOB_GC_GRACE_SECONDS = int(os.getenv("CV_BLOB_GC_GRACE_SECONDS", "86400"))
+
+def get_blob_store_path() -> str:
+    """Directory of the CV blob store; defaults to <database name>_blobs next to the database."""
+    return os.getenv("CV_BLOB_DIR") or f"{os.path.splitext(DB_PATH)[0]}_blobs"
+
+def blob_path(sha256: str) -> str:
+    """File of a blob, fanned out over two directory levels by its leading hex digits."""
+    return os.path.join(get_blob_store_path(), sha256[:2], sha256[2:4], sha256)
+
+def store_blob(stream, content_type: str = '') -> Tuple[str, int]:
+    """Copy a file object into the blob store chunk by chunk; returns its SHA-256 and size.
+
+    Raises ValueError for an empty file or one larger than BLOB_MAX_BYTES.
+    """
+    temp_dir = os.path.join(get_blob_store_path(), 'tmp')
+    os.makedirs(temp_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            while True:
+                chunk = stream.read(BLOB_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > BLOB_MAX_BYTES:
+                    raise ValueError(f"File is larger than the {BLOB_MAX_BYTES:,} byte limit")
+                digest.update(chunk)
+                temp_file.write(chunk)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        if not size:
+            raise ValueError("File is empty")
+
+        sha256 = digest.hexdigest()
+        # Register (or refresh) the row before the file is moved in, so a concurrent
+        # collect_blob_garbage either already removed the old copy or sees a fresh stored_at
+        conn = sqlite3.connect(DB_PATH)
+        conn.execute('''
+            INSERT INTO cv_blobs (sha256, size, content_type) VALUES (?, ?, ?)
+            ON CONFLICT (sha256) DO UPDATE SET stored_at = CURRENT_TIMESTAMP
+        ''', (sha256, size, content_type))
+        conn.commit()
+        conn.close()
+
+        path = blob_path(sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        return sha256, size
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+@contextlib.contextmanager
+def open_blob(sha256: str):
+    """Memory-map a blob read-only, so readers page it in from disk instead of copying it."""
+    with open(blob_path(sha256), 'rb') as blob_file:
+        with mmap.mmap(blob_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+def extract_text_from_blob(sha256: str) -> str:
+    """Extract the CV text of a stored PDF or text upload."""
+    with open_blob(sha256) as data:
+        if data[:5] == b'%PDF-':
+            return extract_text_from_pdf(data, blob_path(sha256))
+        return data.read().decode('utf-8', errors='replace')
+
+def collect_blob_garbage(grace_seconds: int = BLOB_GC_GRACE_SECONDS) -> Dict:
+    """Delete blobs no application references once they are older than the grace period.
+
+    Each row is deleted and its file removed inside one write transaction, which store_blob
+    has to wait for before it can register the same content again.
+    """
+    stats = {'deleted': 0, 'bytes_freed': 0, 'temp_files_removed': 0}
+    conn = sqlite3.connect(DB_PATH, isolation_level=None)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT sha256 FROM cv_blobs WHERE refcount <= 0 AND stored_at < DATETIME('now', ?)
+    ''', (f"-{grace_seconds} seconds",))
+    for (sha256,) in cursor.fetchall():
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('''
+            DELETE FROM cv_blobs WHERE sha256 = ? AND refcount <= 0 AND stored_at < DATETIME('now', ?)
+            RETURNING size
+        ''', (sha256, f"-{grace_seconds} seconds"))
+        row = cursor.fetchone()
+        if row:
+            try:
+                os.remove(blob_path(sha256))
+            except FileNotFoundError:
+                pass
+            stats['deleted'] += 1
+            stats['bytes_freed'] += row[0]
+        cursor.execute('COMMIT')
+    conn.close()
+
+    # Leftovers of uploads interrupted mid-copy
+    temp_dir = os.path.join(get_blob_store_path(), 'tmp')
+    if os.path.isdir(temp_dir):
+        cutoff = time.time() - grace_seconds
+        for name in os.listdir(temp_dir):
+            path = os.path.join(temp_dir, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                stats['temp_files_removed'] += 1
+    return stats
+
+def get_blob_stats() -> Dict:
+    """Number and total size of stored blobs, and how many are unreferenced."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(refcount <= 0), 0) FROM cv_blobs
+    ''')
+    blobs, total_bytes, unreferenced = cursor.fetchone()
+    conn.close()
+    return {'blobs': blobs, 'bytes': total_bytes, 'unreferenced': unreferenced}
+
+# Export functions
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_COLUMNS = [
+    ('application_id', 'int'), ('job_id', 'int'), ('job_title', 'str'), ('candidate_id', 'int'),
+    ('applicant_name', 'str'), ('applicant_email', 'str'), ('applicant_phone', 'str'),
+    ('match_score', 'float'), ('skills_score', 'float'), ('experience_score', 'float'),
+    ('status', 'str'), ('applied_at', 'str'), ('current_salary', 'str'), ('expected_salary', 'str'),
+    ('total_experience', 'str'), ('matched_skills', 'str'), ('missing_skills', 'str'),
+    ('experience_summary', 'str')
+]
+# Parquet export needs pyarrow; CSV export works without it
+PARQUET_EXPORT_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+def iter_application_export_chunks(hr_id: Optional[int] = None, job_id: Optional[int] = None,
+                                   status: Optional[str] = None, date_from=None, date_to=None,
+                                   chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Yield lists of export rows, stepping through the query cursor chunk by chunk.
+
+    date_from/date_to are inclusive dates (datetime.date or 'YYYY-MM-DD'); hr_id=None exports all jobs.
+    """
+    conditions, params = [], []
+    if hr_id is not None:
+        conditions.append('j.created_by = ?')
+        params.append(hr_id)
+    if job_id is not None:
+        conditions.append('a.job_id = ?')
+        params.append(job_id)
+    if status:
+        conditions.append('a.status = ?')
+        params.append(status)
+    if date_from:
+        conditions.append('a.applied_at >= ?')
+        params.append(str(date_from))
+    if date_to:
+        conditions.append("a.applied_at < DATE(?, '+1 day')")
+        params.append(str(date_to))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT a.id, a.job_id, j.title, a.candidate_id,
+                   COALESCE(NULLIF(a.applicant_full_name, ''), u.full_name),
+                   COALESCE(NULLIF(a.applicant_email, ''), u.email), a.applicant_phone,
+                   a.match_score, a.skills_score, a.experience_score, a.status, a.applied_at,
+                   a.current_salary, a.expected_salary, a.total_experience,
+                   a.matched_skills, a.missing_skills, a.experience_summary
+            FROM applications a
+            JOIN jobs j ON a.job_id = j.id
+            LEFT JOIN users u ON a.candidate_id = u.id
+            {where}
+            ORDER BY a.id
+        ''', params)
+
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [
+                row[:15] + (
+                    '; '.join(json.loads(row[15])) if row[15] else '',
+                    '; '.join(json.loads(row[16])) if row[16] else '',
+                    row[17]
+                ) for row in rows
+            ]
+    finally:
+        conn.close()
+
+def write_applications_csv(output, **filters) -> int:
+    """Write the application export as CSV to a text file object; returns the number of rows."""
+    writer = csv.writer(output)
+    writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    count = 0
+    for rows in iter_application_export_chunks(**filters):
+        writer.writerows(rows)
+        count += len(rows)
+    return count
+
+def write_applications_parquet(output, **filters) -> int:
+    """Write the application export as Parquet, one row group per chunk; returns the number of rows."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {'int': pa.int64(), 'float': pa.float64(), 'str': pa.string()}
+    schema = pa.schema([(name, types[kind]) for name, kind in EXPORT_COLUMNS])
+    count = 0
+    with pq.ParquetWriter(output, schema) as writer:
+        for rows in iter_application_export_chunks(**filters):
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema))
+            count += len(rows)
+    return count
+
+def export_applications_file(export_format: str, **filters):
+    """Write an export to a temporary file and return it opened for reading (used by the download button)."""
+    if export_format == 'parquet':
+        export_file = tempfile.TemporaryFile()
+        write_applications_parquet(export_file, **filters)
+    else:
+        export_file = tempfile.TemporaryFile(mode='w+', newline='', encoding='utf-8')
+        write_applications_csv(export_file, **filters)
+    export_file.seek(0)
+    return export_file
+
+# Bulk import functions
+IMPORT_BATCH_SIZE = 10000
+
+def read_import_records(path: str):
+    """Yield records from a CSV or JSONL file one at a time."""
+    if path.endswith(('.jsonl', '.ndjson')):
+        with open(path, encoding='utf-8') as records:
+            for line in records:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, newline='', encoding='utf-8') as records:
+            yield from csv.DictReader(records)
+
+def _import_text_list(value) -> str:
+    """Normalize a skills list given as JSON, a list, or a ';'-separated string to a JSON array."""
+    if isinstance(value, list):
+        return json.dumps(value)
+    if not value:
+        return json.dumps([])
+    try:
+        parsed = json.loads(value)
+        if isinstance(parsed, list):
+            return json.dumps(parsed)
+    except (TypeError, json.JSONDecodeError):
+        pass
+    return json.dumps([part.strip() for part in str(value).split(';') if part.strip()])
+
+def _import_float(value) -> Optional[float]:
+    return float(value) if value not in (None, '') else None
+
+def _job_import_row(record: Dict, created_by: Optional[int]) -> tuple:
+    return (
+        record.get('external_id') or None,
+        record['title'], record.get('description') or '', record.get('requirements') or '',
+        record.get('department'), record.get('location'), record.get('salary_range'),
+        int(record['created_by']) if record.get('created_by') else created_by,
+        record.get('created_at') or None,
+        0 if str(record.get('is_active', '1')).lower() in ('0', 'false', 'no') else 1
+    )
+
+def _application_import_rows(record: Dict) -> Tuple[tuple, Dict]:
+    """Build the placeholder-candidate row and the application row for one record."""
+    email = record['candidate_email'].strip()
+    name = record.get('candidate_name') or record.get('applicant_full_name') or email
+    analysis = record.get('analysis_result') or {}
+    if isinstance(analysis, str):
+        analysis = json.loads(analysis) if analysis.strip() else {}
+    match_score = _import_float(record.get('match_score'))
+    status = record.get('status') or (
+        'reviewed' if (match_score or 0) >= REVIEW_SCORE_THRESHOLD else 'rejected')
+
+    # Imported candidates get an unusable password hash; they can be invited to reset it
+    candidate = (email, email, '!' + uuid.uuid4().hex, name)
+    application = {
+        'job_external_id': record.get('job_external_id') or None,
+        'job_id': int(record['job_id']) if record.get('job_id') else None,
+        'candidate_email': email,
+        'cv_text': record.get('cv_text') or '',
+        'match_score': match_score,
+        'skills_score': _import_float(record.get('skills_score')),
+        'experience_score': _import_float(record.get('experience_score')),
+        'matched_skills': _import_text_list(record.get('matched_skills')),
+        'missing_skills': _import_text_list(record.get('missing_skills')),
+        'analysis_result': json.dumps(analysis),
+        'experience_summary': record.get('experience_summary') or '',
+        'status': status,
+        'applied_at': record.get('applied_at') or None,
+        'applicant_full_name': record.get('applicant_full_name') or name,
+        'applicant_email': record.get('applicant_email') or email,
+        'applicant_phone': record.get('applicant_phone') or '',
+        'current_salary': record.get('current_salary') or '',
+        'expected_salary': record.get('expected_salary') or '',
+        'total_experience': record.get('total_experience') or ''
+    }
+    return candidate, application
+
+def _drop_secondary_indexes(cursor, tables: List[str]) -> List[str]:
+    """Drop non-unique indexes of the tables so they can be rebuilt once after loading."""
+    placeholders = ','.join('?' * len(tables))
+    cursor.execute(f'''
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({placeholders})
+          AND sql NOT LIKE 'CREATE UNIQUE%'
+    ''', tables)
+    indexes = cursor.fetchall()
+    for name, _ in indexes:
+        cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+    return [sql for _, sql in indexes]
+
+def bulk_import(kind: str, records, batch_size: int = IMPORT_BATCH_SIZE,
+                created_by: Optional[int] = None, progress=None) -> Dict:
+    """Load jobs or applications with executemany in large transactions.
+
+    Secondary indexes are dropped during the load and rebuilt at the end. Duplicates are
+    skipped with INSERT ... ON CONFLICT DO NOTHING against the unique constraints on
+    jobs.external_id and applications (job_id, candidate_id). Applications reference
+    their job by job_external_id (or job_id) and their candidate by candidate_email;
+    unknown candidates are created as placeholder accounts. progress(rows, inserted, seconds)
+    is called after every batch.
+    """
+    if kind not in ('jobs', 'applications'):
+        raise ValueError(f"Unknown import kind: {kind}")
+
+    init_database()
+    conn = sqlite3.connect(DB_PATH, isolation_level=None)
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA synchronous = OFF')
+    cursor.execute('PRAGMA temp_store = MEMORY')
+    cursor.execute('PRAGMA cache_size = -200000')
+
+    # job_terms keeps its job_id index: term vectors are built per job right after the load
+    tables = ['jobs'] if kind == 'jobs' else ['applications', 'users']
+    deferred_indexes = _drop_secondary_indexes(cursor, tables)
+    # Applications above this id are the imported ones; only their jobs' sketches are rebuilt
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM applications')
+    last_application_id = cursor.fetchone()[0]
+
+    started = time.perf_counter()
+    rows = inserted = 0
+    records = iter(records)
+    try:
+        while True:
+            batch = [record for _, record in zip(range(batch_size), records)]
+            if not batch:
+                break
+
+            changes_before = conn.total_changes
+            cursor.execute('BEGIN')
+            if kind == 'jobs':
+                cursor.executemany('''
+                    INSERT INTO jobs (external_id, title, description, requirements, department, location,
+                                      salary_range, created_by, created_at, is_active)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)
+                    ON CONFLICT (external_id) WHERE external_id IS NOT NULL DO NOTHING
+                ''', [_job_import_row(record, created_by) for record in batch])
+                batch_inserted = conn.total_changes - changes_before
+            else:
+                candidate_rows, application_rows = zip(*(_application_import_rows(record) for record in batch))
+                cursor.executemany('''
+                    INSERT INTO users (username, email, password_hash, full_name, role)
+                    VALUES (?, ?, ?, ?, 'candidate')
+                    ON CONFLICT DO NOTHING
+                ''', candidate_rows)
+                candidates_inserted = conn.total_changes - changes_before
+                cursor.executemany('''
+                    INSERT INTO applications
+                    (job_id, candidate_id, cv_text, match_score, skills_score, experience_score,
+                     matched_skills, missing_skills, analysis_result, experience_summary, status, applied_at,
+                     applicant_full_name, applicant_email, applicant_phone, current_salary,
+                     expected_salary, total_experience)
+                    SELECT j.id, u.id, :cv_text, :match_score, :skills_score, :experience_score,
+                           :matched_skills, :missing_skills, :analysis_result, :experience_summary, :status,
+                           COALESCE(:applied_at, CURRENT_TIMESTAMP), :applicant_full_name, :applicant_email,
+                           :applicant_phone, :current_salary, :expected_salary, :total_experience
+                    FROM jobs j
+                    JOIN users u ON u.email = :candidate_email
+                    WHERE j.id = COALESCE((SELECT id FROM jobs WHERE external_id = :job_external_id), :job_id)
+                    ON CONFLICT (job_id, candidate_id) DO NOTHING
+                ''', application_rows)
+                batch_inserted = conn.total_changes - changes_before - candidates_inserted
+            cursor.execute('COMMIT')
+
+            rows += len(batch)
+            inserted += batch_inserted
+            if progress:
+                progress(rows, inserted, time.perf_counter() - started)
+
+        cursor.execute('BEGIN')
+        if kind == 'jobs':
+            index_missing_job_terms(cursor)
+        else:
+            cursor.execute('SELECT DISTINCT job_id FROM applications WHERE id > ?', (last_application_id,))
+            build_score_sketches(cursor, [row[0] for row in cursor.fetchall()])
+        cursor.execute('COMMIT')
+    except Exception:
+        if conn.in_transaction:
+            cursor.execute('ROLLBACK')
+        raise
+    finally:
+        # Build the deferred indexes once over the loaded data
+        for sql in deferred_indexes:
+            cursor.execute(sql)
+        cursor.execute('ANALYZE')
+        conn.close()
+
+    seconds = time.perf_counter() - started
+    return {
+        'rows': rows,
+        'inserted': inserted,
+        'skipped': rows - inserted,
+        'seconds': seconds,
+        'rows_per_second': rows / seconds if seconds else 0
+    }
+
+# Recommendation functions
+MATCHING_STOPWORDS = frozenset('''
+    a about above across all also an and any are as at be been being both but by can could do does
+    during each etc for from has have having he her his how if in into is it its job may more most
+    must new not of on or other our out over per role she should so such than that the their them
+    then there these they this those through to under up us using very was we well were what when
+    where which while who will with within work would year years you your
+'''.split())
+MAX_VECTOR_TERMS = 200      # Terms kept per job/candidate vector
+MAX_QUERY_TERMS = 50        # Highest-weighted candidate terms used per query
+MAX_TERM_JOB_SHARE = 0.5    # Skip terms that appear in more than this share of jobs
+
+def tokenize_for_matching(text: str) -> List[str]:
+    """Split free text into lowercase terms used for job/CV matching."""
+    tokens = re.findall(r"[a-z][a-z0-9+#.]*[a-z0-9+#]", (text or "").lower())
+    return [token for token in tokens if token not in MATCHING_STOPWORDS]
+
+def build_term_vector(text: str) -> Dict[str, float]:
+    """Build an L2-normalized, log-scaled term frequency vector from text."""
+    counts = {}
+    for term in tokenize_for_matching(text):
+        counts[term] = counts.get(term, 0) + 1
+
+    weights = {term: 1 + math.log(count) for term, count in counts.items()}
+    if len(weights) > MAX_VECTOR_TERMS:
+        top_terms = sorted(weights, key=weights.get, reverse=True)[:MAX_VECTOR_TERMS]
+        weights = {term: weights[term] for term in top_terms}
+
+    norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+    if not norm:
+        return {}
+    return {term: weight / norm for term, weight in weights.items()}
+
+def index_job_terms(cursor, job_id: int, title: str, description: str, requirements: str):
+    """Precompute and store the term vector of a job posting (title counts double).
+
+    The job is marked as indexed even when its vector is empty, so it is not tokenized again.
+    """
+    vector = build_term_vector(f"{title}\n{title}\n{requirements}\n{description}")
+    cursor.execute('DELETE FROM job_terms WHERE job_id = ?', (job_id,))
+    cursor.executemany('''
+        INSERT INTO job_terms (term, job_id, weight) VALUES (?, ?, ?)
+    ''', [(term, job_id, weight) for term, weight in vector.items()])
+    cursor.execute('UPDATE jobs SET terms_indexed = 1 WHERE id = ?', (job_id,))
+
+def index_missing_job_terms(cursor) -> int:
+    """Compute term vectors for jobs not indexed yet; returns the number of jobs indexed."""
+    cursor.execute('SELECT id, title, description, requirements FROM jobs WHERE terms_indexed = 0')
+    jobs = cursor.fetchall()
+    for job in jobs:
+        index_job_terms(cursor, *job)
+    return len(jobs)
+
+def store_candidate_vector(cursor, candidate_id: int, cv_text: str):
+    """Store the term vector of a candidate's most recent CV."""
+    vector = build_term_vector(cv_text)
+    if not vector:
+        return
+    cursor.execute('''
+        INSERT INTO candidate_vectors (candidate_id, vector, updated_at)
+        VALUES (?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(candidate_id) DO UPDATE SET vector = excluded.vector, updated_at = excluded.updated_at
+    ''', (candidate_id, json.dumps(vector)))
+
+def get_candidate_vector(candidate_id: int) -> Dict[str, float]:
+    """Get the candidate's CV vector, building it from their latest application if needed."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('SELECT vector FROM candidate_vectors WHERE candidate_id = ?', (candidate_id,))
+    row = cursor.fetchone()
+
+    if row:
+        conn.close()
+        return json.loads(row[0])
+
+    cursor.execute('''
+        SELECT cv_text FROM applications
+        WHERE candidate_id = ? AND cv_text IS NOT NULL
+        ORDER BY applied_at DESC, id DESC LIMIT 1
+    ''', (candidate_id,))
+    row = cursor.fetchone()
+    if not row:
+        conn.close()
+        return {}
+
+    store_candidate_vector(cursor, candidate_id, row[0])
+    conn.commit()
+    conn.close()
+    return build_term_vector(row[0])
+
+def recommend_jobs(candidate_id: int, top_k: int = 10) -> List[Dict]:
+    """Rank active jobs the candidate has not applied to by similarity to their stored CV."""
+    candidate_vector = get_candidate_vector(candidate_id)
+    if not candidate_vector:
+        return []
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute('SELECT COUNT(*) FROM jobs WHERE is_active = 1')
+    total_jobs = cursor.fetchone()[0]
+    if not total_jobs:
+        conn.close()
+        return []
+
+    # Weight candidate terms by inverse document frequency over the posting index
+    placeholders = ','.join('?' * len(candidate_vector))
+    cursor.execute(f'''
+        SELECT term, COUNT(*) FROM job_terms WHERE term IN ({placeholders}) GROUP BY term
+    ''', list(candidate_vector))
+    document_frequency = dict(cursor.fetchall())
+
+    query_weights = {}
+    for term, weight in candidate_vector.items():
+        frequency = document_frequency.get(term, 0)
+        if not frequency or (total_jobs >= 10 and frequency > total_jobs * MAX_TERM_JOB_SHARE):
+            continue
+        query_weights[term] = weight * (1 + math.log(total_jobs / frequency))
+
+    if not query_weights:
+        conn.close()
+        return []
+
+    top_terms = sorted(query_weights, key=query_weights.get, reverse=True)[:MAX_QUERY_TERMS]
+    query_norm = math.sqrt(sum(query_weights[term] ** 2 for term in top_terms))
+
+    cursor.execute('CREATE TEMP TABLE IF NOT EXISTS query_terms (term TEXT PRIMARY KEY, weight REAL)')
+    cursor.execute('DELETE FROM query_terms')
+    cursor.executemany('INSERT INTO query_terms (term, weight) VALUES (?, ?)',
+                       [(term, query_weights[term] / query_norm) for term in top_terms])
+
+    # Sparse dot product over the posting lists of the query terms only
+    cursor.execute('''
+        SELECT j.id, j.title, j.description, j.requirements, j.department, j.location,
+               j.salary_range, j.created_at, u.full_name as created_by_name, s.similarity
+        FROM (
+            SELECT jt.job_id, SUM(jt.weight * q.weight) AS similarity
+            FROM query_terms q
+            JOIN job_terms jt ON jt.term = q.term
+            GROUP BY jt.job_id
+        ) s
+        JOIN jobs j ON j.id = s.job_id
+        LEFT JOIN users u ON j.created_by = u.id
+        WHERE j.is_active = 1
+          AND j.id NOT IN (SELECT job_id FROM applications WHERE candidate_id = ?)
+        ORDER BY s.similarity DESC
+        LIMIT ?
+    ''', (candidate_id, top_k))
+    jobs = cursor.fetchall()
+    conn.close()
+
+    return [{
+        'id': job[0],
+        'title': job[1],
+        'description': job[2],
+        'requirements': job[3],
+        'department': job[4],
+        'location': job[5],
+        'salary_range': job[6],
+        'created_at': job[7],
+        'created_by_name': job[8],
+        'similarity': job[9]
+    } for job in jobs]
+
+# Duplicate detection functions
+MINHASH_PERMUTATIONS = 128
+MINHASH_SHINGLE_SIZE = 3        # words per shingle
+LSH_BANDS = 16                  # 16 bands x 8 rows: pairs above ~0.7 Jaccard share a bucket with high probability
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.8"))  # estimated Jaccard similarity
+REUSE_DUPLICATE_ANALYSIS = os.getenv("REUSE_DUPLICATE_ANALYSIS", "true").lower() == "true"
+_MINHASH_PRIME = (1 << 61) - 1
+_minhash_random = random.Random(1230)
+_MINHASH_PARAMS = [(_minhash_random.randrange(1, _MINHASH_PRIME), _minhash_random.randrange(0, _MINHASH_PRIME))
+                   for _ in range(MINHASH_PERMUTATIONS)]
+
+def _stable_hash(data: bytes) -> int:
+    """64-bit hash that, unlike hash(), is the same in every process."""
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+def compute_minhash(cv_text: str) -> Optional[List[int]]:
+    """MinHash signature of the CV's word shingles; None if the text is too short to compare."""
+    words = re.findall(r"[a-z0-9]+", (cv_text or "").lower())
+    if len(words) < MINHASH_SHINGLE_SIZE:
+        return None
+    shingles = {_stable_hash(' '.join(words[i:i + MINHASH_SHINGLE_SIZE]).encode('utf-8'))
+                for i in range(len(words) - MINHASH_SHINGLE_SIZE + 1)}
+    return [min((a * shingle + b) % _MINHASH_PRIME for shingle in shingles) for a, b in _MINHASH_PARAMS]
+
+def _lsh_buckets(signature: List[int]) -> List[Tuple[int, int]]:
+    """(band, bucket) keys of a signature; each bucket is a signed 64-bit hash of the band's rows."""
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = array('Q', signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]).tobytes()
+        bucket = int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), 'little', signed=True)
+        buckets.append((band, bucket))
+    return buckets
+
+def find_duplicate_cv(signature: Optional[List[int]], threshold: float = DUPLICATE_THRESHOLD,
+                      exclude_candidate_id: Optional[int] = None) -> Optional[Dict]:
+    """Find the most similar earlier CV sharing an LSH bucket, if its estimated Jaccard similarity reaches threshold.
+
+    CVs of exclude_candidate_id are skipped, e.g. to find only CVs from other accounts.
+    """
+    if not signature:
+        return None
+    buckets = _lsh_buckets(signature)
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        WITH keys (band, bucket) AS (VALUES {','.join(['(?, ?)'] * len(buckets))})
+        SELECT DISTINCT s.application_id, s.job_id, s.candidate_id, s.signature, s.work_experience
+        FROM keys
+        CROSS JOIN cv_lsh_buckets b ON b.band = keys.band AND b.bucket = keys.bucket
+        JOIN cv_signatures s ON s.application_id = b.application_id
+    ''', [value for key in buckets for value in key])
+    candidates = cursor.fetchall()
+    conn.close()
+
+    best = None
+    for application_id, job_id, candidate_id, stored, work_experience in candidates:
+        if exclude_candidate_id is not None and candidate_id == exclude_candidate_id:
+            continue
+        stored_signature = array('Q', stored)
+        similarity = sum(1 for x, y in zip(signature, stored_signature) if x == y) / MINHASH_PERMUTATIONS
+        if similarity >= threshold and (best is None or similarity > best['similarity']):
+            best = {
+                'application_id': application_id,
+                'job_id': job_id,
+                'candidate_id': candidate_id,
+                'similarity': similarity,
+                'work_experience': json.loads(work_experience) if work_experience else None
+            }
+    return best
+
+def store_cv_signature(cursor, application_id: int, job_id: int, candidate_id: int,
+                       signature: Optional[List[int]], work_experience: Optional[Dict] = None):
+    """Store an application's MinHash signature and LSH buckets."""
+    if not signature:
+        return
+    cursor.execute('''
+        INSERT OR REPLACE INTO cv_signatures (application_id, job_id, candidate_id, signature, work_experience)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (application_id, job_id, candidate_id, array('Q', signature).tobytes(),
+          json.dumps(work_experience) if work_experience else None))
+    cursor.executemany('INSERT OR IGNORE INTO cv_lsh_buckets (band, bucket, application_id) VALUES (?, ?, ?)',
+                       [(band, bucket, application_id) for band, bucket in _lsh_buckets(signature)])
+
+def index_missing_cv_signatures(batch_size: int = 500) -> int:
+    """Compute signatures for stored applications that have none (e.g. imported or older ones)."""
+    indexed = 0
+    last_id = 0
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    while True:
+        cursor.execute('''
+            SELECT a.id, a.job_id, a.candidate_id, a.cv_text FROM applications a
+            WHERE a.cv_text IS NOT NULL AND a.id > ?
+              AND NOT EXISTS (SELECT 1 FROM cv_signatures s WHERE s.application_id = a.id)
+            ORDER BY a.id
+            LIMIT ?
+        ''', (last_id, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        for application_id, job_id, candidate_id, cv_text in rows:
+            store_cv_signature(cursor, application_id, job_id, candidate_id, compute_minhash(cv_text))
+        conn.commit()
+        indexed += len(rows)
+        last_id = rows[-1][0]
+    conn.close()
+    return indexed
+
+# LLM scheduling
+PRIORITY_INTERACTIVE = 0    # Candidate submissions waiting on screen
+PRIORITY_HR = 1             # HR on-demand actions
+PRIORITY_SPECULATIVE = 2    # CVs analyzed before the candidate has submitted
+PRIORITY_BATCH = 3          # Bulk screening and re-scoring
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_HR: 'hr_on_demand',
+                  PRIORITY_SPECULATIVE: 'speculative', PRIORITY_BATCH: 'batch'}
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_CLASS_CONCURRENCY = {
+    PRIORITY_INTERACTIVE: int(os.getenv("LLM_INTERACTIVE_CONCURRENCY", str(LLM_MAX_CONCURRENCY))),
+    PRIORITY_HR: int(os.getenv("LLM_HR_CONCURRENCY", "2")),
+    PRIORITY_SPECULATIVE: int(os.getenv("LLM_SPECULATIVE_CONCURRENCY", "2")),
+    PRIORITY_BATCH: int(os.getenv("LLM_BATCH_CONCURRENCY", "1")),
+}
+
+class LLMScheduler:
+    """Share the LLM quota between priority classes and, within a class, between owners.
+
+    Every LLM request takes a slot before it is sent. Free slots always go to the highest
+    priority class that is under its concurrency limit, so queued batch work yields to
+    interactive requests at the next request boundary. Inside a class, owners (HR users)
+    are served round-robin so one large batch cannot starve another user's work.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, class_limits: Optional[Dict[int, int]] = None):
+        self.max_concurrency = max_concurrency
+        self.class_limits = dict(class_limits or LLM_CLASS_CONCURRENCY)
+        self._condition = threading.Condition()
+        self._queues = {priority: OrderedDict() for priority in PRIORITY_NAMES}
+        self._running = {priority: 0 for priority in PRIORITY_NAMES}
+        self._waits = {priority: deque(maxlen=1000) for priority in PRIORITY_NAMES}
+        self._served = {priority: 0 for priority in PRIORITY_NAMES}
+
+    def _dispatch(self):
+        """Grant free slots to waiting requests, highest priority class first."""
+        for priority in sorted(self._queues):
+            owners = self._queues[priority]
+            while (owners and self._running[priority] < self.class_limits[priority]
+                   and sum(self._running.values()) < self.max_concurrency):
+                owner, tickets = next(iter(owners.items()))
+                ticket = tickets.popleft()
+                if tickets:
+                    owners.move_to_end(owner)
+                else:
+                    del owners[owner]
+                ticket['granted'] = time.perf_counter()
+                self._running[priority] += 1
+        self._condition.notify_all()
+
+    def run(self, priority: int, owner, fn, *args, **kwargs):
+        """Run fn once a slot for this priority class is granted, and release the slot afterwards."""
+        ticket = {'enqueued': time.perf_counter(), 'granted': None}
+        with self._condition:
+            self._queues[priority].setdefault(owner, deque()).append(ticket)
+            self._dispatch()
+            while ticket['granted'] is None:
+                self._condition.wait()
+            self._waits[priority].append((ticket['granted'] - ticket['enqueued']) * 1000)
+            self._served[priority] += 1
+
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._condition:
+                self._running[priority] -= 1
+                self._dispatch()
+
+    def stats(self) -> List[Dict]:
+        """Queue length, running requests and queue wait percentiles per priority class."""
+        with self._condition:
+            rows = []
+            for priority, name in PRIORITY_NAMES.items():
+                waits = sorted(self._waits[priority])
+                rows.append({
+                    'class': name,
+                    'concurrency_limit': self.class_limits[priority],
+                    'queued': sum(len(tickets) for tickets in self._queues[priority].values()),
+                    'running': self._running[priority],
+                    'served': self._served[priority],
+                    'wait_p50_ms': round(waits[len(waits) // 2], 1) if waits else None,
+                    'wait_p95_ms': round(waits[int(len(waits) * 0.95)], 1) if waits else None,
+                    'wait_max_ms': round(waits[-1], 1) if waits else None
+                })
+            return rows
+
+@st.cache_resource
+def get_llm_scheduler() -> LLMScheduler:
+    """Process-wide scheduler shared by every Streamlit session."""
+    return LLMScheduler()
+
+# LLM usage and budget functions
+LLM_MODEL = os.getenv("GROQ_MODEL", "llama3-8b-8192")
+
+# USD per million (prompt, completion) tokens; override with LLM_PRICING='{"model": [in, out]}'
+MODEL_PRICING = {
+    "llama3-8b-8192": (0.05, 0.08),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "llama3-70b-8192": (0.59, 0.79),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+}
+try:
+    MODEL_PRICING.update({model: (float(prices[0]), float(prices[1]))
+                          for model, prices in json.loads(os.getenv("LLM_PRICING", "{}")).items()})
+except (ValueError, TypeError, KeyError, IndexError, AttributeError) as e:
+    print(f"Warning: Ignoring invalid LLM_PRICING {os.getenv('LLM_PRICING')!r}, using the built-in prices: {e}")
+
+# Default budgets applied to HR users without their own limits (unset means unlimited)
+DEFAULT_DAILY_BUDGET_USD = float(os.getenv("LLM_DAILY_BUDGET_USD")) if os.getenv("LLM_DAILY_BUDGET_USD") else None
+DEFAULT_MONTHLY_BUDGET_USD = float(os.getenv("LLM_MONTHLY_BUDGET_USD")) if os.getenv("LLM_MONTHLY_BUDGET_USD") else None
+
+def estimate_llm_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimate the USD cost of a call from the model's token pricing."""
+    prompt_price, completion_price = MODEL_PRICING.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+def chat_completion(client, prompt: str, call_type: str, usage_log: Optional[List[Dict]] = None,
+                    model: str = LLM_MODEL, temperature: float = 0.2, max_tokens: int = 1000,
+                    priority: int = PRIORITY_INTERACTIVE, owner=None,
+                    history: Optional[List[Dict]] = None) -> str:
+    """Run a Groq chat completion through the scheduler and log its token usage, queue wait and latency.
+
+    history holds earlier messages of the conversation, e.g. for a follow-up question.
+    """
+    queued = time.perf_counter()
+    timing = {}
+
+    def send():
+        timing['started'] = time.perf_counter()
+        return client.chat.completions.create(
+            messages=(history or []) + [{"role": "user", "content": prompt}],
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+
+    response = get_llm_scheduler().run(priority, owner, send)
+    latency_ms = (time.perf_counter() - timing['started']) * 1000
+
+    if usage_log is not None:
+        usage = getattr(response, 'usage', None)
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        usage_log.append({
+            'call_type': call_type,
+            'model': model,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'latency_ms': latency_ms,
+            'queue_ms': (timing['started'] - queued) * 1000,
+            'cost_usd': estimate_llm_cost(model, prompt_tokens, completion_tokens)
+        })
+
+    return response.choices[0].message.content
+
+def log_local_call(usage_log: Optional[List[Dict]], call_type: str, started: float):
+    """Record a step that was served locally instead of by the LLM."""
+    if usage_log is not None:
+        usage_log.append({
+            'call_type': call_type,
+            'model': 'local',
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+            'latency_ms': (time.perf_counter() - started) * 1000,
+            'queue_ms': 0.0,
+            'cost_usd': 0.0
+        })
+
+def record_llm_usage(cursor, usage_log: Optional[List[Dict]], job_id: int, candidate_id: int,
+                     application_id: Optional[int] = None):
+    """Store usage entries collected during an application's analysis."""
+    if not usage_log:
+        return
+    cursor.executemany('''
+        INSERT INTO llm_usage
+        (application_id, job_id, hr_id, candidate_id, call_type, model, prompt_tokens,
+         completion_tokens, total_tokens, latency_ms, queue_ms, cost_usd)
+        VALUES (?, ?, (SELECT created_by FROM jobs WHERE id = ?), ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(
+        application_id, job_id, job_id, candidate_id,
+        entry['call_type'], entry['model'],
+        entry['prompt_tokens'], entry['completion_tokens'],
+        entry['prompt_tokens'] + entry['completion_tokens'],
+        entry['latency_ms'], entry.get('queue_ms', 0), entry['cost_usd']
+    ) for entry in usage_log])
+
+def get_llm_budget(hr_id: int) -> Dict:
+    """Get the daily/monthly LLM budget for an HR user, falling back to the defaults."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('SELECT daily_limit_usd, monthly_limit_usd FROM llm_budgets WHERE hr_id = ?', (hr_id,))
+    row = cursor.fetchone()
+    conn.close()
+
+    daily, monthly = row if row else (None, None)
+    return {
+        'daily_limit_usd': daily if daily is not None else DEFAULT_DAILY_BUDGET_USD,
+        'monthly_limit_usd': monthly if monthly is not None else DEFAULT_MONTHLY_BUDGET_USD
+    }
+
+def set_llm_budget(hr_id: int, daily_limit_usd: Optional[float], monthly_limit_usd: Optional[float]) -> bool:
+    """Set the LLM budget for an HR user (None removes a limit)."""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO llm_budgets (hr_id, daily_limit_usd, monthly_limit_usd, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(hr_id) DO UPDATE SET
+                daily_limit_usd = excluded.daily_limit_usd,
+                monthly_limit_usd = excluded.monthly_limit_usd,
+                updated_at = excluded.updated_at
+        ''', (hr_id, daily_limit_usd, monthly_limit_usd))
+        conn.commit()
+        conn.close()
+        return True
+    except sqlite3.Error as e:
+        print(f"Error saving LLM budget: {str(e)}")
+        return False
+
+def get_llm_spend(hr_id: int) -> Dict:
+    """Get today's and this month's LLM spend for an HR user."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT
+            COALESCE(SUM(CASE WHEN created_at >= DATE('now') THEN cost_usd END), 0),
+            COALESCE(SUM(cost_usd), 0)
+        FROM llm_usage
+        WHERE hr_id = ? AND created_at >= DATE('now', 'start of month')
+    ''', (hr_id,))
+    today, month = cursor.fetchone()
+    conn.close()
+    return {'today_usd': today, 'month_usd': month}
+
+def is_llm_budget_exceeded(hr_id: Optional[int], fraction: float = 1.0) -> bool:
+    """Check whether an HR user's daily or monthly LLM budget has been used up (or the given fraction of it)."""
+    if hr_id is None:
+        return False
+    budget = get_llm_budget(hr_id)
+    if budget['daily_limit_usd'] is None and budget['monthly_limit_usd'] is None:
+        return False
+
+    spend = get_llm_spend(hr_id)
+    if budget['daily_limit_usd'] is not None and spend['today_usd'] >= fraction * budget['daily_limit_usd']:
+        return True
+    if budget['monthly_limit_usd'] is not None and spend['month_usd'] >= fraction * budget['monthly_limit_usd']:
+        return True
+    return False
+
+def get_llm_usage_report(hr_id: int) -> Dict[str, List[Dict]]:
+    """Get an HR user's LLM usage aggregated per job and per day."""
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT COALESCE(j.title, 'Deleted job') AS job, u.applications, u.calls, u.llm_calls,
+               u.prompt_tokens, u.completion_tokens, u.total_tokens,
+               ROUND(u.latency_ms / u.calls) AS avg_latency_ms, ROUND(u.queue_ms / u.calls) AS avg_queue_ms,
+               ROUND(u.cost_usd, 4) AS cost_usd,
+               ROUND(u.cost_usd / MAX(u.applications, 1), 5) AS cost_per_application_usd
+        FROM llm_usage_by_job u
+        LEFT JOIN jobs j ON j.id = u.job_id
+        WHERE u.hr_id = ?
+        ORDER BY u.cost_usd DESC
+    ''', (hr_id,))
+    by_job = [dict(row) for row in cursor.fetchall()]
+    cursor.execute('''
+        SELECT day, applications, calls, llm_calls, prompt_tokens, completion_tokens, total_tokens,
+               ROUND(latency_ms / calls) AS avg_latency_ms, ROUND(queue_ms / calls) AS avg_queue_ms,
+               ROUND(cost_usd, 4) AS cost_usd
+        FROM llm_usage_by_day
+        WHERE hr_id = ?
+        ORDER BY day DESC
+        LIMIT 90
+    ''', (hr_id,))
+    by_day = [dict(row) for row in cursor.fetchall()]
+    cursor.execute('''
+        SELECT applications, calls, llm_calls, total_tokens, cost_usd FROM llm_usage_by_hr WHERE hr_id = ?
+    ''', (hr_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return {'by_job': by_job, 'by_day': by_day, 'totals': dict(row) if row else {}}
+
+# Structured LLM output
+def _coerce_score(value) -> int:
+    """Integer score from 1 to 10 (accepts 7, 7.0, "7" or "7/10")."""
+    if isinstance(value, bool):
+        raise ValueError("not a score")
+    if isinstance(value, str):
+        match = re.match(r"\s*(\d+(?:\.\d+)?)", value)
+        if not match:
+            raise ValueError("not a score")
+        value = match.group(1)
+    score = round(float(value))
+    if not 1 <= score <= 10:
+        raise ValueError("score out of range")
+    return score
+
+def _coerce_text(value) -> str:
+    """Non-empty string."""
+    if isinstance(value, (dict, list)) or value is None or not str(value).strip():
+        raise ValueError("not text")
+    return str(value).strip()
+
+def _coerce_text_list(value) -> List[str]:
+    """List of strings (a comma-separated string is split)."""
+    if isinstance(value, str):
+        value = [part for part in re.split(r"\s*[,;]\s*", value) if part]
+    if not isinstance(value, list):
+        raise ValueError("not a list")
+    return [str(item).strip() for item in value if isinstance(item, (str, int, float)) and str(item).strip()]
+
+def _coerce_experience_list(value) -> List[Dict]:
+    """List of work experience entries, each with a start date."""
+    if not isinstance(value, list):
+        raise ValueError("not a list")
+    entries = []
+    for item in value:
+        if isinstance(item, dict) and item.get("start_date"):
+            entries.append({
+                "position": str(item.get("position") or ""),
+                "company": str(item.get("company") or ""),
+                "start_date": str(item["start_date"]),
+                "end_date": str(item.get("end_date") or "Present")
+            })
+    return entries
+
+# Field name -> coercer; a coercer returns the cleaned value or raises ValueError
+ANALYSIS_SCHEMA = {
+    "score": _coerce_score,
+    "experience_relevance_score": _coerce_score,
+    "skills_match_score": _coerce_score,
+    "explanation": _coerce_text,
+    "key_skills_matched": _coerce_text_list,
+    "missing_skills": _coerce_text_list,
+    "experience_summary": _coerce_text,
+}
+WORK_EXPERIENCE_SCHEMA = {
+    "work_experience": _coerce_experience_list,
+}
+SCHEMA_FIELD_HINTS = {
+    _coerce_score: "integer from 1 to 10",
+    _coerce_text: "string",
+    _coerce_text_list: "list of strings",
+    _coerce_experience_list: 'list of {"position", "company", "start_date": "YYYY-MM", "end_date": "YYYY-MM or Present"}',
+}
+
+def extract_json_text(text: str) -> Optional[str]:
+    """Cut the first JSON object or array out of fenced or prose-wrapped LLM output.
+
+    A truncated value is returned up to the end of the text so repair_json can close it.
+    """
+    fenced = re.search(r"```(?:json)?\s*(.*?)(?:```|$)", text, re.DOTALL | re.IGNORECASE)
+    if fenced and fenced.group(1).strip():
+        text = fenced.group(1)
+
+    start = next((index for index, char in enumerate(text) if char in "{["), None)
+    if start is None:
+        return None
+
+    depth, in_string, escaped = 0, False, False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    return text[start:]
+
+def repair_json(text: str) -> str:
+    """Fix common LLM JSON defects: smart quotes, comments, Python literals, trailing commas, truncation."""
+    text = text.replace("“", '"').replace("”", '"').replace("‘", "'").replace("’", "'")
+    if '"' not in text:
+        text = text.replace("'", '"')
+    text = re.sub(r"^\s*//.*$", "", text, flags=re.MULTILINE)
+    text = re.sub(r":\s*True\b", ": true", text)
+    text = re.sub(r":\s*False\b", ": false", text)
+    text = re.sub(r":\s*None\b", ": null", text)
+
+    # Close whatever a truncated response left open
+    stack, in_string, escaped = [], False, False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    if stack:
+        text = re.sub(r'("[^"]*"\s*:\s*|,\s*)$', "", text.rstrip())
+        text += "".join(reversed(stack))
+
+    return re.sub(r",\s*([}\]])", r"\1", text)
+
+def parse_llm_json(text: str):
+    """Parse LLM output as JSON, extracting and repairing it when needed. Returns None if hopeless."""
+    if not text:
+        return None
+    candidates = [text.strip()]
+    extracted = extract_json_text(text)
+    if extracted:
+        candidates += [extracted, repair_json(extracted)]
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+def validate_llm_output(data, schema: Dict) -> Tuple[Dict, List[str]]:
+    """Coerce parsed output to the schema; returns the valid fields and the missing/invalid field names."""
+    if isinstance(data, list) and len(schema) == 1:
+        data = {next(iter(schema)): data}
+    if not isinstance(data, dict):
+        return {}, list(schema)
+
+    clean, missing = {}, []
+    for field, coerce in schema.items():
+        try:
+            clean[field] = coerce(data[field])
+        except (KeyError, ValueError, TypeError):
+            missing.append(field)
+    return clean, missing
+
+def structured_completion(client, prompt: str, schema: Dict, call_type: str, usage_log=None,
+                          max_reasks: int = 1, **completion_args) -> Tuple[Dict, List[str]]:
+    """Run a completion, parse and validate it, and re-ask only for fields that are missing or invalid."""
+    raw = chat_completion(client, prompt, call_type, usage_log, **completion_args)
+    data, missing = validate_llm_output(parse_llm_json(raw), schema)
+
+    history = [{"role": "user", "content": prompt}, {"role": "assistant", "content": raw}]
+    for _ in range(max_reasks):
+        if not missing:
+            break
+        print(f"{call_type}: re-asking for {', '.join(missing)}")
+        fields = ", ".join(f'"{field}" ({SCHEMA_FIELD_HINTS[schema[field]]})' for field in missing)
+        follow_up = (f"Your answer was missing or had invalid values for: {fields}. "
+                     f"Reply with only a JSON object containing exactly these fields.")
+        raw = chat_completion(client, follow_up, f"{call_type}:reask", usage_log, history=history,
+                              **dict(completion_args, max_tokens=400))
+        extra, missing = validate_llm_output(parse_llm_json(raw), {field: schema[field] for field in missing})
+        data.update(extra)
+
+    return data, missing
+
+# CV Analysis functions
+def extract_text_from_pdf(pdf_file, pdf_path: Optional[str] = None):
+    """Extract text content from a PDF file with robust error handling.
+
+    Pages without a usable text layer are OCRed on the shared OCR pool; pdf_path lets the OCR
+    tools read the file in place instead of from a temporary copy. An unparseable PDF yields ""
+    so that is_cv_text_readable rejects it.
+    """
+    import PyPDF2
+
+    try:
+        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        started = time.perf_counter()
+        pages = [page.extract_text() or "" for page in pdf_reader.pages]
+        scanned = [number for number, text in enumerate(pages) if page_needs_ocr(text)]
+        pool = get_ocr_pool()
+        pool.record(text_layer_pages=len(pages) - len(scanned), text_layer_seconds=time.perf_counter() - started)
+
+        if scanned:
+            for number, text in pool.ocr_pages(pdf_file, pdf_path, scanned).items():
+                if text.strip():
+                    pages[number] = text
+        return "\n".join(pages)
+    except Exception as e:
+        print(f"Error parsing PDF: {str(e)}")
+        return ""
+
+# Scanned PDF OCR
+OCR_MIN_PAGE_CHARS = int(os.getenv("OCR_MIN_PAGE_CHARS", "40"))
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+OCR_PAGE_TIMEOUT = float(os.getenv("OCR_PAGE_TIMEOUT", "30"))
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+OCR_LANGUAGE = os.getenv("OCR_LANGUAGE", "eng")
+
+def page_needs_ocr(text: str) -> bool:
+    """A page lacks a usable text layer when it yields almost no text, or mostly non-word glyphs."""
+    visible = re.sub(r"\s+", "", text)
+    if len(visible) < OCR_MIN_PAGE_CHARS:
+        return True
+    return sum(char.isalnum() for char in visible) / len(visible) < 0.5
+
+def is_cv_text_readable(cv_text: str) -> bool:
+    """Whether extraction produced enough text to analyze, rather than scoring an empty CV."""
+    return not page_needs_ocr(cv_text or "")
+
+def get_cached_ocr_text(page_hash: str) -> Optional[str]:
+    """OCR text of a rendered page seen before."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('SELECT text FROM ocr_cache WHERE page_hash = ?', (page_hash,))
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else None
+
+def store_ocr_text(page_hash: str, text: str, seconds: float):
+    """Cache the OCR text of a rendered page."""
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute('INSERT OR REPLACE INTO ocr_cache (page_hash, text, seconds) VALUES (?, ?, ?)',
+                 (page_hash, text, seconds))
+    conn.commit()
+    conn.close()
+
+class OCRPool:
+    """Bounded pool of local Tesseract workers shared by every session.
+
+    Each page is rendered with pdftoppm and recognized with tesseract in subprocesses that are
+    killed after OCR_PAGE_TIMEOUT. Results are cached by the SHA-256 of the rendered page, so
+    the same scan uploaded again is not recognized twice.
+    """
+
+    def __init__(self, workers: int = OCR_WORKERS):
+        self.available = bool(shutil.which('pdftoppm') and shutil.which('tesseract'))
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ocr')
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._stats = {'text_layer_pages': 0, 'text_layer_seconds': 0.0, 'ocr_pages': 0, 'ocr_seconds': 0.0,
+                       'cache_hits': 0, 'timeouts': 0, 'failures': 0, 'unavailable': 0}
+
+    def record(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self._stats[name] += value
+
+    def _ocr_page(self, pdf_path: str, page_number: int) -> str:
+        """Render and recognize one page (1-based); raises subprocess.TimeoutExpired past the deadline."""
+        started = time.perf_counter()
+        image = subprocess.run(
+            ['pdftoppm', '-f', str(page_number), '-l', str(page_number), '-r', str(OCR_DPI), '-gray', '-png',
+             '-singlefile', pdf_path],
+            capture_output=True, timeout=OCR_PAGE_TIMEOUT, check=True
+        ).stdout
+        page_hash = hashlib.sha256(image).hexdigest()
+        cached = get_cached_ocr_text(page_hash)
+        if cached is not None:
+            self.record(cache_hits=1)
+            return cached
+
+        remaining = OCR_PAGE_TIMEOUT - (time.perf_counter() - started)
+        if remaining <= 0:
+            raise subprocess.TimeoutExpired('pdftoppm', OCR_PAGE_TIMEOUT)
+        text = subprocess.run(['tesseract', 'stdin', 'stdout', '-l', OCR_LANGUAGE], input=image,
+                              capture_output=True, timeout=remaining, check=True).stdout.decode('utf-8', 'replace')
+        seconds = time.perf_counter() - started
+        store_ocr_text(page_hash, text, seconds)
+        self.record(ocr_pages=1, ocr_seconds=seconds)
+        return text
+
+    def ocr_pages(self, pdf_file, pdf_path: Optional[str], page_numbers: List[int]) -> Dict[int, str]:
+        """OCR the given 0-based pages of a PDF; pages that fail or time out are left out."""
+        if not self.available:
+            self.record(unavailable=len(page_numbers))
+            print("Scanned PDF pages found but pdftoppm/tesseract are not installed; skipping OCR")
+            return {}
+
+        temp_path = None
+        if pdf_path is None:
+            # The OCR tools need a file; copy the upload once
+            with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
+                pdf_file.seek(0)
+                while True:
+                    chunk = pdf_file.read(BLOB_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    temp_file.write(chunk)
+            pdf_path = temp_path = temp_file.name
+
+        try:
+            futures = {number: self.executor.submit(self._ocr_page, pdf_path, number + 1) for number in page_numbers}
+            results = {}
+            for number, future in futures.items():
+                try:
+                    results[number] = future.result()
+                except subprocess.TimeoutExpired:
+                    self.record(timeouts=1)
+                    print(f"OCR of page {number + 1} timed out after {OCR_PAGE_TIMEOUT:g}s")
+                except (subprocess.CalledProcessError, OSError) as e:
+                    self.record(failures=1)
+                    print(f"OCR of page {number + 1} failed: {str(e)}")
+            return results
+        finally:
+            if temp_path:
+                os.remove(temp_path)
+
+    def stats(self) -> List[Dict]:
+        """Pages, time and throughput of the text-layer fast path and of OCR, since server start."""
+        with self._lock:
+            stats = dict(self._stats)
+        return [{
+            'path': 'text layer',
+            'pages': stats['text_layer_pages'],
+            'avg_ms_per_page': round(stats['text_layer_seconds'] * 1000 / stats['text_layer_pages'], 1)
+                               if stats['text_layer_pages'] else None,
+            'pages_per_second': round(stats['text_layer_pages'] / stats['text_layer_seconds'], 1)
+                                if stats['text_layer_seconds'] else None,
+            'cache_hits': None, 'timeouts': None, 'failures': None
+        }, {
+            'path': f"OCR ({self.workers} workers)" if self.available else "OCR (not installed)",
+            'pages': stats['ocr_pages'],
+            'avg_ms_per_page': round(stats['ocr_seconds'] * 1000 / stats['ocr_pages'], 1) if stats['ocr_pages'] else None,
+            # Each worker handles one page at a time, so the pool's capacity is workers times this
+            'pages_per_second': round(stats['ocr_pages'] / stats['ocr_seconds'], 2) if stats['ocr_seconds'] else None,
+            'cache_hits': stats['cache_hits'],
+            'timeouts': stats['timeouts'],
+            'failures': stats['failures'] + stats['unavailable']
+        }]
+
+@st.cache_resource
+def get_ocr_pool() -> OCRPool:
+    """Process-wide OCR pool shared by every Streamlit session."""
+    return OCRPool()
+
+# Local work experience extraction
+LOCAL_EXTRACTION_MIN_CONFIDENCE = float(os.getenv("LOCAL_EXTRACTION_MIN_CONFIDENCE", "0.7"))
+
+_MONTH_PATTERN = (r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+                  r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?")
+_DATE_PATTERN = (rf"(?:{_MONTH_PATTERN}\s*'?,?\s*\d{{4}}|\d{{4}}[-/.]\d{{1,2}}(?![\d])|\d{{1,2}}[-/.]\d{{4}}"
+                 rf"|\d{{4}})")
+_OPEN_END_PATTERN = r"(?:present|current(?:ly)?|now|today|to date)"
+# "Mar 2020 to date": the "to" is taken as the separator, so a bare "date" after it is an open end
+DATE_RANGE_REGEX = re.compile(
+    rf"\b(?P<start>{_DATE_PATTERN})\s*(?:-|–|—|to|until|till|through)\s*"
+    rf"(?P<end>{_DATE_PATTERN}|{_OPEN_END_PATTERN}|(?<=\bto\s)date)\b",
+    re.IGNORECASE
+)
+_MONTHS = {name: index for index, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], start=1)}
+_TITLE_KEYWORDS = re.compile(
+    r"\b(engineer|developer|programmer|manager|analyst|intern|consultant|designer|lead|director|"
+    r"specialist|officer|assistant|scientist|architect|administrator|coordinator|executive|associate|"
+    r"head|president|accountant|teacher|lecturer|nurse|technician|representative|supervisor|"
+    r"researcher|advisor|auditor|editor|writer|owner|founder|trainee|clerk|agent|recruiter|tester)s?\b",
+    re.IGNORECASE
+)
+_COMPANY_KEYWORDS = re.compile(
+    r"\b(inc|ltd|llc|llp|plc|corp|corporation|co|company|gmbh|group|technologies|technology|solutions|"
+    r"systems|labs|bank|consulting|services|partners|pvt|limited|agency|studio|hospital|university)\b\.?",
+    re.IGNORECASE
+)
+_PERSONAL_KEYWORDS = re.compile(r"\b(birth|born|dob|d\.o\.b|nationality|citizenship|visa)\b", re.IGNORECASE)
+_EDUCATION_KEYWORDS = re.compile(
+    r"\b(bachelor|master|b\.?sc|m\.?sc|bs|ms|mba|phd|degree|diploma|school|college|gpa|graduat\w*)\b",
+    re.IGNORECASE
+)
+
+def _parse_cv_date(value: str, is_end: bool = False) -> Optional[str]:
+    """Normalize a CV date fragment to YYYY-MM, 'Present', or None if invalid."""
+    value = value.strip().lower()
+    if is_end and value == "date" or re.fullmatch(_OPEN_END_PATTERN, value):
+        return "Present"
+
+    month_match = re.match(r"([a-z]{3})[a-z]*\.?\s*'?,?\s*(\d{4})", value)
+    if month_match:
+        year, month = int(month_match.group(2)), _MONTHS.get(month_match.group(1))
+    elif re.fullmatch(r"\d{4}[-/.]\d{1,2}", value):
+        year, month = (int(part) for part in re.split(r"[-/.]", value))
+    elif re.fullmatch(r"\d{1,2}[-/.]\d{4}", value):
+        month, year = (int(part) for part in re.split(r"[-/.]", value))
+    else:
+        year, month = int(value), 12 if is_end else 1
+
+    today = datetime.date.today()
+    if not month or not 1 <= month <= 12 or not 1950 <= year <= today.year:
+        return None
+    if is_end and (year, month) > (today.year, today.month):
+        return "Present"
+    return f"{year:04d}-{month:02d}"
+
+def _split_title_company(context: str):
+    """Split the text around a date range into (position, company)."""
+    parts = [part.strip(" ,|-–—:•*\t") for part in re.split(r"\s+(?:at|@)\s+|\s*[|,–—•]\s*|\s+-\s+", context)]
+    parts = [part for part in parts if part and len(part) <= 80]
+    if not parts:
+        return "", ""
+
+    position = next((part for part in parts if _TITLE_KEYWORDS.search(part)), "")
+    company = next((part for part in parts if part != position and _COMPANY_KEYWORDS.search(part)), "")
+    if not company:
+        company = next((part for part in parts if part != position), "")
+    if not position and company != parts[0]:
+        position = parts[0]
+    return position, company
+
+def extract_work_experience_local(cv_text: str) -> Dict:
+    """Extract work experience entries with date-range rules, without calling an LLM.
+
+    Returns the same {"work_experience": [...]} shape as extract_work_experience plus a
+    "confidence" between 0 and 1: how complete the least complete entry is, so one doubtful
+    entry is enough to send the CV to the LLM.
+    """
+    lines = [line.strip() for line in (cv_text or "").splitlines()]
+    entries = []
+    entry_scores = []
+    seen = set()
+
+    for index, line in enumerate(lines):
+        for match in DATE_RANGE_REGEX.finditer(line):
+            start_date = _parse_cv_date(match.group('start'))
+            end_date = _parse_cv_date(match.group('end'), is_end=True)
+            if not start_date or not end_date:
+                continue
+            if end_date != "Present" and end_date < start_date:
+                continue
+
+            # Title and company are usually on the same line or on the lines just above the dates
+            context = (line[:match.start()] + " | " + line[match.end():]).strip(" |")
+            if _PERSONAL_KEYWORDS.search(context):
+                continue
+            if _EDUCATION_KEYWORDS.search(context) and not _TITLE_KEYWORDS.search(context):
+                continue
+
+            heading_lines = []
+            for previous in reversed(lines[max(0, index - 2):index]):
+                if not previous or DATE_RANGE_REGEX.search(previous) or previous[0] in "-•*·":
+                    break
+                heading_lines.insert(0, previous)
+            heading = " | ".join(heading_lines)
+            if _EDUCATION_KEYWORDS.search(heading) and not _TITLE_KEYWORDS.search(heading + context):
+                continue
+
+            position, company = _split_title_company(context)
+            if heading and (not position or not company):
+                heading_position, heading_company = _split_title_company(heading)
+                if not position:
+                    position = heading_position
+                    company = company or heading_company
+                elif heading_company != position:
+                    company = heading_company or heading_position
+            key = (position.lower(), start_date, end_date)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            # Leftover text only counts as a company next to a recognizable job title
+            has_title = bool(_TITLE_KEYWORDS.search(position))
+            score = 0.4
+            score += 0.3 if has_title else 0.1 if position else 0
+            score += 0.3 if _COMPANY_KEYWORDS.search(company) else 0.2 if company and has_title else 0
+            if re.fullmatch(r"\d{4}", match.group('start').strip()):
+                score -= 0.1  # Year-only dates lose month precision
+            entry_scores.append(score)
+
+            entries.append({
+                "position": position,
+                "company": company,
+                "start_date": start_date,
+                "end_date": end_date
+            })
+
+    confidence = min(entry_scores) if entry_scores else 0.0
+    return {"work_experience": entries, "confidence": round(confidence, 2), "source": "local"}
+
+def extract_work_experience(cv_text, client, use_local=True, use_llm=True, usage_log=None,
+                            priority=PRIORITY_INTERACTIVE, owner=None, fallback: bool = True):
+    """Extract work experience durations from the CV text, using Groq only when local rules are unsure.
+
+    With use_llm=False (e.g. when the LLM budget is exhausted) the local result is always returned.
+    A failed LLM extraction returns no entries, or None with fallback=False.
+    """
+    if use_local or not use_llm:
+        started = time.perf_counter()
+        local_result = extract_work_experience_local(cv_text)
+        if local_result["confidence"] >= LOCAL_EXTRACTION_MIN_CONFIDENCE or not use_llm:
+            log_local_call(usage_log, 'extract_work_experience', started)
+            return local_result
+
+    prompt = f"""
+    Extract all work experience entries from the CV text below. For each position, identify the start and end dates.
+    If the end date is "Present" or "Current", use today's date.
+    
+    CV text:
+    {cv_text}
+    
+    Format your response as JSON with the following structure:
+    {{
+        "work_experience": [
+            {{
+                "position": "Job Title",
+                "company": "Company Name",
+                "start_date": "YYYY-MM",
+                "end_date": "YYYY-MM or Present"
+            }},
+            ...
+        ]
+    }}
+    Return only the JSON with no additional text.
+    """
+    
+    try:
+        experience_data, missing = structured_completion(client, prompt, WORK_EXPERIENCE_SCHEMA,
+                                                         'extract_work_experience', usage_log,
+                                                         priority=priority, owner=owner)
+        if missing:
+            print("Could not parse work experience from LLM output")
+            return {"work_experience": []} if fallback else None
+        return experience_data
+        
+    except Exception as e:
+        print(f"Error extracting work experience: {str(e)}")
+        return {"work_experience": []} if fallback else None
 
 def calculate_total_experience(work_experience):
     """Calculate total work experience in months and years from extracted work experience data."""
+    from dateutil import parser
+    from dateutil.relativedelta import relativedelta
+
     today = datetime.datetime.now().date()
     total_months = 0
     
@@ -504,80 +3226,1007 @@ def calculate_total_experience(work_experience):
     remaining_months = total_months % 12
     
     return {
-        "total_months": total_months,
-        "years": years,
-        "months": remaining_months,
-        "formatted": f"{years} years, {remaining_months} months"
+        "total_months": total_months,
+        "years": years,
+        "months": remaining_months,
+        "formatted": f"{years} years, {remaining_months} months"
+    }
+
+def analyze_cv(cv_text, job_description, work_experience_data, client, usage_log=None,
+               priority=PRIORITY_INTERACTIVE, owner=None, model=LLM_MODEL, fallback: bool = True):
+    """Use Groq to analyze a CV against a job description.
+
+    When the analysis fails or stays incomplete, placeholder scores are returned, or None with fallback=False.
+    """
+    total_experience = calculate_total_experience(work_experience_data)
+    
+    prompt = f"""
+    You are an AI HR assistant. You need to evaluate a candidate's CV against a job description.
+    
+    Job Description:
+    {job_description}
+    
+    Candidate CV:
+    {cv_text}
+    
+    Candidate's total work experience: {total_experience["formatted"]} ({total_experience["total_months"]} months total)
+    
+    Provide a numerical score from 1-10 for how well this candidate matches the job requirements.
+    Consider both skills match AND the relevance and duration of work experience when scoring.
+    
+    Also provide a brief explanation (maximum 3 sentences) of the main strengths and weaknesses.
+    
+    Format your response as JSON with the following structure:
+    {{
+        "score": [1-10 integer],
+        "experience_relevance_score": [1-10 integer],
+        "skills_match_score": [1-10 integer],
+        "explanation": "[brief explanation]",
+        "key_skills_matched": ["skill1", "skill2", "skill3"],
+        "missing_skills": ["skill1", "skill2"],
+        "experience_summary": "[brief summary of relevant experience]"
+    }}
+    Return only the JSON with no additional text.
+    """
+    
+    try:
+        json_result, missing = structured_completion(client, prompt, ANALYSIS_SCHEMA, 'analyze_cv', usage_log,
+                                                     model=model, priority=priority, owner=owner)
+        if missing:
+            print(f"Analysis result still missing fields: {', '.join(missing)}")
+            if not fallback:
+                return None
+            defaults = {
+                "score": 5,
+                "experience_relevance_score": 5,
+                "skills_match_score": 5,
+                "explanation": "Unable to properly analyze this CV due to formatting issues.",
+                "key_skills_matched": [],
+                "missing_skills": [],
+                "experience_summary": "Experience details could not be extracted accurately."
+            }
+            json_result = {**defaults, **json_result}
+        return json_result
+        
+    except Exception as e:
+        print(f"Error analyzing CV: {str(e)}")
+        if not fallback:
+            return None
+        return {
+            "score": 5,
+            "experience_relevance_score": 5,
+            "skills_match_score": 5,
+            "explanation": f"Error analyzing CV: {str(e)}",
+            "key_skills_matched": [],
+            "missing_skills": [],
+            "experience_summary": "Analysis failed due to technical issues."
+        }
+
+def analyze_cv_local(cv_text, job_description, work_experience_data, usage_log=None):
+    """Score a CV against a job description from requirement term coverage, without calling an LLM."""
+    started = time.perf_counter()
+    total_experience = calculate_total_experience(work_experience_data)
+
+    requirements_text = job_description.split("Requirements:", 1)[-1]
+    requirement_terms = list(dict.fromkeys(tokenize_for_matching(requirements_text)))
+    cv_terms = set(tokenize_for_matching(cv_text))
+    matched = [term for term in requirement_terms if term in cv_terms]
+    missing = [term for term in requirement_terms if term not in cv_terms]
+    coverage = len(matched) / len(requirement_terms) if requirement_terms else 0
+
+    skills_score = max(1, min(10, round(1 + 9 * coverage)))
+    experience_score = max(1, min(10, round(1 + 9 * min(total_experience["total_months"] / 60, 1))))
+    score = max(1, min(10, round(0.6 * skills_score + 0.4 * experience_score)))
+
+    log_local_call(usage_log, 'analyze_cv', started)
+    return {
+        "score": score,
+        "experience_relevance_score": experience_score,
+        "skills_match_score": skills_score,
+        "explanation": (f"Scored locally from requirement coverage ({len(matched)} of {len(requirement_terms)} "
+                        f"requirement terms found) and {total_experience['formatted']} of experience."),
+        "key_skills_matched": matched[:10],
+        "missing_skills": missing[:10],
+        "experience_summary": f"{len(work_experience_data.get('work_experience', []))} positions, "
+                              f"{total_experience['formatted']} in total."
+    }
+
+# Scoring modes
+REVIEW_SCORE_THRESHOLD = 6  # Applications scoring at least this are marked reviewed, others rejected
+SCORING_MODE = os.getenv("SCORING_MODE", "standard")  # standard, cascade or local
+CASCADE_FAST_MODEL = os.getenv("CASCADE_FAST_MODEL", "llama-3.1-8b-instant")  # or "local"
+CASCADE_LARGE_MODEL = os.getenv("CASCADE_LARGE_MODEL", "llama-3.3-70b-versatile")
+CASCADE_BAND = float(os.getenv("CASCADE_BAND", "1.5"))
+
+def analyze_cv_cascade(cv_text, job_description, work_experience_data, client, usage_log=None,
+                       priority=PRIORITY_INTERACTIVE, owner=None, fallback: bool = True):
+    """Score with the fast tier and escalate to the large model only near the review/reject cut.
+
+    With fallback=False a failed tier returns None instead of placeholder scores (see analyze_cv).
+    """
+    started = time.perf_counter()
+    if CASCADE_FAST_MODEL == "local":
+        result = analyze_cv_local(cv_text, job_description, work_experience_data, usage_log=usage_log)
+    else:
+        result = analyze_cv(cv_text, job_description, work_experience_data, client, usage_log=usage_log,
+                            priority=priority, owner=owner, model=CASCADE_FAST_MODEL, fallback=fallback)
+    if result is None:
+        return None
+    first_latency_ms = (time.perf_counter() - started) * 1000
+    first_score = result.get('score', 0)
+
+    escalate = REVIEW_SCORE_THRESHOLD - CASCADE_BAND <= first_score < REVIEW_SCORE_THRESHOLD + CASCADE_BAND
+    escalation_latency_ms = None
+    if escalate:
+        started = time.perf_counter()
+        result = analyze_cv(cv_text, job_description, work_experience_data, client, usage_log=usage_log,
+                            priority=priority, owner=owner, model=CASCADE_LARGE_MODEL, fallback=fallback)
+        escalation_latency_ms = (time.perf_counter() - started) * 1000
+        if result is None:
+            return None
+
+    result['cascade'] = {
+        'first_tier': CASCADE_FAST_MODEL,
+        'first_score': first_score,
+        'escalated': escalate,
+        'final_model': CASCADE_LARGE_MODEL if escalate else CASCADE_FAST_MODEL,
+        'first_latency_ms': round(first_latency_ms, 1),
+        'escalation_latency_ms': round(escalation_latency_ms, 1) if escalate else None
+    }
+    return result
+
+def run_analysis_pipeline(cv_text: str, job: Dict, client, usage_log: Optional[List[Dict]] = None,
+                          priority: int = PRIORITY_INTERACTIVE, scoring_mode: Optional[str] = None,
+                          work_experience_data: Optional[Dict] = None,
+                          cancelled: Optional[threading.Event] = None, fallback: bool = True):
+    """Extract work experience and score a CV for a job, honoring the owner's budget and the scoring mode.
+
+    Extraction is skipped when work_experience_data is already known, e.g. from a duplicate CV.
+    Setting cancelled stops the pipeline with CancelledError before its next LLM call. With
+    fallback=False a failed LLM step makes the analysis None instead of placeholder scores.
+    """
+    owner = job.get('created_by')
+    scoring_mode = scoring_mode or SCORING_MODE
+
+    # Use the local path only once the job owner's LLM budget is spent
+    use_llm = scoring_mode != 'local' and not is_llm_budget_exceeded(owner)
+
+    if not work_experience_data:
+        work_experience_data = extract_work_experience(cv_text, client, use_llm=use_llm, usage_log=usage_log,
+                                                       priority=priority, owner=owner, fallback=fallback)
+        if work_experience_data is None:
+            return None, None
+    if cancelled is not None and cancelled.is_set():
+        raise CancelledError()
+
+    job_requirements = f"{job['description']}\n\nRequirements:\n{job['requirements']}"
+    if not use_llm:
+        analysis_result = analyze_cv_local(cv_text, job_requirements, work_experience_data, usage_log=usage_log)
+    elif scoring_mode == 'cascade':
+        analysis_result = analyze_cv_cascade(cv_text, job_requirements, work_experience_data, client,
+                                             usage_log=usage_log, priority=priority, owner=owner, fallback=fallback)
+    else:
+        analysis_result = analyze_cv(cv_text, job_requirements, work_experience_data, client,
+                                     usage_log=usage_log, priority=priority, owner=owner, fallback=fallback)
+    return work_experience_data, analysis_result
+
+def record_cascade_run(cursor, cascade: Optional[Dict], job_id: int, application_id: int):
+    """Store the cascade decision of an application for escalation and latency reporting."""
+    if not cascade:
+        return
+    cursor.execute('''
+        INSERT INTO cascade_runs
+        (application_id, job_id, first_tier, first_score, escalated, final_model,
+         first_latency_ms, escalation_latency_ms)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (application_id, job_id, cascade['first_tier'], cascade['first_score'], int(cascade['escalated']),
+          cascade['final_model'], cascade['first_latency_ms'], cascade['escalation_latency_ms']))
+
+def get_cascade_stats(hr_id: int) -> Dict:
+    """Escalation rate and latency saved by the cascade compared with always using the large model."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT COUNT(*), COALESCE(SUM(c.escalated), 0), AVG(c.first_latency_ms), AVG(c.escalation_latency_ms),
+               COALESCE(SUM(c.first_latency_ms), 0) + COALESCE(SUM(c.escalation_latency_ms), 0)
+        FROM cascade_runs c
+        JOIN jobs j ON j.id = c.job_id
+        WHERE j.created_by = ?
+    ''', (hr_id,))
+    runs, escalated, avg_first_ms, avg_large_ms, cascade_ms = cursor.fetchone()
+    conn.close()
+
+    # Without the cascade every application would have paid roughly one large-model call
+    saved_ms = runs * avg_large_ms - cascade_ms if runs and avg_large_ms else None
+    return {
+        'runs': runs,
+        'escalated': escalated,
+        'escalation_rate': escalated / runs if runs else None,
+        'avg_first_tier_latency_ms': avg_first_ms,
+        'avg_escalation_latency_ms': avg_large_ms,
+        'latency_saved_ms': saved_ms
+    }
+
+# Packed batch scoring
+PACK_PROMPT_TOKENS = int(os.getenv("PACK_PROMPT_TOKENS", "6000"))    # Input budget of one packed request
+PACK_MAX_CV_TOKENS = int(os.getenv("PACK_MAX_CV_TOKENS", "1200"))    # Longer CVs are scored one per request
+PACK_MAX_SIZE = int(os.getenv("PACK_MAX_SIZE", "10"))
+PACK_OUTPUT_TOKENS_PER_CV = 250
+PACK_OVERHEAD_TOKENS = 400    # Instructions and output format
+PACK_CV_OVERHEAD_TOKENS = 30  # Per-candidate header
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) used to size packed requests."""
+    return len(text) // 4 + 1
+
+def plan_packs(cv_tokens: List[int], job_tokens: int) -> List[List[int]]:
+    """Group CVs (by index) into packs that fit the prompt budget, keeping their order."""
+    packs, current, used = [], [], job_tokens + PACK_OVERHEAD_TOKENS
+    for index, tokens in enumerate(cv_tokens):
+        tokens += PACK_CV_OVERHEAD_TOKENS
+        if current and (used + tokens > PACK_PROMPT_TOKENS or len(current) >= PACK_MAX_SIZE):
+            packs.append(current)
+            current, used = [], job_tokens + PACK_OVERHEAD_TOKENS
+        current.append(index)
+        used += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+def analyze_cv_pack(items: List[Dict], job_description: str, client, usage_log=None,
+                    priority=PRIORITY_BATCH, owner=None, model=LLM_MODEL) -> Dict:
+    """Score several CVs against one job description in a single request.
+
+    items hold 'key', 'cv_text' and 'work_experience'. Returns {key: analysis} for the items
+    whose result came back complete; the caller retries the others individually.
+    """
+    candidates = []
+    for number, item in enumerate(items, start=1):
+        total_experience = calculate_total_experience(item['work_experience'])
+        candidates.append(f"""
+    Candidate id: {number}
+    Total work experience: {total_experience["formatted"]} ({total_experience["total_months"]} months total)
+    CV:
+    {item['cv_text']}
+    ---""")
+
+    prompt = f"""
+    You are an AI HR assistant. You need to evaluate each candidate's CV below against the same job description.
+
+    Job Description:
+    {job_description}
+    {"".join(candidates)}
+
+    For every candidate provide a numerical score from 1-10 for how well they match the job requirements.
+    Consider both skills match AND the relevance and duration of work experience when scoring.
+    Judge each candidate on their own CV only.
+
+    Format your response as a JSON array with one object per candidate:
+    [
+        {{
+            "id": [candidate id],
+            "score": [1-10 integer],
+            "experience_relevance_score": [1-10 integer],
+            "skills_match_score": [1-10 integer],
+            "explanation": "[brief explanation, maximum 3 sentences]",
+            "key_skills_matched": ["skill1", "skill2", "skill3"],
+            "missing_skills": ["skill1", "skill2"],
+            "experience_summary": "[brief summary of relevant experience]"
+        }}
+    ]
+    Return only the JSON with no additional text.
+    """
+
+    try:
+        raw = chat_completion(client, prompt, 'analyze_cv_packed', usage_log, model=model,
+                              max_tokens=PACK_OUTPUT_TOKENS_PER_CV * len(items) + 100,
+                              priority=priority, owner=owner)
+    except Exception as e:
+        print(f"Error analyzing CV pack: {str(e)}")
+        return {}
+
+    data = parse_llm_json(raw)
+    if isinstance(data, dict):
+        data = next((value for value in data.values() if isinstance(value, list)), [data])
+    if not isinstance(data, list):
+        return {}
+
+    results = {}
+    for entry in data:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            number = int(entry.get('id'))
+        except (TypeError, ValueError):
+            continue
+        analysis, missing = validate_llm_output(entry, ANALYSIS_SCHEMA)
+        if 1 <= number <= len(items) and not missing:
+            results[items[number - 1]['key']] = analysis
+    return results
+
+def analyze_cvs_batch(items: List[Dict], job_description: str, client, usage_log=None,
+                      priority=PRIORITY_BATCH, owner=None, packed: bool = True) -> Dict:
+    """Score many CVs for one job; returns ({key: analysis}, [keys that could not be scored]).
+
+    With packed=True, short CVs share requests sized by plan_packs and only items missing from
+    or invalid in a packed answer are retried with analyze_cv; long CVs always go alone. Failed
+    items are reported instead of getting analyze_cv's placeholder scores.
+    """
+    job_tokens = estimate_tokens(job_description)
+    tokens = [estimate_tokens(item['cv_text']) for item in items]
+    short = [index for index, count in enumerate(tokens) if count <= PACK_MAX_CV_TOKENS] if packed else []
+    packs = [[short[i] for i in pack] for pack in plan_packs([tokens[i] for i in short], job_tokens)]
+    packed_indexes = set(short)
+    singles = [[index] for index in range(len(items)) if index not in packed_indexes]
+
+    def score(indexes):
+        if len(indexes) == 1:
+            item = items[indexes[0]]
+            analysis = analyze_cv(item['cv_text'], job_description, item['work_experience'], client,
+                                  usage_log=usage_log, priority=priority, owner=owner, fallback=False)
+            return {item['key']: analysis} if analysis else {}
+        return analyze_cv_pack([items[index] for index in indexes], job_description, client, usage_log=usage_log,
+                               priority=priority, owner=owner)
+
+    results = {}
+    workers = max(1, LLM_CLASS_CONCURRENCY.get(priority, 1))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for scored in pool.map(score, packs + singles):
+            results.update(scored)
+        # Retry only the items a packed answer left out or got wrong
+        retries = [[index] for index in range(len(items)) if items[index]['key'] not in results]
+        if retries:
+            print(f"Retrying {len(retries)} CVs individually")
+        for scored in pool.map(score, retries):
+            results.update(scored)
+    return results, [item['key'] for item in items if item['key'] not in results]
+
+def rescore_applications(hr_id: int, job_id: int, client, packed: bool = True, progress=None) -> Dict:
+    """Re-score the unarchived applications of an HR user's job at batch priority.
+
+    Scores, skills and analysis are replaced and content generated from the old analysis is
+    dropped; the status HR set is kept. Work experience comes from the stored CV signature when
+    available. progress(done, total) is called per chunk.
+    """
+    job = get_job_by_id(job_id)
+    if not job or job['created_by'] != hr_id:
+        return {'applications': 0, 'rescored': 0, 'failed': 0, 'llm_calls': 0, 'tokens': 0, 'seconds': 0.0,
+                'budget_exceeded': False}
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT a.id, a.candidate_id, a.cv_text, s.work_experience
+        FROM applications a
+        LEFT JOIN cv_signatures s ON s.application_id = a.id
+        WHERE a.job_id = ? AND a.archived_at IS NULL AND a.cv_text IS NOT NULL
+        ORDER BY a.id
+    ''', (job_id,))
+    rows = cursor.fetchall()
+    conn.close()
+
+    stats = {'applications': len(rows), 'rescored': 0, 'failed': 0, 'llm_calls': 0, 'tokens': 0, 'seconds': 0.0,
+             'budget_exceeded': False}
+    job_description = f"{job['description']}\n\nRequirements:\n{job['requirements']}"
+    started = time.perf_counter()
+    # Chunks keep progress visible and let a spent budget stop the run part way
+    chunk_size = PACK_MAX_SIZE * max(1, LLM_CLASS_CONCURRENCY[PRIORITY_BATCH]) * 2
+    for offset in range(0, len(rows), chunk_size):
+        if is_llm_budget_exceeded(hr_id):
+            stats['budget_exceeded'] = True
+            break
+        usage_log = []
+        items = [{
+            'key': row[0],
+            'cv_text': row[2],
+            'work_experience': json.loads(row[3]) if row[3] else extract_work_experience(
+                row[2], client, usage_log=usage_log, priority=PRIORITY_BATCH, owner=hr_id)
+        } for row in rows[offset:offset + chunk_size]]
+        # Applications that could not be scored keep their stored scores
+        results, failed = analyze_cvs_batch(items, job_description, client, usage_log=usage_log, owner=hr_id,
+                                            packed=packed)
+
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.executemany('''
+            UPDATE applications
+            SET match_score = ?, skills_score = ?, experience_score = ?, matched_skills = ?,
+                missing_skills = ?, analysis_result = ?, experience_summary = ?
+            WHERE id = ?
+        ''', [(
+            analysis.get('score', 0),
+            analysis.get('skills_match_score', 0),
+            analysis.get('experience_relevance_score', 0),
+            json.dumps(analysis.get('key_skills_matched', [])),
+            json.dumps(analysis.get('missing_skills', [])),
+            json.dumps(analysis),
+            analysis.get('experience_summary', ''),
+            application_id
+        ) for application_id, analysis in results.items()])
+        # Interview questions and feedback were written from the old analysis; they are regenerated on demand
+        cursor.executemany('DELETE FROM generated_content WHERE application_id = ?',
+                           [(application_id,) for application_id in results])
+        record_llm_usage(cursor, [dict(entry, call_type=f"rescore:{entry['call_type']}") for entry in usage_log],
+                         job_id, None)
+        conn.commit()
+        conn.close()
+
+        stats['rescored'] += len(results)
+        stats['failed'] += len(failed)
+        stats['llm_calls'] += sum(1 for entry in usage_log if entry['model'] != 'local')
+        stats['tokens'] += sum(entry['prompt_tokens'] + entry['completion_tokens'] for entry in usage_log)
+        if progress:
+            progress(min(offset + chunk_size, len(rows)), len(rows))
+
+    if stats['rescored']:
+        conn = sqlite3.connect(DB_PATH)
+        build_score_sketches(conn.cursor(), [job_id])
+        conn.commit()
+        conn.close()
+
+    stats['seconds'] = time.perf_counter() - started
+    return stats
+
+# Interview question and feedback generation
+# Bump a kind's prompt version whenever its instructions change so stale cached content is regenerated
+GENERATION_PROMPT_VERSIONS = {
+    'interview_questions': 'v1',
+    'feedback': 'v1',
+}
+GENERATION_INSTRUCTIONS = {
+    'interview_questions': "5 interview questions that probe the missing skills and verify the claimed experience",
+    'feedback': "3-4 sentences of constructive feedback addressed to the candidate, naming strengths and gaps",
+}
+GENERATION_SCHEMA = {
+    'interview_questions': _coerce_text_list,
+    'feedback': _coerce_text,
+}
+GENERATION_BATCH_SIZE = int(os.getenv("GENERATION_BATCH_SIZE", "5"))  # Applications per LLM request
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "4"))        # Requests in flight at once
+
+def get_generated_content(application_ids: List[int], kinds: Optional[List[str]] = None) -> Dict[int, Dict]:
+    """Get cached generated content for the current prompt versions, as {application_id: {kind: content}}."""
+    kinds = list(kinds or GENERATION_PROMPT_VERSIONS)
+    if not application_ids:
+        return {}
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    placeholders = ','.join('?' * len(application_ids))
+    cursor.execute(f'''
+        SELECT application_id, kind, prompt_version, content
+        FROM generated_content
+        WHERE application_id IN ({placeholders})
+    ''', list(application_ids))
+    rows = cursor.fetchall()
+    conn.close()
+
+    content = {}
+    for application_id, kind, prompt_version, value in rows:
+        if kind in kinds and GENERATION_PROMPT_VERSIONS[kind] == prompt_version:
+            content.setdefault(application_id, {})[kind] = json.loads(value)
+    return content
+
+def _generation_context(hr_id: int, application_ids: List[int]) -> List[Dict]:
+    """Load the stored analysis of the HR user's applications that generation prompts are built from."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    placeholders = ','.join('?' * len(application_ids))
+    cursor.execute(f'''
+        SELECT a.id, a.job_id, a.candidate_id, j.title, j.requirements, a.match_score,
+               a.matched_skills, a.missing_skills, a.experience_summary, a.analysis_result, a.archived_at
+        FROM applications a
+        JOIN jobs j ON a.job_id = j.id
+        WHERE j.created_by = ? AND a.id IN ({placeholders})
+    ''', [hr_id] + list(application_ids))
+    rows = cursor.fetchall()
+    conn.close()
+
+    contexts = []
+    for row in rows:
+        if row[10]:
+            analysis = get_application_analysis(row[0]) or {}
+        else:
+            analysis = json.loads(row[9]) if row[9] else {}
+        contexts.append({
+            'application_id': row[0],
+            'job_id': row[1],
+            'candidate_id': row[2],
+            'position': row[3],
+            'requirements': row[4],
+            'match_score': row[5],
+            'matched_skills': json.loads(row[6]) if row[6] else [],
+            'missing_skills': json.loads(row[7]) if row[7] else [],
+            'experience_summary': row[8] or "",
+            'explanation': analysis.get('explanation', "")
+        })
+    return contexts
+
+def _generate_batch(client, batch: List[Dict], kinds: List[str], owner: int) -> Tuple[Dict[int, Dict], List[Dict]]:
+    """Generate content for several applications in one request; returns the valid content and its usage."""
+    usage_log = []
+    candidates = [{
+        'id': item['application_id'],
+        'position': item['position'],
+        'requirements': item['requirements'],
+        'match_score': item['match_score'],
+        'matched_skills': item['matched_skills'],
+        'missing_skills': item['missing_skills'],
+        'experience_summary': item['experience_summary'],
+        'analysis': item['explanation']
+    } for item in batch]
+    fields = ", ".join(f'"{kind}" ({SCHEMA_FIELD_HINTS[GENERATION_SCHEMA[kind]]}): {GENERATION_INSTRUCTIONS[kind]}'
+                       for kind in kinds)
+    prompt = f"""
+    You are assisting an HR team. For each candidate below, write the following based only on their
+    CV analysis for the position: {fields}.
+
+    Candidates:
+    {json.dumps(candidates, indent=2)}
+
+    Reply with only a JSON object that maps each candidate "id" (as a string) to an object with the fields above.
+    """
+
+    try:
+        raw = chat_completion(client, prompt, "generation", usage_log, temperature=0.4,
+                              max_tokens=min(400 * len(batch), 6000), priority=PRIORITY_HR, owner=owner)
+    except Exception as e:
+        print(f"Error generating content: {str(e)}")
+        return {}, usage_log
+
+    data = parse_llm_json(raw)
+    if not isinstance(data, dict):
+        return {}, usage_log
+
+    schema = {kind: GENERATION_SCHEMA[kind] for kind in kinds}
+    content = {}
+    for item in batch:
+        clean, _ = validate_llm_output(data.get(str(item['application_id'])), schema)
+        if clean:
+            content[item['application_id']] = clean
+    return content, usage_log
+
+def generate_candidate_content(hr_id: int, application_ids: List[int], client,
+                               kinds: Optional[List[str]] = None, refresh: bool = False) -> Tuple[Dict[int, Dict], Dict]:
+    """Get interview questions and feedback for applications, generating only what is not cached.
+
+    Missing applications are packed GENERATION_BATCH_SIZE to a request and the requests run
+    concurrently at HR priority. Returns ({application_id: {kind: content}}, stats).
+    """
+    kinds = list(kinds or GENERATION_PROMPT_VERSIONS)
+    if not application_ids:
+        return {}, {'cached': 0, 'generated': 0, 'failed': 0, 'llm_calls': 0, 'budget_exceeded': False}
+
+    # Only the HR user's own applications
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    placeholders = ','.join('?' * len(application_ids))
+    cursor.execute(f'''
+        SELECT a.id FROM applications a JOIN jobs j ON a.job_id = j.id
+        WHERE j.created_by = ? AND a.id IN ({placeholders})
+    ''', [hr_id] + list(application_ids))
+    owned = {row[0] for row in cursor.fetchall()}
+    conn.close()
+    application_ids = [a for a in application_ids if a in owned]
+
+    content = {} if refresh else get_generated_content(application_ids, kinds)
+    stats = {'cached': len([a for a in application_ids if len(content.get(a, {})) == len(kinds)]),
+             'generated': 0, 'failed': 0, 'llm_calls': 0, 'budget_exceeded': False}
+
+    missing = [a for a in application_ids if len(content.get(a, {})) < len(kinds)]
+    if not missing:
+        return content, stats
+    if is_llm_budget_exceeded(hr_id):
+        stats['budget_exceeded'] = True
+        stats['failed'] = len(missing)
+        return content, stats
+
+    contexts = _generation_context(hr_id, missing)
+    batches = [contexts[i:i + GENERATION_BATCH_SIZE] for i in range(0, len(contexts), GENERATION_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=max(1, min(GENERATION_WORKERS, len(batches)))) as pool:
+        results = list(pool.map(lambda batch: _generate_batch(client, batch, kinds, hr_id), batches))
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    for batch, (generated, usage_log) in zip(batches, results):
+        stats['llm_calls'] += len(usage_log)
+        # A packed request serves several applications; its usage is booked to the first one's job
+        record_llm_usage(cursor, usage_log, batch[0]['job_id'], None)
+        for application_id, values in generated.items():
+            cursor.executemany('''
+                INSERT OR REPLACE INTO generated_content (application_id, kind, prompt_version, content, model)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(application_id, kind, GENERATION_PROMPT_VERSIONS[kind], json.dumps(value), LLM_MODEL)
+                  for kind, value in values.items()])
+            content.setdefault(application_id, {}).update(values)
+    conn.commit()
+    conn.close()
+
+    stats['generated'] = len([a for a in missing if len(content.get(a, {})) == len(kinds)])
+    stats['failed'] = len(missing) - stats['generated']
+    return content, stats
+
+# Submission pipeline (shared by the Streamlit UI and the HTTP API)
+def get_groq_client():
+    """Create a Groq client from GROQ_API_KEY."""
+    from groq import Groq
+
+    return Groq(api_key=os.getenv("GROQ_API_KEY"))
+
+def process_application(job: Dict, candidate_id: int, cv_text: str, applicant_info: Dict, client,
+                        priority: int = PRIORITY_INTERACTIVE, cv_blob: Optional[str] = None) -> Tuple[bool, Dict]:
+    """Analyze a CV for a job and store the application; returns (submitted, analysis_result).
+
+    submitted is False when the candidate has already applied for the job.
+    """
+    usage_log = []
+    analysis_result, cv_fingerprint = prepare_application(job, cv_text, client, usage_log, priority,
+                                                          candidate_id=candidate_id)
+    submitted = submit_application(job['id'], candidate_id, cv_text, analysis_result, applicant_info, usage_log,
+                                   cv_fingerprint, cv_blob)
+    return submitted, analysis_result
+
+def prepare_application(job: Dict, cv_text: str, client, usage_log: List[Dict],
+                        priority: int = PRIORITY_INTERACTIVE,
+                        cancelled: Optional[threading.Event] = None,
+                        candidate_id: Optional[int] = None) -> Tuple[Dict, Dict]:
+    """Analyze a CV for a job without storing anything; returns (analysis_result, cv_fingerprint).
+
+    A near-duplicate of an earlier CV reuses its extracted work experience, and its whole analysis
+    for the same job. The fingerprint's duplicate is the closest CV from an account other than
+    candidate_id. See run_analysis_pipeline for cancelled.
+    """
+    signature = compute_minhash(cv_text)
+    closest = find_duplicate_cv(signature)
+    reuse = closest if closest and REUSE_DUPLICATE_ANALYSIS else None
+    # The candidate's own earlier CV may be reused but is not a duplicate; look past it for other accounts
+    duplicate = closest
+    if closest and candidate_id is not None and closest['candidate_id'] == candidate_id:
+        duplicate = find_duplicate_cv(signature, exclude_candidate_id=candidate_id)
+
+    # The same CV was already scored for this job - reuse that analysis without calling the LLM
+    prior_analysis = None
+    if reuse and reuse['job_id'] == job['id']:
+        prior_analysis = get_application_analysis(reuse['application_id'])
+    if prior_analysis:
+        prior_analysis.pop('cascade', None)
+        work_experience_data = reuse['work_experience']
+        analysis_result = dict(prior_analysis, reused_from=reuse['application_id'])
+    else:
+        work_experience_data, analysis_result = run_analysis_pipeline(
+            cv_text, job, client, usage_log=usage_log, priority=priority,
+            work_experience_data=reuse['work_experience'] if reuse else None, cancelled=cancelled)
+
+    cv_fingerprint = {'signature': signature, 'work_experience': work_experience_data, 'duplicate': duplicate}
+    return analysis_result, cv_fingerprint
+
+def create_submission(job_id: int, candidate_id: int) -> str:
+    """Register an asynchronous submission and return its tracking ID."""
+    tracking_id = uuid.uuid4().hex
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO submissions (tracking_id, job_id, candidate_id, status) VALUES (?, ?, ?, 'queued')
+    ''', (tracking_id, job_id, candidate_id))
+    conn.commit()
+    conn.close()
+    return tracking_id
+
+def update_submission(tracking_id: str, status: str, application_id: Optional[int] = None,
+                      error: Optional[str] = None):
+    """Update the state of an asynchronous submission."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE submissions SET status = ?, application_id = COALESCE(?, application_id), error = ?,
+               updated_at = CURRENT_TIMESTAMP
+        WHERE tracking_id = ?
+    ''', (status, application_id, error, tracking_id))
+    conn.commit()
+    conn.close()
+
+def get_submission(tracking_id: str) -> Optional[Dict]:
+    """Get an asynchronous submission by tracking ID."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT tracking_id, job_id, candidate_id, status, application_id, error, created_at, updated_at
+        FROM submissions WHERE tracking_id = ?
+    ''', (tracking_id,))
+    row = cursor.fetchone()
+    conn.close()
+
+    if row:
+        return {
+            'tracking_id': row[0],
+            'job_id': row[1],
+            'candidate_id': row[2],
+            'status': row[3],
+            'application_id': row[4],
+            'error': row[5],
+            'created_at': row[6],
+            'updated_at': row[7]
+        }
+    return None
+
+def run_submission(tracking_id: str, job: Dict, candidate_id: int, cv_text: Optional[str], applicant_info: Dict,
+                   client, cv_blob: Optional[str] = None):
+    """Process a tracked submission in the background, recording the outcome on the tracking row.
+
+    Without cv_text, the text is extracted from the uploaded file in the blob store by this worker.
+    """
+    update_submission(tracking_id, 'processing')
+    try:
+        if not cv_text:
+            cv_text = extract_text_from_blob(cv_blob)
+            if not is_cv_text_readable(cv_text):
+                update_submission(tracking_id, 'failed', error="No readable text was found in the CV")
+                return
+        submitted, _ = process_application(job, candidate_id, cv_text, applicant_info, client, cv_blob=cv_blob)
+        application_id = get_application_id(job['id'], candidate_id)
+        if application_id is None:
+            update_submission(tracking_id, 'failed', error="Application could not be stored")
+        else:
+            update_submission(tracking_id, 'completed' if submitted else 'duplicate', application_id=application_id)
+    except Exception as e:
+        print(f"Error processing submission {tracking_id}: {str(e)}")
+        update_submission(tracking_id, 'failed', error=str(e))
+
+# Speculative CV processing
+PRECOMPUTE_WORKERS = int(os.getenv("PRECOMPUTE_WORKERS", "4"))
+PRECOMPUTE_TTL_SECONDS = int(os.getenv("PRECOMPUTE_TTL_SECONDS", "900"))   # Unsubmitted work is discarded after this
+# Above this fraction of the job owner's LLM budget, the analysis waits for the actual submission
+PRECOMPUTE_BUDGET_FRACTION = float(os.getenv("PRECOMPUTE_BUDGET_FRACTION", "0.8"))
+
+class CVPrecompute:
+    """Process an uploaded CV while the candidate is still filling in the application form.
+
+    Selecting a file starts storing it, extracting its text and running the analysis pipeline on
+    a small pool, keyed by (candidate, job, file SHA-256); submitting then only stores the
+    application. LLM calls run in the speculative class, below submissions and HR actions, and
+    are skipped once the job owner is close to their budget. Work that is replaced by another
+    file, removed, or not submitted within the TTL is discarded: queued work never starts,
+    running work stops before its next LLM call, and the usage of calls already made is recorded
+    without an application.
+    """
+
+    def __init__(self, workers: int = PRECOMPUTE_WORKERS, ttl: int = PRECOMPUTE_TTL_SECONDS):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cv-precompute")
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.counters = {'started': 0, 'used': 0, 'discarded': 0}
+
+    def start(self, key: Tuple[int, int, str], job: Dict, data: bytes, content_type: str, client) -> Dict:
+        """Start processing a file unless work for the same key is already running or done."""
+        self.expire()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = {'job': job, 'candidate_id': key[0], 'created': time.time(), 'usage_log': [],
+                         'cancelled': threading.Event()}
+                entry['future'] = self.pool.submit(self._run, entry, data, content_type, client)
+                self.entries[key] = entry
+                self.counters['started'] += 1
+        return entry
+
+    def _run(self, entry: Dict, data: bytes, content_type: str, client) -> Dict:
+        cv_blob, _ = store_blob(io.BytesIO(data), content_type)
+        cv_text = extract_text_from_blob(cv_blob)
+        result = {'cv_blob': cv_blob, 'cv_text': cv_text, 'readable': is_cv_text_readable(cv_text)}
+        if (result['readable'] and not entry['cancelled'].is_set()
+                and not is_llm_budget_exceeded(entry['job'].get('created_by'), PRECOMPUTE_BUDGET_FRACTION)):
+            result['analysis_result'], result['cv_fingerprint'] = prepare_application(
+                entry['job'], cv_text, client, entry['usage_log'], priority=PRIORITY_SPECULATIVE,
+                cancelled=entry['cancelled'], candidate_id=entry['candidate_id'])
+        return result
+
+    def is_ready(self, key: Tuple[int, int, str]) -> bool:
+        self.expire()
+        with self.lock:
+            entry = self.entries.get(key)
+        return bool(entry) and entry['future'].done()
+
+    def take(self, key: Tuple[int, int, str]) -> Optional[Dict]:
+        """Wait for a key's work and hand it over with its usage_log; None if there is none, it expired or it failed."""
+        self.expire()
+        with self.lock:
+            entry = self.entries.pop(key, None)
+        if entry is None:
+            return None
+        try:
+            result = entry['future'].result()
+        except Exception as e:
+            print(f"Speculative CV processing failed: {str(e)}")
+            self._record_usage(entry)
+            return None
+        with self.lock:
+            self.counters['used'] += 1
+        return dict(result, usage_log=entry['usage_log'])
+
+    def discard(self, key: Tuple[int, int, str]):
+        """Cancel a key's work; its LLM usage so far is recorded once the work has stopped."""
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return
+            self.counters['discarded'] += 1
+        entry['cancelled'].set()
+        entry['future'].cancel()
+        entry['future'].add_done_callback(lambda _: self._record_usage(entry))
+
+    def expire(self):
+        """Discard work older than the TTL; runs on every start, is_ready, take and stats call."""
+        cutoff = time.time() - self.ttl
+        with self.lock:
+            expired = [key for key, entry in self.entries.items() if entry['created'] < cutoff]
+        for key in expired:
+            self.discard(key)
+
+    def _record_usage(self, entry: Dict):
+        if not entry['usage_log']:
+            return
+        try:
+            conn = sqlite3.connect(DB_PATH)
+            cursor = conn.cursor()
+            record_llm_usage(cursor, [dict(usage, call_type=f"speculative:{usage['call_type']}")
+                                      for usage in entry['usage_log']], entry['job']['id'], entry['candidate_id'])
+            conn.commit()
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"Error recording speculative LLM usage: {str(e)}")
+
+    def stats(self) -> Dict:
+        self.expire()
+        with self.lock:
+            return dict(self.counters, pending=len(self.entries))
+
+@st.cache_resource
+def get_cv_precompute() -> CVPrecompute:
+    """Process-wide speculative CV processing shared by every Streamlit session."""
+    return CVPrecompute()
+
+# Page profiling
+ADMIN_USERS = {name.strip() for name in os.getenv("ADMIN_USERS", "").split(",") if name.strip()}
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))    # Profiles kept per page
+
+def is_admin(user: Optional[Dict]) -> bool:
+    """Admins are the users named in ADMIN_USERS."""
+    return bool(user) and user['username'] in ADMIN_USERS
+
+class SamplingProfiler:
+    """Sample the call stack of the thread that created it while a block runs.
+
+    A background thread reads the thread's current frame every interval_ms and counts each
+    distinct stack, cut at the frame that created the profiler so Streamlit's own script
+    runner frames are left out. Frames are labelled "function (file:first line)".
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.thread_id = threading.get_ident()
+        self.root = sys._getframe(1)
+        self.stacks = {}
+        self.samples = 0
+        self.duration_ms = 0.0
+        self._labels = {}
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, name="page-profiler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._sampler.join()
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        return False
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                if frame is self.root:
+                    break
+                frame = frame.f_back
+            else:
+                continue    # Outside the profiled block
+            stack = tuple(reversed(stack))
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            self.samples += 1
+
+def save_page_profile(page: str, user_id: Optional[int], profiler: SamplingProfiler):
+    """Store a page run's profile and drop the page's profiles beyond the latest PROFILE_KEEP."""
+    if not profiler.samples:
+        return
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO page_profiles (page, user_id, duration_ms, samples, stacks)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (page, user_id, profiler.duration_ms, profiler.samples,
+              json.dumps([[list(stack), count] for stack, count in profiler.stacks.items()])))
+        cursor.execute('''
+            DELETE FROM page_profiles
+            WHERE page = ? AND id <= (
+                SELECT id FROM page_profiles WHERE page = ? ORDER BY id DESC LIMIT 1 OFFSET ?
+            )
+        ''', (page, page, PROFILE_KEEP))
+        conn.commit()
+        conn.close()
+    except sqlite3.Error as e:
+        print(f"Error saving page profile: {str(e)}")
+
+def get_page_profiles(page: Optional[str] = None) -> List[Dict]:
+    """List stored profiles, newest first, without their stacks."""
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT p.id, p.page, u.username, p.duration_ms, p.samples, p.created_at
+        FROM page_profiles p
+        LEFT JOIN users u ON u.id = p.user_id
+        WHERE ? IS NULL OR p.page = ?
+        ORDER BY p.id DESC
+    ''', (page, page))
+    profiles = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return profiles
+
+def get_page_profile_stacks(profile_id: int) -> List[Tuple[List[str], int]]:
+    """Get the sampled (stack, count) pairs of a stored profile."""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute('SELECT stacks FROM page_profiles WHERE id = ?', (profile_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return [(stack, count) for stack, count in json.loads(row[0])] if row else []
+
+def profile_flame_graph_data(stacks: List[Tuple[List[str], int]]) -> Dict[str, List]:
+    """Turn sampled stacks into icicle chart nodes (ids, labels, parents, values)."""
+    totals = {}
+    for stack, count in stacks:
+        for depth in range(1, len(stack) + 1):
+            path = tuple(stack[:depth])
+            totals[path] = totals.get(path, 0) + count
+    return {
+        'ids': [";".join(path) for path in totals],
+        'labels': [path[-1] for path in totals],
+        'parents': [";".join(path[:-1]) for path in totals],
+        'values': list(totals.values())
     }
 
-def analyze_cv(cv_text, job_description, work_experience_data, client):
-    """Use Groq to analyze a CV against a job description."""
-    total_experience = calculate_total_experience(work_experience_data)
-    
-    prompt = f"""
-    You are an AI HR assistant. You need to evaluate a candidate's CV against a job description.
-    
-    Job Description:
-    {job_description}
-    
-    Candidate CV:
-    {cv_text}
-    
-    Candidate's total work experience: {total_experience["formatted"]} ({total_experience["total_months"]} months total)
-    
-    Provide a numerical score from 1-10 for how well this candidate matches the job requirements.
-    Consider both skills match AND the relevance and duration of work experience when scoring.
-    
-    Also provide a brief explanation (maximum 3 sentences) of the main strengths and weaknesses.
-    
-    Format your response as JSON with the following structure:
-    {{
-        "score": [1-10 integer],
-        "experience_relevance_score": [1-10 integer],
-        "skills_match_score": [1-10 integer],
-        "explanation": "[brief explanation]",
-        "key_skills_matched": ["skill1", "skill2", "skill3"],
-        "missing_skills": ["skill1", "skill2"],
-        "experience_summary": "[brief summary of relevant experience]"
-    }}
-    Return only the JSON with no additional text.
-    """
-    
-    try:
-        response = client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="llama3-8b-8192",
-            temperature=0.2,
-            max_tokens=1000
-        )
-        result = response.choices[0].message.content
-        
-        try:
-            json_result = json.loads(result)
-            return json_result
-        except json.JSONDecodeError:
-            print(f"JSON decode error in analysis result: {result}")
-            return {
-                "score": 5,
-                "experience_relevance_score": 5,
-                "skills_match_score": 5,
-                "explanation": "Unable to properly analyze this CV due to formatting issues.",
-                "key_skills_matched": [],
-                "missing_skills": [],
-                "experience_summary": "Experience details could not be extracted accurately."
-            }
-            
-    except Exception as e:
-        print(f"Error analyzing CV: {str(e)}")
-        return {
-            "score": 5,
-            "experience_relevance_score": 5,
-            "skills_match_score": 5,
-            "explanation": f"Error analyzing CV: {str(e)}",
-            "key_skills_matched": [],
-            "missing_skills": [],
-            "experience_summary": "Analysis failed due to technical issues."
-        }
+def profile_top_functions(stacks: List[Tuple[List[str], int]], limit: int = 30) -> List[Dict]:
+    """Functions by samples spent in them (self) and under them (total), hottest first."""
+    samples = sum(count for _, count in stacks)
+    own, total = {}, {}
+    for stack, count in stacks:
+        own[stack[-1]] = own.get(stack[-1], 0) + count
+        for function in set(stack):
+            total[function] = total.get(function, 0) + count
+    rows = [{
+        'function': function,
+        'self_samples': own.get(function, 0),
+        'self_pct': round(100 * own.get(function, 0) / samples, 1),
+        'total_samples': count,
+        'total_pct': round(100 * count / samples, 1)
+    } for function, count in total.items()]
+    rows.sort(key=lambda row: (row['self_samples'], row['total_samples']), reverse=True)
+    return rows[:limit]
 
 # Custom CSS for better UI
 def set_custom_styling():
@@ -742,6 +4391,9 @@ def job_detail_page(job):
     if st.button("← Back to Jobs", type="secondary"):
         if 'selected_job' in st.session_state:
             del st.session_state.selected_job
+        if st.session_state.get('cv_precompute_key'):
+            get_cv_precompute().discard(st.session_state.cv_precompute_key)
+            st.session_state.cv_precompute_key = None
         st.rerun()
     
     st.markdown(f"# {job['title']}")
@@ -766,6 +4418,29 @@ def job_detail_page(job):
     
     st.markdown('<div class="application-form">', unsafe_allow_html=True)
     
+    # The CV is picked outside the form so it can be processed while the rest of the form is filled in
+    st.markdown("### Upload Your CV")
+    uploaded_file = st.file_uploader("Choose your CV file", type=['pdf', 'txt'])
+    
+    precompute = get_cv_precompute()
+    precompute_key = None
+    if uploaded_file and get_application_id(job['id'], st.session_state.user['id']) is None:
+        data = uploaded_file.getvalue()
+        precompute_key = (st.session_state.user['id'], job['id'], hashlib.sha256(data).hexdigest())
+        precompute.start(precompute_key, job, data, uploaded_file.type, get_groq_client())
+    
+    # A replaced or removed file cancels the work started for the previous one
+    previous_key = st.session_state.get('cv_precompute_key')
+    if previous_key and previous_key != precompute_key:
+        precompute.discard(previous_key)
+    st.session_state.cv_precompute_key = precompute_key
+    
+    if precompute_key:
+        if precompute.is_ready(precompute_key):
+            st.caption("✅ Your CV has been read.")
+        else:
+            st.caption("⏳ Reading your CV while you fill in the form...")
+    
     with st.form("application_form"):
         st.markdown("### Personal Information")
         
@@ -784,9 +4459,6 @@ def job_detail_page(job):
         
         total_experience = st.text_input("Total Years of Experience *", placeholder="e.g., 3.5 years")
         
-        st.markdown("### Upload Your CV")
-        uploaded_file = st.file_uploader("Choose your CV file", type=['pdf', 'txt'])
-        
         # Additional information
         st.markdown("### Additional Information (Optional)")
         cover_letter = st.text_area("Cover Letter / Additional Comments", 
@@ -803,20 +4475,21 @@ def job_detail_page(job):
                 with st.spinner("Processing your application..."):
                     try:
                         # Initialize Groq client
-                        client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+                        client = get_groq_client()
                         
-                        # Extract text from uploaded file
-                        if uploaded_file.type == "application/pdf":
-                            cv_text = extract_text_from_pdf(uploaded_file)
+                        # Reuse the work started when the file was selected, waiting for it if needed
+                        prepared = precompute.take(precompute_key) if precompute_key else None
+                        st.session_state.cv_precompute_key = None
+                        if prepared:
+                            cv_blob, cv_text = prepared['cv_blob'], prepared['cv_text']
                         else:
-                            cv_text = str(uploaded_file.read(), "utf-8")
-                        
-                        # Extract work experience
-                        work_experience_data = extract_work_experience(cv_text, client)
-                        
-                        # Analyze CV
-                        job_requirements = f"{job['description']}\n\nRequirements:\n{job['requirements']}"
-                        analysis_result = analyze_cv(cv_text, job_requirements, work_experience_data, client)
+                            # Keep the original upload, then extract text from the stored copy
+                            uploaded_file.seek(0)
+                            cv_blob, _ = store_blob(uploaded_file, uploaded_file.type)
+                            cv_text = extract_text_from_blob(cv_blob)
+                        if not is_cv_text_readable(cv_text):
+                            raise ValueError("No readable text was found in your CV. Please upload a "
+                                             "text-based PDF or a .txt file.")
                         
                         # Prepare applicant information
                         applicant_info = {
@@ -829,13 +4502,21 @@ def job_detail_page(job):
                             'cover_letter': cover_letter
                         }
                         
-                        # Submit application
-                        if submit_application_db(job['id'], st.session_state.user['id'], 
-                                               cv_text, analysis_result, applicant_info):
+                        # Analyze CV (unless already done) and submit application
+                        if prepared and 'analysis_result' in prepared:
+                            analysis_result = prepared['analysis_result']
+                            submitted = submit_application(job['id'], st.session_state.user['id'], cv_text,
+                                                           analysis_result, applicant_info, prepared['usage_log'],
+                                                           prepared['cv_fingerprint'], cv_blob)
+                        else:
+                            submitted, analysis_result = process_application(job, st.session_state.user['id'],
+                                                                             cv_text, applicant_info, client,
+                                                                             cv_blob=cv_blob)
+                        if submitted:
                             st.success("Application submitted successfully!")
                             st.balloons()
-                            
-                            # Show analysis results
+                        else:
+                            st.warning("You have already applied for this position.")
                             
                     except Exception as e:
                         st.error(f"Error processing application: {str(e)}")
@@ -843,24 +4524,28 @@ def job_detail_page(job):
     st.markdown('</div>', unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
-def submit_application_db(job_id, candidate_id, cv_text, analysis_result, applicant_info):
-    """Submit application to database - wrapper function for better error handling"""
-    return submit_application(job_id, candidate_id, cv_text, analysis_result, applicant_info)
-
 def candidate_dashboard():
     """Display candidate dashboard with job listings and applications."""
     st.markdown('<div class="header-container"><h1>Welcome, ' + st.session_state.user['full_name'] + '</h1><p>Find your dream job</p></div>', unsafe_allow_html=True)
     
     # Sidebar navigation
     st.sidebar.title("Navigation")
-    page = st.sidebar.selectbox("Select Page", ["Browse Jobs", "My Applications", "Profile"])
+    page = st.sidebar.selectbox("Select Page", ["Browse Jobs", "My Applications", "Profile"], key="page")
     
     if page == "Browse Jobs":
         st.markdown("## Available Jobs")
-        
-        # Get all jobs
-        jobs = get_all_jobs()
-        
+
+        sort_by = st.radio("Sort by", ["Newest", "Best match for my CV"], horizontal=True)
+
+        if sort_by == "Best match for my CV":
+            jobs = recommend_jobs(st.session_state.user['id'], top_k=20)
+            if not jobs:
+                st.info("Recommendations use the CV from your applications. Apply to a job to get personalized matches.")
+                jobs = get_all_jobs()
+        else:
+            # Get all jobs
+            jobs = get_all_jobs()
+
         if not jobs:
             st.info("No jobs available at the moment.")
             return
@@ -875,6 +4560,8 @@ def candidate_dashboard():
                 st.markdown(f"### {job['title']}")
                 st.markdown(f"**{job['department']} | {job['location']}**")
                 st.markdown(f"**Salary:** {job['salary_range']}")
+                if 'similarity' in job:
+                    st.markdown(f"**CV Match:** {job['similarity'] * 100:.0f}%")
                 st.markdown(f"**Description:** {job['description'][:200]}...")
                 st.markdown(f"*Posted by: {job['created_by_name']} on {job['created_at'][:10]}*")
             
@@ -894,6 +4581,8 @@ def candidate_dashboard():
             st.info("You haven't applied to any jobs yet.")
             return
         
+        sketches = get_score_sketches(list({app['job_id'] for app in applications}))
+        
         # Display applications
         for app in applications:
             st.markdown('<div class="card">', unsafe_allow_html=True)
@@ -905,8 +4594,10 @@ def candidate_dashboard():
                 st.markdown(f"Applied on: {app['applied_at'][:10]}")
             
             with col2:
-                score_class = "score-high" if app['match_score'] >= 7 else "score-medium" if app['match_score'] >= 5 else "score-low"
-                st.markdown(f'<p class="{score_class}">Match: {app["match_score"]}/10</p>', unsafe_allow_html=True)
+                st.markdown(score_badge("Match", app['match_score']), unsafe_allow_html=True)
+                percentiles = get_score_percentiles(app['job_id'], {'overall': app['match_score']}, sketches)
+                if 'overall' in percentiles:
+                    st.caption(f"Higher than {percentiles['overall']}% of applicants")
             
             with col3:
                 status_color = "🟢" if app['status'] == 'reviewed' else "🔴" if app['status'] == 'rejected' else "🟡"
@@ -947,68 +4638,255 @@ def candidate_dashboard():
         if job:
             job_detail_page(job)
 
+def score_badge(label: str, score: Optional[float]) -> str:
+    """HTML for a colored "label: X/10" score; imported applications may have no score."""
+    if score is None:
+        return f'<p class="score-medium">{label}: not scored</p>'
+    score_class = "score-high" if score >= 7 else "score-medium" if score >= 5 else "score-low"
+    return f'<p class="{score_class}">{label}: {score}/10</p>'
+
+def dashboard_overview(hr_id: int):
+    """Dashboard metrics and recent applications, updated from deltas after the first load."""
+    state = st.session_state.get('dashboard_state')
+    if not state or state['hr_id'] != hr_id:
+        state = get_dashboard_snapshot(hr_id)
+    else:
+        delta = get_dashboard_delta(hr_id, state['last_application_id'], state['last_change_id'])
+        if delta['added']:
+            st.toast(f"{delta['added']} new application(s)")
+        state = apply_dashboard_delta(state, delta)
+    st.session_state.dashboard_state = state
+
+    # Display metrics
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.markdown(f'<div class="metric-container"><h4>Total Jobs</h4><h2>{state["jobs"]}</h2></div>', unsafe_allow_html=True)
+
+    with col2:
+        st.markdown(f'<div class="metric-container"><h4>Total Applications</h4><h2>{state["applications"]}</h2></div>', unsafe_allow_html=True)
+
+    with col3:
+        st.markdown(f'<div class="metric-container"><h4>Reviewed</h4><h2>{state["reviewed"]}</h2></div>', unsafe_allow_html=True)
+
+    with col4:
+        if state['scored']:
+            avg_score = state['score_sum'] / state['scored']
+            st.markdown(f'<div class="metric-container"><h4>Avg Score</h4><h2>{avg_score:.1f}/10</h2></div>', unsafe_allow_html=True)
+        else:
+            st.markdown(f'<div class="metric-container"><h4>Avg Score</h4><h2>N/A</h2></div>', unsafe_allow_html=True)
+
+    # Recent applications
+    st.markdown("## Recent Applications")
+
+    if state['recent']:
+        for app in state['recent']:
+            st.markdown('<div class="card">', unsafe_allow_html=True)
+
+            col1, col2, col3 = st.columns([2, 1, 1])
+
+            with col1:
+                st.markdown(f"**{app['candidate_name']}**")
+                st.markdown(f"Applied for: {app['job_title']}")
+                st.markdown(f"Email: {app['candidate_email']}")
+
+            with col2:
+                st.markdown(score_badge("Score", app['match_score']), unsafe_allow_html=True)
+
+            with col3:
+                status_color = "🟢" if app['status'] == 'reviewed' else "🔴" if app['status'] == 'rejected' else "🟡"
+                st.markdown(f"{status_color} {app['status'].title()}")
+
+            st.markdown('</div>', unsafe_allow_html=True)
+    else:
+        st.info("No applications yet.")
+
+    st.caption(f"Updated {datetime.datetime.now().strftime('%H:%M:%S')}")
+
+def set_applications_page(page: int):
+    """Move the application table to another page."""
+    st.session_state.applications_page = page
+
+def application_detail_pane(hr_id: int, application_id: int):
+    """Show one application, loaded on demand."""
+    app = get_application_detail(hr_id, application_id)
+    if not app:
+        st.warning("Application not found.")
+        return
+
+    st.markdown(f"### {app['applicant_full_name']}")
+    if app['duplicate_of']:
+        st.warning(f"Near-duplicate of application #{app['duplicate_of']} from another account "
+                   f"({app['duplicate_similarity']:.0%} similar CV).")
+    st.markdown(f"**Position:** {app['job_title']}")
+    st.markdown(f"**Email:** {app['applicant_email']}")
+    st.markdown(f"**Phone:** {app['applicant_phone']}")
+
+    st.markdown(score_badge("Overall", app['match_score']), unsafe_allow_html=True)
+    st.markdown(f"Skills: {app['skills_score']}/10 · Experience: {app['experience_score']}/10")
+    percentiles = get_score_percentiles(app['job_id'], {dimension: app[column]
+                                                         for dimension, column in SCORE_DIMENSIONS.items()})
+    if percentiles:
+        st.caption("Percentile among this job's applicants: " +
+                   " · ".join(f"{dimension.title()} {value}" for dimension, value in percentiles.items()))
+    status_color = "🟢" if app['status'] == 'reviewed' else "🔴" if app['status'] == 'rejected' else "🟡"
+    st.markdown(f"{status_color} **{app['status'].title()}** · Applied: {app['applied_at'][:10]}")
+
+    st.markdown("**Professional Info:**")
+    st.markdown(f"- Total Experience: {app['total_experience']}")
+    st.markdown(f"- Current Salary: {app['current_salary']}")
+    st.markdown(f"- Expected Salary: {app['expected_salary']}")
+
+    st.markdown("**Skills Analysis:**")
+    if app['matched_skills']:
+        st.markdown(f"- Matched Skills: {', '.join(app['matched_skills'])}")
+    if app['missing_skills']:
+        st.markdown(f"- Missing Skills: {', '.join(app['missing_skills'])}")
+
+    if app['experience_summary']:
+        st.markdown("**Experience Summary:**")
+        st.markdown(app['experience_summary'])
+
+    generated = get_generated_content([application_id]).get(application_id, {})
+    if len(generated) < len(GENERATION_PROMPT_VERSIONS):
+        if st.button("Generate interview questions & feedback", key=f"generate_{application_id}"):
+            with st.spinner("Generating..."):
+                content, stats = generate_candidate_content(hr_id, [application_id], get_groq_client())
+            if stats['budget_exceeded']:
+                st.warning("Your LLM budget is used up; nothing was generated.")
+            generated = content.get(application_id, {})
+    show_generated_content(generated)
+
+def show_generated_content(generated: Dict):
+    """Show generated interview questions and candidate feedback, if any."""
+    if generated.get('interview_questions'):
+        st.markdown("**Interview Questions:**")
+        for number, question in enumerate(generated['interview_questions'], start=1):
+            st.markdown(f"{number}. {question}")
+    if generated.get('feedback'):
+        st.markdown("**Candidate Feedback:**")
+        st.markdown(generated['feedback'])
+
+def applications_table_view(hr_id: int, job_id: Optional[int], status: Optional[str]):
+    """Paged application table; filtering, sorting and paging run in SQL so only visible rows are loaded."""
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+
+    with col1:
+        search = st.text_input("Search by name or email").strip()
+
+    with col2:
+        sort_by = st.selectbox("Sort by", list(APPLICATION_SORT_COLUMNS),
+                               format_func=lambda column: column.replace('_', ' ').title())
+
+    with col3:
+        descending = st.selectbox("Order", ["Descending", "Ascending"]) == "Descending"
+
+    with col4:
+        page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=1)
+
+    # Go back to the first page whenever the query changes
+    query = (job_id, status, search, sort_by, descending, page_size)
+    if st.session_state.get('applications_query') != query:
+        st.session_state.applications_query = query
+        st.session_state.applications_page = 1
+
+    page = st.session_state.applications_page
+    rows, total = get_applications_page(hr_id, job_id, status, search, sort_by, descending,
+                                        offset=(page - 1) * page_size, limit=page_size)
+    pages = max(1, math.ceil(total / page_size))
+    if page > pages:
+        # The last page emptied, e.g. after a status change under a status filter
+        page = st.session_state.applications_page = pages
+        rows, total = get_applications_page(hr_id, job_id, status, search, sort_by, descending,
+                                            offset=(page - 1) * page_size, limit=page_size)
+
+    if not total:
+        st.info("No applications match these filters.")
+        return
+
+    table_col, detail_col = st.columns([3, 2])
+
+    with table_col:
+        event = st.dataframe(
+            rows,
+            key=f"applications_table_{hash(query)}_{page}",
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="multi-row",
+            column_order=['candidate_name', 'candidate_email', 'job_title', 'match_score', 'skills_score',
+                          'experience_score', 'status', 'applied_at', 'duplicate_of'],
+            column_config={
+                'candidate_name': "Candidate",
+                'candidate_email': "Email",
+                'job_title': "Position",
+                'match_score': st.column_config.NumberColumn("Overall", format="%d/10"),
+                'skills_score': st.column_config.NumberColumn("Skills", format="%d/10"),
+                'experience_score': st.column_config.NumberColumn("Experience", format="%d/10"),
+                'status': "Status",
+                'applied_at': "Applied",
+                'duplicate_of': st.column_config.NumberColumn("Duplicate Of", format="#%d",
+                                                              help="Earlier application with a near-identical CV")
+            }
+        )
+
+        # Pager
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            st.button("← Previous", disabled=page <= 1, on_click=set_applications_page, args=(page - 1,))
+        with col2:
+            first = (page - 1) * page_size + 1
+            st.caption(f"Rows {first}-{first + len(rows) - 1} of {total} · Page {page} of {pages}")
+        with col3:
+            st.button("Next →", disabled=page >= pages, on_click=set_applications_page, args=(page + 1,))
+
+        selected = [rows[index] for index in event.selection.rows if index < len(rows)]
+
+        # Bulk status update for the selected rows
+        if selected:
+            col1, col2 = st.columns([2, 1], vertical_alignment="bottom")
+            with col1:
+                new_status = st.selectbox(f"Set status of {len(selected)} selected",
+                                          ["reviewed", "rejected", "pending"])
+            with col2:
+                if st.button("Update Status"):
+                    updated = update_applications_status(hr_id, [app['id'] for app in selected], new_status)
+                    st.toast(f"Updated {updated} applications.")
+                    st.rerun()
+
+    with detail_col:
+        if not selected:
+            st.info("Select a row to see the application details.")
+        else:
+            application_id = selected[0]['id']
+            if len(selected) > 1:
+                names = {app['id']: f"{app['candidate_name']} - {app['job_title']}" for app in selected}
+                application_id = st.selectbox("Show details for", list(names), format_func=names.get)
+            application_detail_pane(hr_id, application_id)
+
 def hr_dashboard():
     """Display HR dashboard with job management and applications."""
     st.markdown('<div class="header-container"><h1>HR Dashboard</h1><p>Welcome, ' + st.session_state.user['full_name'] + '</p></div>', unsafe_allow_html=True)
     
     # Sidebar navigation
     st.sidebar.title("HR Navigation")
-    page = st.sidebar.selectbox("Select Page", ["Dashboard", "Create Job", "My Jobs", "All Applications", "Analytics"])
+    pages = ["Dashboard", "Create Job", "My Jobs", "All Applications", "Shortlist", "Analytics", "LLM Usage"]
+    if is_admin(st.session_state.user):
+        pages.append("Profiler")
+    page = st.sidebar.selectbox("Select Page", pages, key="page")
     
     if page == "Dashboard":
         st.markdown("## Dashboard Overview")
         
-        # Get statistics
-        user_jobs = get_jobs_by_creator(st.session_state.user['id'])
-        applications = get_applications_for_hr(st.session_state.user['id'])
-        
-        # Display metrics
-        col1, col2, col3, col4 = st.columns(4)
-        
+        col1, col2 = st.columns([1, 2])
         with col1:
-            st.markdown(f'<div class="metric-container"><h4>Total Jobs</h4><h2>{len(user_jobs)}</h2></div>', unsafe_allow_html=True)
-        
+            live = st.toggle("Live updates", value=True)
         with col2:
-            st.markdown(f'<div class="metric-container"><h4>Total Applications</h4><h2>{len(applications)}</h2></div>', unsafe_allow_html=True)
-        
-        with col3:
-            reviewed = sum(1 for app in applications if app['status'] == 'reviewed')
-            st.markdown(f'<div class="metric-container"><h4>Reviewed</h4><h2>{reviewed}</h2></div>', unsafe_allow_html=True)
-        
-        with col4:
-            if applications:
-                avg_score = sum(app['match_score'] for app in applications) / len(applications)
-                st.markdown(f'<div class="metric-container"><h4>Avg Score</h4><h2>{avg_score:.1f}/10</h2></div>', unsafe_allow_html=True)
-            else:
-                st.markdown(f'<div class="metric-container"><h4>Avg Score</h4><h2>N/A</h2></div>', unsafe_allow_html=True)
+            interval = st.select_slider("Refresh every (seconds)",
+                                        options=sorted({5, 10, 30, 60, 120, DASHBOARD_REFRESH_SECONDS}),
+                                        value=DASHBOARD_REFRESH_SECONDS, disabled=not live)
         
-        # Recent applications
-        st.markdown("## Recent Applications")
-        
-        if applications:
-            recent_apps = applications[:5]  # Show last 5
-            
-            for app in recent_apps:
-                st.markdown('<div class="card">', unsafe_allow_html=True)
-                
-                col1, col2, col3 = st.columns([2, 1, 1])
-                
-                with col1:
-                    st.markdown(f"**{app['candidate_name']}**")
-                    st.markdown(f"Applied for: {app['job_title']}")
-                    st.markdown(f"Email: {app['candidate_email']}")
-                
-                with col2:
-                    score_class = "score-high" if app['match_score'] >= 7 else "score-medium" if app['match_score'] >= 5 else "score-low"
-                    st.markdown(f'<p class="{score_class}">Score: {app["match_score"]}/10</p>', unsafe_allow_html=True)
-                
-                with col3:
-                    status_color = "🟢" if app['status'] == 'reviewed' else "🔴" if app['status'] == 'rejected' else "🟡"
-                    st.markdown(f"{status_color} {app['status'].title()}")
-                
-                st.markdown('</div>', unsafe_allow_html=True)
-        else:
-            st.info("No applications yet.")
+        # Only the metrics and recent applications rerun on each refresh
+        st.fragment(dashboard_overview, run_every=interval if live else None)(st.session_state.user['id'])
     
     elif page == "Create Job":
         st.markdown("## Create New Job Posting")
@@ -1053,6 +4931,9 @@ def hr_dashboard():
             st.info("You haven't created any job postings yet.")
             return
         
+        job_stats = get_job_application_stats(st.session_state.user['id'])
+        sketches = get_score_sketches([job['id'] for job in jobs])
+        
         for job in jobs:
             st.markdown('<div class="job-card">', unsafe_allow_html=True)
             
@@ -1066,42 +4947,107 @@ def hr_dashboard():
                 st.markdown(f"**Description:** {job['description'][:200]}...")
             
             with col2:
-                # Get application count for this job
-                job_applications = [app for app in get_applications_for_hr(st.session_state.user['id']) 
-                                  if app['job_id'] == job['id']]
-                st.markdown(f"**Applications:** {len(job_applications)}")
+                # Application count and average score for this job
+                stats = job_stats.get(job['id'], {'applications': 0, 'avg_score': None})
+                st.markdown(f"**Applications:** {stats['applications']}")
+                
+                if stats['avg_score'] is not None:
+                    st.markdown(f"**Avg Score:** {stats['avg_score']:.1f}/10")
+                    distribution = get_score_distribution(job['id'], sketches=sketches).get('overall')
+                    if distribution:
+                        st.caption(f"Overall score p25 {distribution[0.25]:g} · median {distribution[0.5]:g} · "
+                                   f"p75 {distribution[0.75]:g} · p90 {distribution[0.9]:g}")
                 
-                if job_applications:
-                    avg_score = sum(app['match_score'] for app in job_applications) / len(job_applications)
-                    st.markdown(f"**Avg Score:** {avg_score:.1f}/10")
+                if st.button("Close Job", key=f"close_job_{job['id']}",
+                             help="Stop accepting applications; they are archived in the background"):
+                    close_job(job['id'], st.session_state.user['id'])
+                    st.rerun()
+                
+                if stats['applications'] and st.button("Re-score", key=f"rescore_job_{job['id']}",
+                                                       help="Score every application again in packed batch requests"):
+                    progress_bar = st.progress(0.0, text="Re-scoring applications...")
+                    result = rescore_applications(st.session_state.user['id'], job['id'], get_groq_client(),
+                                                  progress=lambda done, total: progress_bar.progress(done / total))
+                    if result['budget_exceeded']:
+                        st.warning(f"Your LLM budget is used up; re-scored {result['rescored']} of "
+                                   f"{result['applications']} applications.")
+                    else:
+                        st.success(f"Re-scored {result['rescored']} applications with {result['llm_calls']} "
+                                   f"LLM request(s) in {result['seconds']:.1f}s.")
+                    if result['failed']:
+                        st.warning(f"{result['failed']} application(s) could not be scored and kept their "
+                                   f"previous scores; try again later.")
             
             st.markdown('</div>', unsafe_allow_html=True)
     
     elif page == "All Applications":
         st.markdown("## All Applications")
         
-        applications = get_applications_for_hr(st.session_state.user['id'])
+        hr_id = st.session_state.user['id']
+        jobs = {job['id']: job['title'] for job in get_jobs_by_creator(hr_id, include_inactive=True)}
         
-        if not applications:
+        if not jobs:
             st.info("No applications received yet.")
             return
         
         # Filter options
-        col1, col2 = st.columns(2)
+        col1, col2, col3 = st.columns([2, 2, 1])
         
         with col1:
             status_filter = st.selectbox("Filter by Status", ["All", "reviewed", "rejected", "pending"])
         
         with col2:
-            job_titles = list(set([app['job_title'] for app in applications]))
-            job_filter = st.selectbox("Filter by Job", ["All"] + job_titles)
+            job_filter = st.selectbox("Filter by Job", [None] + list(jobs),
+                                      format_func=lambda job_id: "All" if job_id is None else jobs[job_id])
+        
+        with col3:
+            view_mode = st.radio("View", ["Table", "Cards"], horizontal=True)
+        
+        status = status_filter if status_filter != "All" else None
+        
+        # Export
+        with st.expander("Export Applications"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                export_format = st.selectbox("Format", ["csv", "parquet"] if PARQUET_EXPORT_AVAILABLE else ["csv"],
+                                             help=None if PARQUET_EXPORT_AVAILABLE else "Install pyarrow to export Parquet")
+            with col2:
+                date_from = st.date_input("Applied from", value=None)
+            with col3:
+                date_to = st.date_input("Applied until", value=None)
+            
+            export_filters = {
+                'hr_id': hr_id,
+                'job_id': job_filter,
+                'status': status,
+                'date_from': date_from,
+                'date_to': date_to
+            }
+            st.caption("Uses the status and job filters above. The file is generated when you click download.")
+            st.download_button(
+                "Download Export",
+                data=lambda: export_applications_file(export_format, **export_filters),
+                file_name=f"applications_{datetime.date.today().isoformat()}.{export_format}",
+                mime="text/csv" if export_format == "csv" else "application/vnd.apache.parquet",
+                on_click="ignore"
+            )
+        
+        if view_mode == "Table":
+            applications_table_view(hr_id, job_filter, status)
+            return
+        
+        applications = get_applications_for_hr(hr_id)
+        
+        if not applications:
+            st.info("No applications received yet.")
+            return
         
         # Apply filters
         filtered_apps = applications
-        if status_filter != "All":
-            filtered_apps = [app for app in filtered_apps if app['status'] == status_filter]
-        if job_filter != "All":
-            filtered_apps = [app for app in filtered_apps if app['job_title'] == job_filter]
+        if status:
+            filtered_apps = [app for app in filtered_apps if app['status'] == status]
+        if job_filter is not None:
+            filtered_apps = [app for app in filtered_apps if app['job_id'] == job_filter]
         
         # Display applications
         for app in filtered_apps:
@@ -1117,8 +5063,7 @@ def hr_dashboard():
                 st.markdown(f"**Phone:** {app['applicant_phone']}")
             
             with col2:
-                score_class = "score-high" if app['match_score'] >= 7 else "score-medium" if app['match_score'] >= 5 else "score-low"
-                st.markdown(f'<p class="{score_class}">Overall: {app["match_score"]}/10</p>', unsafe_allow_html=True)
+                st.markdown(score_badge("Overall", app['match_score']), unsafe_allow_html=True)
                 st.markdown(f"Skills: {app['skills_score']}/10")
                 st.markdown(f"Experience: {app['experience_score']}/10")
             
@@ -1150,8 +5095,100 @@ def hr_dashboard():
             
             st.markdown('</div>', unsafe_allow_html=True)
     
+    elif page == "Shortlist":
+        st.markdown("## Shortlist")
+        
+        hr_id = st.session_state.user['id']
+        jobs = {job['id']: job['title'] for job in get_jobs_by_creator(hr_id)}
+        
+        if not jobs:
+            st.info("You have no open job postings.")
+            return
+        
+        col1, col2 = st.columns([3, 1])
+        
+        with col1:
+            selected_jobs = st.multiselect("Jobs", list(jobs), format_func=jobs.get,
+                                           placeholder="All open jobs")
+        
+        with col2:
+            k = st.number_input("Top candidates", min_value=1, max_value=200, value=20)
+        
+        st.markdown("**Ranking weights**")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            w_match = st.slider("Overall match", 0.0, 1.0, 1.0, 0.1)
+        with col2:
+            w_skills = st.slider("Skills", 0.0, 1.0, 0.0, 0.1)
+        with col3:
+            w_experience = st.slider("Experience", 0.0, 1.0, 0.0, 0.1)
+        
+        st.markdown("**Minimum scores**")
+        col1, col2 = st.columns(2)
+        with col1:
+            min_skills = st.slider("Minimum skills score", 0, 10, 0)
+        with col2:
+            min_experience = st.slider("Minimum experience score", 0, 10, 0)
+        
+        if not (w_match or w_skills or w_experience):
+            st.warning("Give at least one score a weight.")
+            return
+        
+        started = time.perf_counter()
+        shortlist = get_shortlist(hr_id, selected_jobs or None, k,
+                                  {'match': w_match, 'skills': w_skills, 'experience': w_experience},
+                                  min_skills, min_experience)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        if not shortlist:
+            st.info("No applications match these criteria.")
+            return
+        
+        st.dataframe(
+            shortlist,
+            hide_index=True,
+            column_order=['rank', 'candidate_name', 'job_title', 'weighted_score', 'match_score',
+                          'skills_score', 'experience_score', 'status'],
+            column_config={
+                'rank': "Rank",
+                'candidate_name': "Candidate",
+                'job_title': "Position",
+                'weighted_score': st.column_config.NumberColumn("Weighted Score", format="%.2f"),
+                'match_score': st.column_config.NumberColumn("Overall", format="%d/10"),
+                'skills_score': st.column_config.NumberColumn("Skills", format="%d/10"),
+                'experience_score': st.column_config.NumberColumn("Experience", format="%d/10"),
+                'status': "Status"
+            }
+        )
+        st.caption(f"Top {len(shortlist)} of your applications, ranked in {elapsed_ms:.1f} ms.")
+        
+        st.markdown("### Interview Questions & Feedback")
+        application_ids = [row['application_id'] for row in shortlist]
+        generated = get_generated_content(application_ids)
+        pending = [a for a in application_ids if len(generated.get(a, {})) < len(GENERATION_PROMPT_VERSIONS)]
+        
+        if pending:
+            st.caption(f"{len(application_ids) - len(pending)} of {len(application_ids)} candidates already have "
+                       f"questions and feedback.")
+            if st.button(f"Generate for {len(pending)} candidate(s)"):
+                with st.spinner("Generating interview questions and feedback..."):
+                    generated, stats = generate_candidate_content(hr_id, application_ids, get_groq_client())
+                if stats['budget_exceeded']:
+                    st.warning("Your LLM budget is used up; nothing was generated.")
+                else:
+                    st.success(f"Generated for {stats['generated']} candidate(s) in {stats['llm_calls']} request(s).")
+                if stats['failed'] and not stats['budget_exceeded']:
+                    st.warning(f"{stats['failed']} candidate(s) could not be generated; try again.")
+        
+        for row in shortlist:
+            if generated.get(row['application_id']):
+                with st.expander(f"#{row['rank']} {row['candidate_name']} - {row['job_title']}"):
+                    show_generated_content(generated[row['application_id']])
+    
     elif page == "Analytics":
         st.markdown("## Analytics Dashboard")
+        import pandas as pd
+        import plotly.express as px
         
         applications = get_applications_for_hr(st.session_state.user['id'])
         
@@ -1199,17 +5236,147 @@ def hr_dashboard():
             title="Applications Over Time"
         )
         st.plotly_chart(fig_timeline, use_container_width=True)
+    
+    elif page == "LLM Usage":
+        st.markdown("## LLM Usage & Costs")
+        
+        hr_id = st.session_state.user['id']
+        report = get_llm_usage_report(hr_id)
+        budget = get_llm_budget(hr_id)
+        spend = get_llm_spend(hr_id)
+        totals = report['totals']
+        
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.markdown(f'<div class="metric-container"><h4>Spend Today</h4><h2>${spend["today_usd"]:.4f}</h2></div>', unsafe_allow_html=True)
+        
+        with col2:
+            st.markdown(f'<div class="metric-container"><h4>Spend This Month</h4><h2>${spend["month_usd"]:.4f}</h2></div>', unsafe_allow_html=True)
+        
+        with col3:
+            st.markdown(f'<div class="metric-container"><h4>Total Tokens</h4><h2>{totals.get("total_tokens") or 0:,}</h2></div>', unsafe_allow_html=True)
+        
+        with col4:
+            applications_count = totals.get('applications') or 0
+            per_application = (totals.get('cost_usd') or 0) / applications_count if applications_count else 0
+            st.markdown(f'<div class="metric-container"><h4>Cost / Application</h4><h2>${per_application:.5f}</h2></div>', unsafe_allow_html=True)
+        
+        if is_llm_budget_exceeded(hr_id):
+            st.warning("Budget exceeded - new applications to your jobs are scored with the local analyzer.")
+        
+        st.markdown("### Usage per Job")
+        if report['by_job']:
+            st.dataframe(report['by_job'], use_container_width=True, hide_index=True)
+        else:
+            st.info("No LLM usage recorded yet.")
+        
+        st.markdown("### Usage per Day")
+        if report['by_day']:
+            st.dataframe(report['by_day'], use_container_width=True, hide_index=True)
+        
+        cascade_stats = get_cascade_stats(hr_id)
+        if cascade_stats['runs']:
+            st.markdown("### Scoring Cascade")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Escalation Rate", f"{cascade_stats['escalation_rate'] * 100:.1f}%",
+                          help=f"{cascade_stats['escalated']} of {cascade_stats['runs']} applications")
+            with col2:
+                st.metric("Avg Fast-Tier Latency", f"{cascade_stats['avg_first_tier_latency_ms']:.0f} ms")
+            with col3:
+                saved = cascade_stats['latency_saved_ms']
+                st.metric("Latency Saved vs Large Model", f"{saved / 1000:.1f} s" if saved is not None else "N/A")
+        
+        st.markdown("### LLM Queue")
+        st.caption("Requests are served interactive first, then HR on-demand, then batch; wait times are since server start.")
+        st.dataframe(get_llm_scheduler().stats(), use_container_width=True, hide_index=True)
+        precompute_stats = get_cv_precompute().stats()
+        st.caption(f"CVs processed while candidates filled in the form: {precompute_stats['started']} started, "
+                   f"{precompute_stats['used']} used at submission, {precompute_stats['discarded']} discarded, "
+                   f"{precompute_stats['pending']} pending.")
+        
+        st.markdown("### CV Text Extraction")
+        st.caption("Pages with a text layer are read directly; scanned pages are OCRed on a separate worker pool. Since server start.")
+        st.dataframe(get_ocr_pool().stats(), use_container_width=True, hide_index=True)
+        
+        st.markdown("### Budget")
+        with st.form("llm_budget_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                daily_limit = st.number_input("Daily limit (USD, 0 = default)", min_value=0.0, step=0.5,
+                                              value=float(budget['daily_limit_usd'] or 0))
+            with col2:
+                monthly_limit = st.number_input("Monthly limit (USD, 0 = default)", min_value=0.0, step=5.0,
+                                                value=float(budget['monthly_limit_usd'] or 0))
+            if st.form_submit_button("Save Budget"):
+                if set_llm_budget(hr_id, daily_limit or None, monthly_limit or None):
+                    st.success("Budget saved.")
+                else:
+                    st.error("Failed to save budget")
+    
+    elif page == "Profiler" and is_admin(st.session_state.user):
+        st.markdown("## Page Profiler")
+        st.caption(f"Turn on **Profile page runs** in the sidebar to sample every run of your session's pages "
+                   f"every {PROFILE_INTERVAL_MS:g} ms. The latest {PROFILE_KEEP} profiles of each page are kept.")
+        
+        profiles = get_page_profiles()
+        if not profiles:
+            st.info("No profiles recorded yet.")
+            return
+        
+        page_filter = st.selectbox("Page", ["All"] + sorted({profile['page'] for profile in profiles}))
+        if page_filter != "All":
+            profiles = [profile for profile in profiles if profile['page'] == page_filter]
+        st.dataframe(profiles, use_container_width=True, hide_index=True)
+        
+        profile = st.selectbox("Profile", profiles,
+                               format_func=lambda p: f"#{p['id']} {p['page']} - {p['duration_ms']:.0f} ms "
+                                                     f"({p['samples']} samples) at {p['created_at']}")
+        stacks = get_page_profile_stacks(profile['id'])
+        
+        flame_tab, top_tab = st.tabs(["Flame Graph", "Top Functions"])
+        with flame_tab:
+            import plotly.express as px
+            nodes = profile_flame_graph_data(stacks)
+            fig = px.icicle(ids=nodes['ids'], names=nodes['labels'], parents=nodes['parents'],
+                            values=nodes['values'])
+            fig.update_traces(branchvalues="total", tiling_orientation="v", root_color="lightgrey",
+                              hovertemplate="%{label}<br>%{value} samples (%{percentRoot:.1%})<extra></extra>")
+            fig.update_layout(margin=dict(t=10, l=10, r=10, b=10), height=600)
+            st.plotly_chart(fig, use_container_width=True)
+        with top_tab:
+            st.dataframe(profile_top_functions(stacks), use_container_width=True, hide_index=True)
 
 def main():
     """Main application function."""
     st.set_page_config(page_title="CV Analyzer", page_icon="📄", layout="wide")
     
     # Initialize database
-    init_database()
+    try:
+        init_database()
+    except RuntimeError as e:
+        st.error(str(e))
+        st.stop()
+    get_archiver()
     
     # Set custom styling
     set_custom_styling()
     
+    # Profiling is only set up for admins who turned it on, so normal runs pay nothing
+    user = st.session_state.get('user')
+    if st.session_state.get('profiling') and is_admin(user):
+        profiler = SamplingProfiler()
+        try:
+            with profiler:
+                show_current_page()
+        finally:
+            save_page_profile(st.session_state.get('page', "Logout"), user['id'], profiler)
+    else:
+        show_current_page()
+
+def show_current_page():
+    """Show the login page or the user's dashboard."""
     # Check if user is logged in
     if 'user' not in st.session_state:
         login_page()
@@ -1222,6 +5389,9 @@ def main():
         
         # Logout button in sidebar
         st.sidebar.markdown("---")
+        if is_admin(st.session_state.user):
+            st.sidebar.toggle("Profile page runs", key="profiling",
+                              help="Sample this session's page runs; view them on the Profiler page")
         if st.sidebar.button("Logout"):
             # Clear session state
             for key in list(st.session_state.keys()):
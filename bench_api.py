@@ -0,0 +1,157 @@
+"""Load test for the HTTP API.
+
+Starts api:app under uvicorn on a temporary database with a stub LLM client, then
+drives it from concurrent HTTP clients and reports requests/second and latency
+percentiles per endpoint. No Groq API key or network access is needed.
+
+Examples:
+    python bench_api.py
+    python bench_api.py --clients 32 --duration 20 --llm-latency 0.5
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+import uvicorn
+
+import app as cv_analyzer
+import api
+from llm_stub import StubGroqClient
+
+
+def seed_database(jobs: int, candidates: int):
+    """Create an HR user, jobs and candidate accounts; returns (job_ids, candidate_ids)."""
+    cv_analyzer.init_database()
+    cv_analyzer.create_user('bench_hr', 'bench_hr@example.com', 'password', 'Bench HR', 'hr')
+    hr_id = cv_analyzer.authenticate_user('bench_hr', 'password')['id']
+    for i in range(jobs):
+        cv_analyzer.create_job(f"Python Developer {i}", "Build data services in Python.",
+                               "Python, SQL, REST APIs, 3+ years experience", "Engineering",
+                               "Remote", "", hr_id)
+    for i in range(candidates):
+        cv_analyzer.create_user(f"bench_candidate_{i}", f"candidate_{i}@example.com", 'password',
+                                f"Candidate {i}")
+    conn = cv_analyzer.sqlite3.connect(cv_analyzer.DB_PATH)
+    job_ids = [row[0] for row in conn.execute('SELECT id FROM jobs')]
+    candidate_ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE role = 'candidate'")]
+    conn.close()
+    return hr_id, job_ids, candidate_ids
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def client_worker(port, deadline, hr_id, job_ids, candidate_ids, submit_ratio, results, tracking_ids, seed):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    while time.perf_counter() < deadline:
+        roll = rng.random()
+        if roll < submit_ratio:
+            name = 'POST /applications'
+            body = json.dumps({
+                'job_id': rng.choice(job_ids),
+                'candidate_id': rng.choice(candidate_ids),
+                'cv_text': "Software Engineer at Example Corp 2019 - Present. Python, SQL, REST APIs.",
+                'applicant': {'full_name': "Bench Candidate", 'email': "bench@example.com"}
+            })
+            request = ('POST', '/applications', body, {'Content-Type': 'application/json'})
+        elif roll < submit_ratio + (1 - submit_ratio) / 3:
+            name = 'GET /jobs'
+            request = ('GET', '/jobs', None, {})
+        elif roll < submit_ratio + 2 * (1 - submit_ratio) / 3:
+            name = 'GET /jobs/{id}/rankings'
+            request = ('GET', f"/jobs/{rng.choice(job_ids)}/rankings", None, {})
+        else:
+            name = 'GET /applications'
+            request = ('GET', f"/applications?hr_id={hr_id}", None, {})
+
+        started = time.perf_counter()
+        conn.request(request[0], request[1], body=request[2], headers=request[3])
+        response = conn.getresponse()
+        payload = response.read()
+        results.append((name, response.status, time.perf_counter() - started))
+        if response.status == 202:
+            tracking_ids.append(json.loads(payload)['tracking_id'])
+    conn.close()
+
+
+def wait_for_submissions(tracking_ids, timeout):
+    """Poll until every submission has left the queue; returns status counts."""
+    deadline = time.time() + timeout
+    while True:
+        conn = cv_analyzer.sqlite3.connect(cv_analyzer.DB_PATH)
+        counts = dict(conn.execute('SELECT status, COUNT(*) FROM submissions GROUP BY status').fetchall())
+        conn.close()
+        pending = counts.get('queued', 0) + counts.get('processing', 0)
+        if not pending or time.time() > deadline:
+            return counts
+        time.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the CV Analyzer HTTP API")
+    parser.add_argument('--clients', type=int, default=16, help="Concurrent HTTP clients")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds to generate load")
+    parser.add_argument('--jobs', type=int, default=50)
+    parser.add_argument('--candidates', type=int, default=500)
+    parser.add_argument('--submit-ratio', type=float, default=0.2, help="Share of requests that are submissions")
+    parser.add_argument('--llm-latency', type=float, default=0.2, help="Simulated seconds per LLM call")
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="cv_analyzer_bench_")
+    cv_analyzer.DB_PATH = os.path.join(workdir, "bench.db")
+    hr_id, job_ids, candidate_ids = seed_database(args.jobs, args.candidates)
+
+    stub = StubGroqClient(latency=args.llm_latency, seed=1)
+    api.client_factory = lambda: stub
+
+    server = uvicorn.Server(uvicorn.Config(api.app, host='127.0.0.1', port=args.port, log_level='warning'))
+    server_thread = threading.Thread(target=server.run, daemon=True)
+    server_thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    results, tracking_ids = [], []
+    deadline = time.perf_counter() + args.duration
+    started = time.perf_counter()
+    workers = [threading.Thread(target=client_worker,
+                                args=(args.port, deadline, hr_id, job_ids, candidate_ids, args.submit_ratio,
+                                      results, tracking_ids, seed))
+               for seed in range(args.clients)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"{len(results):,} requests from {args.clients} clients in {elapsed:.1f}s "
+          f"= {len(results) / elapsed:,.0f} req/s")
+    print(f"{'endpoint':<26}{'count':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for name in sorted({r[0] for r in results}):
+        latencies = [r[2] * 1000 for r in results if r[0] == name]
+        errors = sum(1 for r in results if r[0] == name and r[1] >= 400)
+        print(f"{name:<26}{len(latencies):>8,}{len(latencies) / elapsed:>9,.0f}"
+              f"{statistics.median(latencies):>9.1f}{percentile(latencies, 95):>9.1f}"
+              f"{percentile(latencies, 99):>9.1f}{errors:>8}")
+
+    drain_started = time.perf_counter()
+    counts = wait_for_submissions(tracking_ids, timeout=max(60, len(tracking_ids) * args.llm_latency * 4))
+    print(f"Submissions: {len(tracking_ids):,} accepted, processed in "
+          f"{time.perf_counter() - started:.1f}s ({time.perf_counter() - drain_started:.1f}s after load stopped), "
+          f"statuses {counts}, {stub.calls:,} LLM calls")
+
+    server.should_exit = True
+    server_thread.join()
+
+
+if __name__ == "__main__":
+    main()
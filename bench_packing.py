@@ -0,0 +1,89 @@
+"""Throughput benchmark for packed batch scoring.
+
+Scores the same set of short CVs against one job twice, once with one request per CV
+(analyze_cv) and once packed (analyze_cvs_batch), using a stub LLM client that charges a
+fixed per-request latency plus a per-generated-token latency. Reports requests, tokens,
+wall time and CVs per second for both, and the throughput gain of packing. No Groq API
+key or network access is needed.
+
+Examples:
+    python bench_packing.py
+    python bench_packing.py --cvs 200 --latency 0.4 --token-latency 0.002 --concurrency 2
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import app
+from llm_stub import StubGroqClient
+
+JOB_DESCRIPTION = ("Build and operate data services in Python.\n\nRequirements:\n"
+                   "Python, SQL, REST APIs, Docker, 3+ years experience")
+
+SKILLS = ['Python', 'SQL', 'Django', 'FastAPI', 'Docker', 'Kubernetes', 'AWS', 'React', 'Go', 'Airflow']
+
+
+def make_cvs(count):
+    """Short synthetic CVs of varying length."""
+    cvs = []
+    for i in range(count):
+        skills = ', '.join(SKILLS[j % len(SKILLS)] for j in range(i % 5 + 3))
+        cvs.append(f"Candidate {i}\nSoftware Engineer at Example Corp {2015 + i % 8} - Present.\n"
+                   f"Skills: {skills}.\n" + "Built internal services and data pipelines. " * (i % 6 + 2))
+    return cvs
+
+
+def run(items, client, packed):
+    usage_log = []
+    started = time.perf_counter()
+    results, _ = app.analyze_cvs_batch(items, JOB_DESCRIPTION, client, usage_log=usage_log, packed=packed)
+    return {
+        'seconds': time.perf_counter() - started,
+        'scored': len(results),
+        'requests': len(usage_log),
+        'retries': sum(1 for entry in usage_log if entry['call_type'] == 'analyze_cv') if packed else 0,
+        'tokens': sum(entry['prompt_tokens'] + entry['completion_tokens'] for entry in usage_log)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare packed batch scoring with one request per CV")
+    parser.add_argument('--cvs', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.3, help="Simulated seconds per LLM request")
+    parser.add_argument('--token-latency', type=float, default=0.001,
+                        help="Simulated seconds per generated token")
+    parser.add_argument('--concurrency', type=int, default=app.LLM_CLASS_CONCURRENCY[app.PRIORITY_BATCH],
+                        help="Concurrent batch-class LLM requests (at most LLM_MAX_CONCURRENCY)")
+    args = parser.parse_args()
+
+    app.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="cv_analyzer_packing_"), "bench.db")
+    app.LLM_CLASS_CONCURRENCY[app.PRIORITY_BATCH] = args.concurrency
+
+    work_experience = {"work_experience": [
+        {"position": "Software Engineer", "company": "Example Corp", "start_date": "2019-01", "end_date": "Present"}
+    ]}
+    items = [{'key': i, 'cv_text': cv_text, 'work_experience': work_experience}
+             for i, cv_text in enumerate(make_cvs(args.cvs))]
+    packs = app.plan_packs([app.estimate_tokens(item['cv_text']) for item in items],
+                           app.estimate_tokens(JOB_DESCRIPTION))
+    print(f"{args.cvs} CVs, {args.latency:g}s per request + {args.token_latency:g}s per generated token, "
+          f"{args.concurrency} concurrent; packing plans {len(packs)} requests "
+          f"({args.cvs / len(packs):.1f} CVs each)")
+
+    results = {}
+    for label, packed in (('one per CV', False), ('packed', True)):
+        client = StubGroqClient(latency=args.latency, token_latency=args.token_latency, seed=1)
+        results[label] = run(items, client, packed)
+
+    print(f"{'mode':<14}{'scored':>8}{'requests':>10}{'retries':>9}{'tokens':>10}{'seconds':>9}{'CVs/s':>8}")
+    for label, result in results.items():
+        print(f"{label:<14}{result['scored']:>8}{result['requests']:>10}{result['retries']:>9}"
+              f"{result['tokens']:>10,}{result['seconds']:>9.1f}{result['scored'] / result['seconds']:>8.1f}")
+    single, packed = results['one per CV'], results['packed']
+    print(f"Packing: {single['seconds'] / packed['seconds']:.1f}x throughput, "
+          f"{1 - packed['tokens'] / single['tokens']:.0%} fewer tokens")
+
+
+if __name__ == "__main__":
+    main()
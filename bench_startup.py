@@ -0,0 +1,125 @@
+"""Cold start benchmark for app.py.
+
+Measures, each in a fresh interpreter:
+  * import time of app.py on top of streamlit itself (streamlit's own import cost is
+    reported separately since the app cannot influence it),
+  * first paint of the login page (one script run through streamlit's AppTest),
+and checks that the heavy dependencies only needed by the Analytics page or CV submission
+are not loaded at startup.
+
+Exits non-zero if the app import exceeds the budget or a heavy module is loaded eagerly,
+so it can run as a CI gate. --compare runs the same measurements on app.py from another
+git revision for a before/after comparison.
+
+Examples:
+    python bench_startup.py
+    python bench_startup.py --runs 7 --budget-ms 150
+    python bench_startup.py --compare HEAD~1
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+LAZY_MODULES = ['pandas', 'plotly.express', 'groq', 'PyPDF2', 'dateutil', 'pyarrow']
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import streamlit
+streamlit_done = time.perf_counter()
+import app
+finished = time.perf_counter()
+print(json.dumps({
+    'streamlit_ms': (streamlit_done - started) * 1000,
+    'app_ms': (finished - streamlit_done) * 1000,
+    'loaded': [name for name in %r if name in sys.modules]
+}))
+"""
+
+FIRST_PAINT_PROBE = """
+import json, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file('app.py', default_timeout=60)
+at.run()
+assert not at.exception, [e.value for e in at.exception]
+print(json.dumps({'first_paint_ms': (time.perf_counter() - started) * 1000}))
+"""
+
+
+def probe(source_dir, code, db_path):
+    env = dict(os.environ, CV_ANALYZER_DB=db_path, PYTHONDONTWRITEBYTECODE='1')
+    result = subprocess.run([sys.executable, '-c', code], cwd=source_dir, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(source_dir, runs):
+    """Return median import/first-paint timings and the eagerly loaded heavy modules."""
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'startup.db')
+        imports = [probe(source_dir, IMPORT_PROBE % (LAZY_MODULES,), db_path) for _ in range(runs)]
+        paints = [probe(source_dir, FIRST_PAINT_PROBE, db_path) for _ in range(runs)]
+    return {
+        'streamlit_ms': statistics.median(r['streamlit_ms'] for r in imports),
+        'app_ms': statistics.median(r['app_ms'] for r in imports),
+        'first_paint_ms': statistics.median(r['first_paint_ms'] for r in paints),
+        'loaded': imports[-1]['loaded']
+    }
+
+
+def checkout(revision, target):
+    """Write app.py from a git revision into target."""
+    source = subprocess.run(['git', 'show', f"{revision}:app.py"], capture_output=True, text=True, check=True)
+    with open(os.path.join(target, 'app.py'), 'w', encoding='utf-8') as f:
+        f.write(source.stdout)
+
+
+def report(label, timings):
+    print(f"{label:<12}{timings['streamlit_ms']:>14.0f}{timings['app_ms']:>12.0f}{timings['first_paint_ms']:>16.0f}"
+          f"  {', '.join(timings['loaded']) or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure app.py cold start and login first paint")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per measurement (median reported)")
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv("STARTUP_BUDGET_MS", "200")),
+                        help="Maximum import time of app.py on top of streamlit")
+    parser.add_argument('--compare', metavar='REVISION', help="Also measure app.py from this git revision")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    print(f"{'':<12}{'streamlit ms':>14}{'app.py ms':>12}{'login paint ms':>16}  heavy modules loaded")
+
+    if args.compare:
+        baseline_dir = tempfile.mkdtemp(prefix='cv_analyzer_startup_')
+        try:
+            checkout(args.compare, baseline_dir)
+            baseline = measure(baseline_dir, args.runs)
+        finally:
+            shutil.rmtree(baseline_dir)
+        report(args.compare, baseline)
+
+    current = measure(here, args.runs)
+    report('working tree', current)
+    if args.compare:
+        print(f"app.py import: {baseline['app_ms'] - current['app_ms']:+.0f} ms saved, "
+              f"login first paint: {baseline['first_paint_ms'] - current['first_paint_ms']:+.0f} ms saved")
+
+    failures = []
+    if current['app_ms'] > args.budget_ms:
+        failures.append(f"app.py import took {current['app_ms']:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    if current['loaded']:
+        failures.append(f"heavy modules loaded at startup: {', '.join(current['loaded'])}")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Command line tools for the CV Analyzer database.
+
+Examples:
+    python cli.py export --format csv --output applications.csv --status reviewed
+    python cli.py export --format parquet --output applications.parquet --hr-id 3 --since 2024-01-01
+    python cli.py import jobs ats_jobs.csv --created-by 3
+    python cli.py import applications ats_applications.jsonl
+    python cli.py archive --older-than-days 365
+    python cli.py index-signatures
+    python cli.py gc-blobs --grace-seconds 3600
+    python cli.py rescore --job-id 12
+    python cli.py rebuild-sketches
+    python cli.py dedupe-applications --dry-run
+"""
+import argparse
+import sys
+
+import app
+
+
+def export_command(args):
+    """Stream applications to CSV or Parquet."""
+    filters = {
+        'hr_id': args.hr_id,
+        'job_id': args.job_id,
+        'status': args.status,
+        'date_from': args.since,
+        'date_to': args.until,
+        'chunk_size': args.chunk_size
+    }
+
+    if args.format == 'parquet':
+        if not app.PARQUET_EXPORT_AVAILABLE:
+            sys.exit("Parquet export needs pyarrow (pip install pyarrow)")
+        if args.output == '-':
+            sys.exit("Parquet export needs an --output file")
+        count = app.write_applications_parquet(args.output, **filters)
+    elif args.output == '-':
+        count = app.write_applications_csv(sys.stdout, **filters)
+    else:
+        with open(args.output, 'w', newline='', encoding='utf-8') as output:
+            count = app.write_applications_csv(output, **filters)
+
+    print(f"Exported {count} applications to {args.output}", file=sys.stderr)
+
+
+def import_command(args):
+    """Bulk load jobs or applications from CSV/JSONL."""
+    def report(rows, inserted, seconds):
+        print(f"{args.kind}: {rows:,} rows read, {inserted:,} inserted "
+              f"({rows / seconds if seconds else 0:,.0f} rows/s)", file=sys.stderr)
+
+    stats = app.bulk_import(args.kind, app.read_import_records(args.path), batch_size=args.batch_size,
+                            created_by=args.created_by, progress=report)
+    print(f"Imported {stats['inserted']:,} of {stats['rows']:,} {args.kind} "
+          f"({stats['skipped']:,} duplicates or unresolved skipped) in {stats['seconds']:.1f}s "
+          f"- {stats['rows_per_second']:,.0f} rows/s", file=sys.stderr)
+
+
+def archive_command(args):
+    """Move blobs of closed-job and aged-out applications to the archive database."""
+    app.init_database()
+    stats = app.archive_applications(older_than_days=args.older_than_days, batch_size=args.batch_size,
+                                     max_batches=args.max_batches)
+    ratio = stats['bytes_before'] / stats['bytes_after'] if stats['bytes_after'] else 0
+    print(f"Archived {stats['archived']:,} applications in {stats['batches']:,} batches to {app.get_archive_path()} "
+          f"({stats['bytes_before']:,} bytes -> {stats['bytes_after']:,} compressed, {ratio:.1f}x)", file=sys.stderr)
+
+
+def index_signatures_command(args):
+    """Compute duplicate-detection signatures for applications stored without one."""
+    app.init_database()
+    count = app.index_missing_cv_signatures(batch_size=args.batch_size)
+    print(f"Indexed {count:,} CVs for duplicate detection", file=sys.stderr)
+
+
+def gc_blobs_command(args):
+    """Delete uploaded CV files no application references."""
+    app.init_database()
+    stats = app.collect_blob_garbage(grace_seconds=args.grace_seconds)
+    remaining = app.get_blob_stats()
+    print(f"Deleted {stats['deleted']:,} unreferenced blobs ({stats['bytes_freed']:,} bytes) and "
+          f"{stats['temp_files_removed']:,} interrupted uploads from {app.get_blob_store_path()}; "
+          f"{remaining['blobs']:,} blobs ({remaining['bytes']:,} bytes) remain", file=sys.stderr)
+
+
+def rebuild_sketches_command(args):
+    """Rebuild score percentile sketches from the stored application scores."""
+    app.init_database()
+    conn = app.sqlite3.connect(app.DB_PATH)
+    jobs = app.build_score_sketches(conn.cursor(), None if args.job_id is None else [args.job_id])
+    conn.commit()
+    conn.close()
+    print(f"Rebuilt score sketches for {jobs:,} jobs", file=sys.stderr)
+
+
+def dedupe_applications_command(args):
+    """Remove duplicate applications left by databases from before the unique application index."""
+    stats = app.dedupe_applications(dry_run=args.dry_run)
+    if not stats['duplicates']:
+        print("No duplicate applications found; the unique application index is in place", file=sys.stderr)
+    elif args.dry_run:
+        print(f"{stats['duplicates']:,} duplicate applications across {stats['jobs']:,} jobs would be removed "
+              f"(the earliest application of each candidate and job is kept)", file=sys.stderr)
+    else:
+        print(f"Removed {stats['duplicates']:,} duplicate applications across {stats['jobs']:,} jobs and added "
+              f"the unique application index", file=sys.stderr)
+
+
+def rescore_command(args):
+    """Re-score a job's applications with packed batch requests."""
+    app.init_database()
+    job = app.get_job_by_id(args.job_id)
+    if not job:
+        sys.exit(f"Job {args.job_id} not found")
+
+    def report(done, total):
+        print(f"{done:,}/{total:,} applications", file=sys.stderr)
+
+    stats = app.rescore_applications(job['created_by'], args.job_id, app.get_groq_client(),
+                                     packed=not args.unpacked, progress=report)
+    print(f"Re-scored {stats['rescored']:,} of {stats['applications']:,} applications with "
+          f"{stats['llm_calls']:,} LLM calls ({stats['tokens']:,} tokens) in {stats['seconds']:.1f}s; "
+          f"{stats['failed']:,} could not be scored and kept their scores"
+          + (" - stopped, LLM budget used up" if stats['budget_exceeded'] else ""), file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CV Analyzer command line tools")
+    parser.add_argument('--db', help="SQLite database path (default: $CV_ANALYZER_DB or cv_analyzer.db)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help="Export applications as CSV or Parquet")
+    export_parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    export_parser.add_argument('--output', default='-', help="Output file ('-' writes CSV to stdout)")
+    export_parser.add_argument('--hr-id', type=int, help="Only jobs created by this HR user")
+    export_parser.add_argument('--job-id', type=int)
+    export_parser.add_argument('--status', choices=['reviewed', 'rejected', 'pending'])
+    export_parser.add_argument('--since', help="Applied on or after this date (YYYY-MM-DD)")
+    export_parser.add_argument('--until', help="Applied on or before this date (YYYY-MM-DD)")
+    export_parser.add_argument('--chunk-size', type=int, default=app.EXPORT_CHUNK_SIZE)
+    export_parser.set_defaults(func=export_command)
+
+    import_parser = subparsers.add_parser('import', help="Bulk import jobs or historical applications")
+    import_parser.add_argument('kind', choices=['jobs', 'applications'])
+    import_parser.add_argument('path', help="CSV or JSONL (.jsonl/.ndjson) file")
+    import_parser.add_argument('--created-by', type=int, help="HR user id for jobs without a created_by column")
+    import_parser.add_argument('--batch-size', type=int, default=app.IMPORT_BATCH_SIZE,
+                               help="Rows per transaction")
+    import_parser.set_defaults(func=import_command)
+
+    archive_parser = subparsers.add_parser('archive', help="Archive applications of closed or old jobs")
+    archive_parser.add_argument('--older-than-days', type=int, default=app.ARCHIVE_AFTER_DAYS,
+                                help="Also archive applications older than this")
+    archive_parser.add_argument('--batch-size', type=int, default=app.ARCHIVE_BATCH_SIZE,
+                                help="Applications per transaction")
+    archive_parser.add_argument('--max-batches', type=int, help="Stop after this many batches")
+    archive_parser.set_defaults(func=archive_command)
+
+    signatures_parser = subparsers.add_parser('index-signatures',
+                                              help="Index imported or older CVs for duplicate detection")
+    signatures_parser.add_argument('--batch-size', type=int, default=500, help="Applications per transaction")
+    signatures_parser.set_defaults(func=index_signatures_command)
+
+    gc_parser = subparsers.add_parser('gc-blobs', help="Delete uploaded CV files no application references")
+    gc_parser.add_argument('--grace-seconds', type=int, default=app.BLOB_GC_GRACE_SECONDS,
+                           help="Keep unreferenced files stored more recently than this")
+    gc_parser.set_defaults(func=gc_blobs_command)
+
+    sketches_parser = subparsers.add_parser('rebuild-sketches', help="Rebuild score percentile sketches")
+    sketches_parser.add_argument('--job-id', type=int, help="Only this job (default: all jobs)")
+    sketches_parser.set_defaults(func=rebuild_sketches_command)
+
+    rescore_parser = subparsers.add_parser('rescore', help="Re-score a job's applications in packed batches")
+    rescore_parser.add_argument('--job-id', type=int, required=True)
+    rescore_parser.add_argument('--unpacked', action='store_true', help="Send one request per CV")
+    rescore_parser.set_defaults(func=rescore_command)
+
+    dedupe_parser = subparsers.add_parser('dedupe-applications',
+                                          help="Remove duplicate applications so the unique index can be added")
+    dedupe_parser.add_argument('--dry-run', action='store_true', help="Only count the duplicates")
+    dedupe_parser.set_defaults(func=dedupe_applications_command)
+
+    args = parser.parse_args(argv)
+    if args.db:
+        app.DB_PATH = args.db
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""Offline evaluation of the scoring modes against human decisions.
+
+Reads a labeled set of (CV, job, human decision) records from CSV or JSONL and scores every
+record with each requested mode, then reports per mode: latency, LLM calls, tokens and
+estimated cost, Spearman rank correlation of the scores with the human labels, and how often
+the review/reject outcome (score >= app.REVIEW_SCORE_THRESHOLD) agrees with the human decision.
+
+Record fields:
+    cv_text or cv_path   CV text, or a .pdf/.txt file relative to the dataset
+    job_id               a job in CV_ANALYZER_DB, or job_title, job_description and job_requirements
+    decision             reviewed/rejected (also accepts yes/no, 1/0, advance/reject)
+    human_score          optional 1-10 rating; used for rank correlation instead of the decision
+
+Modes:
+    standard             extraction plus one analysis call (the default analyze_cv path)
+    standard:<model>     the same with another analysis model
+    cascade              fast tier, escalating borderline scores (CASCADE_* settings)
+    cascade:<fast>+<large> the same with other tiers (either may be local)
+    local                rule-based extraction and scoring, no LLM
+
+LLM responses come from --client: "stub" (canned), "replay" (recorded in --recordings; misses
+fail) or "record" (the Groq API, recording every response to --recordings for later replays).
+
+Examples:
+    python evaluate_scoring.py labeled.jsonl --modes standard,cascade,local --client stub
+    python evaluate_scoring.py labeled.csv --client record --recordings responses.jsonl
+    python evaluate_scoring.py labeled.csv --client replay --recordings responses.jsonl --replay-latency \\
+        --modes standard,standard:llama-3.1-8b-instant,cascade,local --json results.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import app
+from llm_stub import ReplayClient, StubGroqClient
+
+POSITIVE_DECISIONS = {'reviewed', 'review', 'advance', 'advanced', 'accept', 'accepted', 'yes', 'y', '1', 'true'}
+NEGATIVE_DECISIONS = {'rejected', 'reject', 'no', 'n', '0', 'false'}
+
+
+def load_dataset(path):
+    """Read labeled records and resolve their CV text, job and decision."""
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = {}
+    records = []
+    for number, record in enumerate(app.read_import_records(path), start=1):
+        cv_text = record.get('cv_text')
+        if not cv_text and record.get('cv_path'):
+            cv_path = os.path.join(base, record['cv_path'])
+            if cv_path.lower().endswith('.pdf'):
+                with open(cv_path, 'rb') as pdf_file:
+                    cv_text = app.extract_text_from_pdf(pdf_file, cv_path)
+            else:
+                with open(cv_path, encoding='utf-8') as text_file:
+                    cv_text = text_file.read()
+        if not cv_text:
+            sys.exit(f"Record {number}: cv_text or a readable cv_path is required")
+
+        if record.get('job_id'):
+            job_id = int(record['job_id'])
+            if job_id not in jobs:
+                jobs[job_id] = app.get_job_by_id(job_id)
+            job = jobs[job_id]
+            if not job:
+                sys.exit(f"Record {number}: job {job_id} not found in {app.DB_PATH}")
+        else:
+            job = {'id': None, 'title': record.get('job_title', ''), 'description': record.get('job_description', ''),
+                   'requirements': record.get('job_requirements', '')}
+        # No owner, so no budget applies
+        job = dict(job, created_by=None)
+
+        decision = str(record.get('decision', '')).strip().lower()
+        if decision not in POSITIVE_DECISIONS | NEGATIVE_DECISIONS:
+            sys.exit(f"Record {number}: decision must be reviewed or rejected, got {record.get('decision')!r}")
+        human_score = record.get('human_score')
+        records.append({
+            'cv_text': cv_text,
+            'job': job,
+            'reviewed': decision in POSITIVE_DECISIONS,
+            'human_score': float(human_score) if human_score not in (None, '') else None
+        })
+    return records
+
+
+def score_record(mode, record, client):
+    """Score one record with a mode; returns (score, latency_ms, usage_log).
+
+    A failed LLM call or replay miss raises instead of being scored with placeholder results.
+    """
+    name, _, option = mode.partition(':')
+    usage_log = []
+    started = time.perf_counter()
+    if name == 'standard' and option:
+        job = record['job']
+        work_experience = app.extract_work_experience(record['cv_text'], client, usage_log=usage_log, fallback=False)
+        job_requirements = f"{job['description']}\n\nRequirements:\n{job['requirements']}"
+        result = None
+        if work_experience is not None:
+            result = app.analyze_cv(record['cv_text'], job_requirements, work_experience, client,
+                                    usage_log=usage_log, model=option, fallback=False)
+    else:
+        _, result = app.run_analysis_pipeline(record['cv_text'], record['job'], client, usage_log=usage_log,
+                                              scoring_mode=name, fallback=False)
+    if result is None:
+        raise RuntimeError("the LLM call failed or returned an incomplete analysis")
+    return result.get('score', 0), (time.perf_counter() - started) * 1000, usage_log
+
+
+def ranks(values):
+    """Ranks starting at 1, ties sharing their average rank."""
+    order = sorted(range(len(values)), key=lambda index: values[index])
+    result = [0.0] * len(values)
+    start = 0
+    while start < len(order):
+        end = start
+        while end + 1 < len(order) and values[order[end + 1]] == values[order[start]]:
+            end += 1
+        for position in range(start, end + 1):
+            result[order[position]] = (start + end) / 2 + 1
+        start = end + 1
+    return result
+
+
+def spearman(x, y):
+    """Spearman rank correlation (Pearson correlation of the ranks); None if either side is constant."""
+    if len(x) < 2:
+        return None
+    rank_x, rank_y = ranks(x), ranks(y)
+    mean_x, mean_y = statistics.fmean(rank_x), statistics.fmean(rank_y)
+    covariance = sum((a - mean_x) * (b - mean_y) for a, b in zip(rank_x, rank_y))
+    spread = (sum((a - mean_x) ** 2 for a in rank_x) * sum((b - mean_y) ** 2 for b in rank_y)) ** 0.5
+    return covariance / spread if spread else None
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def evaluate_mode(mode, records, client, workers):
+    """Score every record with a mode and summarize latency, cost and agreement."""
+    name, _, option = mode.partition(':')
+    saved_cascade = (app.CASCADE_FAST_MODEL, app.CASCADE_LARGE_MODEL)
+    if name == 'cascade' and option:
+        app.CASCADE_FAST_MODEL, app.CASCADE_LARGE_MODEL = option.split('+', 1)
+
+    def run(record):
+        try:
+            return score_record(mode, record, client)
+        except Exception as e:
+            print(f"{mode}: {str(e)}", file=sys.stderr)
+            return None
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(run, records))
+    finally:
+        app.CASCADE_FAST_MODEL, app.CASCADE_LARGE_MODEL = saved_cascade
+
+    scored = [(record, outcome) for record, outcome in zip(records, outcomes) if outcome]
+    usage = [entry for _, (_, _, usage_log) in scored for entry in usage_log]
+    latencies = [latency for _, (_, latency, _) in scored]
+    scores = [score for _, (score, _, _) in scored]
+    use_human_score = all(record['human_score'] is not None for record, _ in scored)
+    labels = [record['human_score'] if use_human_score else float(record['reviewed']) for record, _ in scored]
+    predicted = [score >= app.REVIEW_SCORE_THRESHOLD for score in scores]
+    actual = [record['reviewed'] for record, _ in scored]
+    correlation = spearman(scores, labels)
+
+    return {
+        'mode': mode,
+        'records': len(records),
+        'errors': len(records) - len(scored),
+        'latency_p50_ms': round(statistics.median(latencies), 1) if latencies else None,
+        'latency_p95_ms': round(percentile(latencies, 95), 1) if latencies else None,
+        'llm_calls': sum(1 for entry in usage if entry['model'] != 'local'),
+        'tokens': sum(entry['prompt_tokens'] + entry['completion_tokens'] for entry in usage),
+        'cost_usd': round(sum(entry['cost_usd'] for entry in usage), 6),
+        'spearman': round(correlation, 3) if correlation is not None else None,
+        'correlated_with': 'human_score' if use_human_score else 'decision',
+        'agreement': round(sum(p == a for p, a in zip(predicted, actual)) / len(scored), 3) if scored else None,
+        'false_rejects': sum(a and not p for p, a in zip(predicted, actual)),
+        'false_reviews': sum(p and not a for p, a in zip(predicted, actual))
+    }
+
+
+def make_client(args):
+    if args.client == 'stub':
+        return StubGroqClient(latency=args.stub_latency, seed=1)
+    if not args.recordings:
+        sys.exit(f"--client {args.client} needs --recordings")
+    if args.client == 'replay':
+        return ReplayClient(args.recordings, simulate_latency=args.replay_latency)
+    return ReplayClient(args.recordings, inner=app.get_groq_client())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare scoring modes against labeled human decisions")
+    parser.add_argument('dataset', help="CSV or JSONL of labeled (CV, job, decision) records")
+    parser.add_argument('--modes', default='standard,cascade,local', help="Comma-separated scoring modes")
+    parser.add_argument('--client', choices=['stub', 'replay', 'record'], default='replay')
+    parser.add_argument('--recordings', help="JSONL of recorded LLM responses (read by replay, appended by record)")
+    parser.add_argument('--replay-latency', action='store_true', help="Sleep for each response's recorded latency")
+    parser.add_argument('--stub-latency', type=float, default=0.0, help="Simulated seconds per stub LLM call")
+    parser.add_argument('--workers', type=int, default=1, help="Records scored concurrently")
+    parser.add_argument('--json', metavar='PATH', help="Also write the results to a JSON file")
+    args = parser.parse_args()
+
+    records = load_dataset(args.dataset)
+    reviewed = sum(record['reviewed'] for record in records)
+    print(f"{len(records)} labeled records ({reviewed} reviewed, {len(records) - reviewed} rejected), "
+          f"review threshold {app.REVIEW_SCORE_THRESHOLD}")
+
+    client = make_client(args)
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    results = [evaluate_mode(mode, records, client, args.workers) for mode in modes]
+
+    print(f"{'mode':<36}{'errors':>7}{'p50 ms':>9}{'p95 ms':>9}{'calls':>7}{'tokens':>9}{'cost $':>10}"
+          f"{'spearman':>10}{'agree':>7}{'FR':>5}{'FV':>5}")
+    for result in results:
+        spearman_text = f"{result['spearman']:.3f}" if result['spearman'] is not None else '-'
+        agreement_text = f"{result['agreement']:.0%}" if result['agreement'] is not None else '-'
+        print(f"{result['mode']:<36}{result['errors']:>7}{result['latency_p50_ms'] or 0:>9.1f}"
+              f"{result['latency_p95_ms'] or 0:>9.1f}{result['llm_calls']:>7}{result['tokens']:>9,}"
+              f"{result['cost_usd']:>10.4f}{spearman_text:>10}{agreement_text:>7}"
+              f"{result['false_rejects']:>5}{result['false_reviews']:>5}")
+    print("FR = human reviewed, mode rejected; FV = human rejected, mode reviewed")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as output:
+            json.dump({'dataset': args.dataset, 'records': len(records), 'results': results}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Offline stand-ins for the Groq client, used by the benchmark, load test and evaluation scripts.
+
+StubGroqClient answers chat completions with canned, schema-valid JSON after an
+optional simulated latency (per request, plus per generated token), and reports token usage like the real client so usage
+logging and cost estimation behave normally. ReplayClient serves responses recorded
+from a real client, recording the ones it does not have yet when given that client.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+
+class StubGroqClient:
+    """Mimics groq.Groq().chat.completions.create without network access."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: int = None, token_latency: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_latency = token_latency
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def respond(self, prompt: str) -> dict:
+        """Return the canned response for a prompt."""
+        if '"work_experience"' in prompt:
+            return {"work_experience": [
+                {"position": "Software Engineer", "company": "Example Corp",
+                 "start_date": "2019-01", "end_date": "Present"}
+            ]}
+        if '"interview_questions"' in prompt or '"feedback"' in prompt:
+            return {candidate_id: {
+                "interview_questions": [f"Stub question {n} for candidate {candidate_id}?" for n in range(1, 6)],
+                "feedback": "Stub feedback."
+            } for candidate_id in re.findall(r'"id": (\d+)', prompt)}
+        if 'Candidate id:' in prompt:
+            return [dict(self.analysis(), id=int(number)) for number in re.findall(r'Candidate id: (\d+)', prompt)]
+        return self.analysis()
+
+    def analysis(self) -> dict:
+        with self.lock:
+            score = self.random.randint(3, 9)
+        return {
+            "score": score,
+            "experience_relevance_score": max(score - 1, 0),
+            "skills_match_score": min(score + 1, 10),
+            "explanation": "Stub analysis.",
+            "key_skills_matched": ["python"],
+            "missing_skills": [],
+            "experience_summary": "Stub experience summary."
+        }
+
+    def create(self, messages, model, temperature=0.2, max_tokens=1000, **kwargs):
+        prompt = messages[0]['content']
+        with self.lock:
+            self.calls += 1
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        content = json.dumps(self.respond(prompt))
+        delay += self.token_latency * (len(content) // 4)
+        if delay:
+            time.sleep(delay)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4)
+        )
+
+
+class ReplayClient:
+    """Serves recorded responses keyed by model and messages; misses go to inner and are recorded."""
+
+    def __init__(self, path: str, inner=None, simulate_latency: bool = False):
+        self.path = path
+        self.inner = inner
+        self.simulate_latency = simulate_latency
+        self.calls = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.responses = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as recordings:
+                for line in recordings:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.responses[record['key']] = record
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    @staticmethod
+    def key(messages, model, temperature, max_tokens) -> str:
+        payload = json.dumps([model, temperature, max_tokens, messages], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def create(self, messages, model, temperature=0.2, max_tokens=1000, **kwargs):
+        key = self.key(messages, model, temperature, max_tokens)
+        with self.lock:
+            self.calls += 1
+            record = self.responses.get(key)
+        if record is None:
+            if self.inner is None:
+                raise KeyError(f"No recorded response for {model} prompt {key[:12]}")
+            started = time.perf_counter()
+            response = self.inner.chat.completions.create(messages=messages, model=model, temperature=temperature,
+                                                          max_tokens=max_tokens, **kwargs)
+            usage = getattr(response, 'usage', None)
+            record = {
+                'key': key,
+                'model': model,
+                'content': response.choices[0].message.content,
+                'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+                'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+                'latency_ms': (time.perf_counter() - started) * 1000
+            }
+            with self.lock:
+                self.misses += 1
+                self.responses[key] = record
+                with open(self.path, 'a', encoding='utf-8') as recordings:
+                    recordings.write(json.dumps(record) + "\n")
+            return response
+        if self.simulate_latency:
+            time.sleep(record['latency_ms'] / 1000)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=record['content']))],
+            usage=SimpleNamespace(prompt_tokens=record['prompt_tokens'], completion_tokens=record['completion_tokens'])
+        )
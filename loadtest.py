@@ -0,0 +1,320 @@
+"""Concurrent-session load test for the SQLite write path.
+
+Simulates candidate and HR sessions as threads calling the real data functions in app.py
+against a temporary database, with the LLM replaced by llm_stub.StubGroqClient. Candidates
+browse jobs and submit applications, deliberately colliding on the same (job, candidate)
+pairs; HR users page through applications, build shortlists and update statuses.
+
+Reports p50/p95/p99 latency per operation, the rate of "database is locked" errors, and
+integrity violations found afterwards (duplicate or lost applications, orphaned rows,
+SQLite integrity_check). --sweep runs several concurrency levels on fresh databases to show
+where lock errors start; --json writes the results for regression tracking.
+
+Examples:
+    python loadtest.py
+    python loadtest.py --candidates 32 --hr 4 --duration 30
+    python loadtest.py --sweep 1,4,16,64 --json loadtest_results.json
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import app as cv_analyzer
+from llm_stub import StubGroqClient
+
+CV_TEXT = """Jane Doe
+Senior Software Engineer
+Example Corp, London
+Jan 2019 - Present
+- Built data services in Python, SQL and REST APIs
+Software Engineer
+Another Ltd
+Mar 2015 - Dec 2018
+- Backend development with Python and PostgreSQL
+"""
+
+
+class Recorder:
+    """Thread-safe collection of per-operation latencies and errors."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock_errors = defaultdict(int)
+        self.accepted = defaultdict(int)  # (job_id, candidate_id) -> times process_application returned True
+        self.duplicate_rejections = 0
+        self.local = threading.local()
+
+    def call(self, name, fn, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            with self.lock:
+                if 'locked' in str(e) or 'busy' in str(e):
+                    self.lock_errors[name] += 1
+                else:
+                    self.errors[name] += 1
+        except Exception:
+            with self.lock:
+                self.errors[name] += 1
+        finally:
+            with self.lock:
+                self.latencies[name].append(time.perf_counter() - started)
+        return None
+
+    def swallowed_error(self, message):
+        """Errors that submit_application reports through st.error instead of raising."""
+        self.local.failed = True
+        with self.lock:
+            if 'locked' in message or 'busy' in message:
+                self.lock_errors['process_application'] += 1
+            else:
+                self.errors['process_application'] += 1
+
+
+def seed_database(hr_users: int, jobs_per_hr: int, candidates: int):
+    """Create HR users with jobs and a pool of candidate accounts; returns (hr_ids, candidate_ids)."""
+    cv_analyzer.init_database()
+    for i in range(hr_users):
+        cv_analyzer.create_user(f"load_hr_{i}", f"load_hr_{i}@example.com", 'password', f"Load HR {i}", 'hr')
+    conn = sqlite3.connect(cv_analyzer.DB_PATH)
+    hr_ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE role = 'hr' ORDER BY id")]
+    conn.close()
+    for hr_id in hr_ids:
+        for j in range(jobs_per_hr):
+            cv_analyzer.create_job(f"Python Developer {hr_id}-{j}", "Build data services in Python.",
+                                   "Python, SQL, REST APIs, 3+ years experience", "Engineering", "Remote", "",
+                                   hr_id)
+    for i in range(candidates):
+        cv_analyzer.create_user(f"load_candidate_{i}", f"load_candidate_{i}@example.com", 'password',
+                                f"Candidate {i}")
+    conn = sqlite3.connect(cv_analyzer.DB_PATH)
+    candidate_ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE role = 'candidate'")]
+    conn.close()
+    return hr_ids, candidate_ids
+
+
+def candidate_session(recorder, deadline, candidate_ids, client, seed, think):
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        # A small shared pool means sessions regularly race on the same (job, candidate) pair
+        candidate_id = rng.choice(candidate_ids)
+        jobs = recorder.call('get_all_jobs', cv_analyzer.get_all_jobs) or []
+        if not jobs:
+            continue
+        job = recorder.call('get_job_by_id', cv_analyzer.get_job_by_id, rng.choice(jobs)['id'])
+        if not job:
+            continue
+        if rng.random() < 0.2:
+            recorder.call('recommend_jobs', cv_analyzer.recommend_jobs, candidate_id, 5)
+
+        recorder.local.failed = False
+        result = recorder.call('process_application', cv_analyzer.process_application, job, candidate_id, CV_TEXT,
+                               {'full_name': f"Candidate {candidate_id}", 'email': "candidate@example.com"},
+                               client)
+        if result:
+            with recorder.lock:
+                if result[0]:
+                    recorder.accepted[(job['id'], candidate_id)] += 1
+                elif not recorder.local.failed:
+                    recorder.duplicate_rejections += 1
+
+        recorder.call('get_user_applications', cv_analyzer.get_user_applications, candidate_id)
+        if think:
+            time.sleep(rng.uniform(0, think))
+
+
+def hr_session(recorder, deadline, hr_id, seed, think):
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        page = recorder.call('get_applications_page', cv_analyzer.get_applications_page, hr_id,
+                             sort_by=rng.choice(list(cv_analyzer.APPLICATION_SORT_COLUMNS)), limit=50)
+        rows = page[0] if page else []
+        if rows:
+            recorder.call('get_application_detail', cv_analyzer.get_application_detail, hr_id,
+                          rng.choice(rows)['id'])
+            selected = [row['id'] for row in rng.sample(rows, min(len(rows), 5))]
+            recorder.call('update_applications_status', cv_analyzer.update_applications_status, hr_id,
+                          selected, rng.choice(['reviewed', 'rejected', 'pending']))
+        recorder.call('get_shortlist', cv_analyzer.get_shortlist, hr_id, k=20,
+                      weights={'match': 1.0, 'skills': 0.5})
+        recorder.call('get_job_application_stats', cv_analyzer.get_job_application_stats, hr_id)
+        if rng.random() < 0.05:
+            recorder.call('create_job', cv_analyzer.create_job, f"Data Engineer {rng.randint(0, 10**6)}",
+                          "Pipelines in Python.", "Python, SQL, Airflow", "Data", "Remote", "", hr_id)
+        if think:
+            time.sleep(rng.uniform(0, think))
+
+
+def check_integrity(recorder):
+    """Return a list of integrity violations found in the database after the run."""
+    conn = sqlite3.connect(cv_analyzer.DB_PATH)
+    violations = []
+
+    duplicates = conn.execute('''
+        SELECT COUNT(*) FROM (SELECT 1 FROM applications GROUP BY job_id, candidate_id HAVING COUNT(*) > 1)
+    ''').fetchone()[0]
+    if duplicates:
+        violations.append(f"{duplicates} (job, candidate) pairs with more than one application")
+
+    accepted_twice = sum(1 for count in recorder.accepted.values() if count > 1)
+    if accepted_twice:
+        violations.append(f"{accepted_twice} (job, candidate) pairs accepted more than once")
+
+    stored = set(conn.execute('SELECT job_id, candidate_id FROM applications').fetchall())
+    lost = [pair for pair in recorder.accepted if pair not in stored]
+    if lost:
+        violations.append(f"{len(lost)} accepted applications missing from the database")
+
+    orphans = conn.execute('''
+        SELECT COUNT(*) FROM applications a
+        LEFT JOIN jobs j ON a.job_id = j.id
+        LEFT JOIN users u ON a.candidate_id = u.id
+        WHERE j.id IS NULL OR u.id IS NULL
+    ''').fetchone()[0]
+    if orphans:
+        violations.append(f"{orphans} applications without a job or candidate")
+
+    orphan_usage = conn.execute('''
+        SELECT COUNT(*) FROM llm_usage
+        WHERE application_id IS NOT NULL AND application_id NOT IN (SELECT id FROM applications)
+    ''').fetchone()[0]
+    if orphan_usage:
+        violations.append(f"{orphan_usage} llm_usage rows pointing at missing applications")
+
+    bad_status = conn.execute('''
+        SELECT COUNT(*) FROM applications WHERE status NOT IN ('reviewed', 'rejected', 'pending')
+    ''').fetchone()[0]
+    if bad_status:
+        violations.append(f"{bad_status} applications with an invalid status")
+
+    integrity = conn.execute('PRAGMA integrity_check').fetchone()[0]
+    if integrity != 'ok':
+        violations.append(f"integrity_check: {integrity}")
+    conn.close()
+    return violations
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(candidates, hr_users, duration, llm_latency, candidate_pool, think, seed):
+    """Run one load test on a fresh database and return its results."""
+    workdir = tempfile.mkdtemp(prefix="cv_analyzer_load_")
+    cv_analyzer.DB_PATH = os.path.join(workdir, "load.db")
+    hr_ids, candidate_ids = seed_database(max(hr_users, 1), 5, candidate_pool)
+
+    recorder = Recorder()
+    cv_analyzer.st.error = recorder.swallowed_error
+    client = StubGroqClient(latency=llm_latency, seed=seed)
+
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=candidate_session,
+                                args=(recorder, deadline, candidate_ids, client, seed + i, think))
+               for i in range(candidates)]
+    threads += [threading.Thread(target=hr_session, args=(recorder, deadline, hr_ids[i % len(hr_ids)],
+                                                         seed + candidates + i, think))
+                for i in range(hr_users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    operations = {}
+    for name, latencies in sorted(recorder.latencies.items()):
+        operations[name] = {
+            'count': len(latencies),
+            'p50_ms': statistics.median(latencies) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'errors': recorder.errors.get(name, 0),
+            'lock_errors': recorder.lock_errors.get(name, 0)
+        }
+    calls = sum(op['count'] for op in operations.values())
+    lock_errors = sum(recorder.lock_errors.values())
+    return {
+        'candidates': candidates,
+        'hr': hr_users,
+        'seconds': elapsed,
+        'calls': calls,
+        'calls_per_second': calls / elapsed,
+        'applications_accepted': sum(recorder.accepted.values()),
+        'duplicates_rejected': recorder.duplicate_rejections,
+        'lock_errors': lock_errors,
+        'lock_error_rate': lock_errors / calls if calls else 0,
+        'errors': sum(recorder.errors.values()),
+        'operations': operations,
+        'integrity_violations': check_integrity(recorder)
+    }
+
+
+def report(result):
+    print(f"\n{result['candidates']} candidate + {result['hr']} HR sessions, {result['seconds']:.1f}s: "
+          f"{result['calls']:,} calls ({result['calls_per_second']:,.0f}/s), "
+          f"{result['applications_accepted']:,} applications, {result['duplicates_rejected']:,} duplicates rejected")
+    print(f"{'operation':<28}{'count':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'locked':>8}{'errors':>8}")
+    for name, op in result['operations'].items():
+        print(f"{name:<28}{op['count']:>8,}{op['p50_ms']:>9.1f}{op['p95_ms']:>9.1f}{op['p99_ms']:>9.1f}"
+              f"{op['lock_errors']:>8}{op['errors']:>8}")
+    print(f"Lock errors: {result['lock_errors']:,} ({result['lock_error_rate']:.2%} of calls), "
+          f"other errors: {result['errors']:,}")
+    if result['integrity_violations']:
+        for violation in result['integrity_violations']:
+            print(f"INTEGRITY VIOLATION: {violation}")
+    else:
+        print("Integrity: no violations")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for the CV Analyzer database")
+    parser.add_argument('--candidates', type=int, default=16, help="Concurrent candidate sessions")
+    parser.add_argument('--hr', type=int, default=2, help="Concurrent HR sessions")
+    parser.add_argument('--sweep', help="Comma-separated candidate session counts to run one after another")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds per run")
+    parser.add_argument('--llm-latency', type=float, default=0.02, help="Simulated seconds per LLM call")
+    parser.add_argument('--candidate-pool', type=int, default=200,
+                        help="Candidate accounts shared by all sessions (smaller means more collisions)")
+    parser.add_argument('--think', type=float, default=0, help="Maximum random pause between session steps")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.sweep.split(',')] if args.sweep else [args.candidates]
+    results = []
+    for candidates in levels:
+        result = run(candidates, args.hr, args.duration, args.llm_latency, args.candidate_pool, args.think,
+                     args.seed)
+        report(result)
+        results.append(result)
+
+    if len(results) > 1:
+        print(f"\n{'sessions':>8}{'calls/s':>10}{'submit p95 ms':>15}{'lock rate':>11}{'violations':>12}")
+        for result in results:
+            submit = result['operations'].get('process_application', {})
+            print(f"{result['candidates'] + result['hr']:>8}{result['calls_per_second']:>10,.0f}"
+                  f"{submit.get('p95_ms', 0):>15.1f}{result['lock_error_rate']:>11.2%}"
+                  f"{len(result['integrity_violations']):>12}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if any(result['integrity_violations'] for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
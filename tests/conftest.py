@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A fresh database for the test, in place of cv_analyzer.db."""
+    monkeypatch.setattr(app, 'DB_PATH', str(tmp_path / 'test.db'))
+    app.init_database()
+    return app.DB_PATH
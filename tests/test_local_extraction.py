@@ -0,0 +1,81 @@
+import datetime
+
+import pytest
+
+import app
+from app import DATE_RANGE_REGEX, extract_work_experience_local
+
+
+@pytest.mark.parametrize('text, start, end', [
+    ("Jan 2020 - Present", "Jan 2020", "Present"),
+    ("March 2018 to June 2021", "March 2018", "June 2021"),
+    ("2019-03 – 2021-11", "2019-03", "2021-11"),
+    ("03/2017 until 12/2019", "03/2017", "12/2019"),
+    ("2015 - 2018", "2015", "2018"),
+    ("Sept. 2021 — current", "Sept. 2021", "current"),
+    ("Oct 2022 to date", "Oct 2022", "date"),
+    ("Oct 2022 - to date", "Oct 2022", "to date"),
+])
+def test_date_range_regex_matches(text, start, end):
+    match = DATE_RANGE_REGEX.search(text)
+    assert (match.group('start'), match.group('end')) == (start, end)
+
+
+@pytest.mark.parametrize('text', [
+    "Call 555-1234 today",
+    "Jan 2020 - date",        # a bare "date" is not an open end
+    "Python 3 - 4 years",
+])
+def test_date_range_regex_ignores_non_ranges(text):
+    assert DATE_RANGE_REGEX.search(text) is None
+
+
+def test_extracts_title_company_and_dates():
+    result = extract_work_experience_local(
+        "Software Engineer, Acme Corp  Jan 2020 - Present\n"
+        "Data Analyst at Globex Inc. March 2017 to Dec 2019\n"
+    )
+    assert result['work_experience'] == [
+        {"position": "Software Engineer", "company": "Acme Corp", "start_date": "2020-01", "end_date": "Present"},
+        {"position": "Data Analyst", "company": "Globex Inc.", "start_date": "2017-03", "end_date": "2019-12"},
+    ]
+    assert result['confidence'] >= app.LOCAL_EXTRACTION_MIN_CONFIDENCE
+    assert result['source'] == 'local'
+
+
+def test_open_ended_to_date():
+    result = extract_work_experience_local("Software Engineer, Acme Corp Mar 2021 to date")
+    assert result['work_experience'][0]['end_date'] == "Present"
+
+
+def test_date_of_birth_is_not_a_job():
+    result = extract_work_experience_local(
+        "Date of birth: Mar 1990 to date\n"
+        "Software Engineer, Acme Corp Jan 2020 - Present\n"
+    )
+    assert [entry['position'] for entry in result['work_experience']] == ["Software Engineer"]
+
+
+def test_non_job_ranges_stay_below_the_confidence_gate():
+    result = extract_work_experience_local("Member since: Mar 1990 - Present")
+    assert result['confidence'] < app.LOCAL_EXTRACTION_MIN_CONFIDENCE
+
+
+def test_weak_entry_lowers_confidence():
+    result = extract_work_experience_local(
+        "Software Engineer, Acme Corp Jan 2020 - Present\n"
+        "Barista, Blue Bottle 2018 - 2019\n"
+    )
+    assert len(result['work_experience']) == 2
+    assert result['confidence'] < app.LOCAL_EXTRACTION_MIN_CONFIDENCE
+
+
+def test_education_and_invalid_ranges_are_skipped():
+    next_year = datetime.date.today().year + 1
+    result = extract_work_experience_local(
+        "BSc Computer Science, State University 2012 - 2016\n"
+        "Engineer, Acme Corp 2019 - 2017\n"
+        f"Engineer, Acme Corp 1900 - {next_year}\n"
+    )
+    assert result == {"work_experience": [], "confidence": 0.0, "source": "local"}
+
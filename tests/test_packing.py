@@ -0,0 +1,80 @@
+import app
+from llm_stub import StubGroqClient
+
+JOB_DESCRIPTION = "Build data services.\n\nRequirements:\nPython, SQL"
+WORK_EXPERIENCE = {"work_experience": [
+    {"position": "Engineer", "company": "Acme", "start_date": "2020-01", "end_date": "Present"}
+]}
+
+
+class FixedClient(StubGroqClient):
+    """Answers every request with the same response."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+    def respond(self, prompt):
+        return self.response
+
+
+def analysis(**fields):
+    return dict({
+        "score": 7, "experience_relevance_score": 6, "skills_match_score": 8,
+        "explanation": "Good match.", "key_skills_matched": ["python"], "missing_skills": [],
+        "experience_summary": "Five years of Python."
+    }, **fields)
+
+
+def items(count):
+    return [{'key': f"cv{i}", 'cv_text': f"CV {i}", 'work_experience': WORK_EXPERIENCE} for i in range(count)]
+
+
+def test_plan_packs_keeps_order_and_budget():
+    cv_tokens = [1000, 2000, 1500, 500, 3000, 100]
+    packs = app.plan_packs(cv_tokens, 200)
+
+    assert [index for pack in packs for index in pack] == list(range(len(cv_tokens)))
+    for pack in packs:
+        used = 200 + app.PACK_OVERHEAD_TOKENS + sum(cv_tokens[i] + app.PACK_CV_OVERHEAD_TOKENS for i in pack)
+        assert len(pack) == 1 or used <= app.PACK_PROMPT_TOKENS
+
+
+def test_plan_packs_limits_pack_size():
+    packs = app.plan_packs([1] * (app.PACK_MAX_SIZE * 2 + 1), 0)
+    assert [len(pack) for pack in packs] == [app.PACK_MAX_SIZE, app.PACK_MAX_SIZE, 1]
+
+
+def test_plan_packs_gives_an_oversized_cv_its_own_pack():
+    assert app.plan_packs([app.PACK_PROMPT_TOKENS * 2, 10], 0) == [[0], [1]]
+
+
+def test_analyze_cv_pack_maps_ids_to_keys():
+    client = FixedClient([analysis(id=2, score=9), analysis(id=1, score=4)])
+    results = app.analyze_cv_pack(items(2), JOB_DESCRIPTION, client)
+    assert {key: result['score'] for key, result in results.items()} == {'cv0': 4, 'cv1': 9}
+
+
+def test_analyze_cv_pack_drops_invalid_entries():
+    client = FixedClient([
+        analysis(id=1),
+        analysis(id=2, score=15),                       # out of range
+        {k: v for k, v in analysis(id=3).items() if k != 'missing_skills'},
+        analysis(id=7),                                 # no such candidate
+        analysis(id="four"),
+        "not an object"
+    ])
+    results = app.analyze_cv_pack(items(4), JOB_DESCRIPTION, client)
+    assert list(results) == ['cv0']
+
+
+def test_analyze_cv_pack_returns_nothing_for_unparseable_output():
+    assert app.analyze_cv_pack(items(2), JOB_DESCRIPTION, FixedClient("no json here")) == {}
+
+
+def test_batch_reports_items_that_cannot_be_scored():
+    # Every answer is invalid, so packed items are retried alone and then reported as failed
+    client = FixedClient([analysis(id=1, score=0)])
+    results, failed = app.analyze_cvs_batch(items(3), JOB_DESCRIPTION, client)
+    assert results == {}
+    assert sorted(failed) == ['cv0', 'cv1', 'cv2']
@@ -0,0 +1,73 @@
+import random
+
+import app
+from app import KLLSketch
+
+
+def exact_rank(values, value):
+    below = sum(1 for v in values if v < value)
+    equal = sum(1 for v in values if v == value)
+    return (below + equal / 2) / len(values)
+
+
+def test_rank_error_is_small():
+    random.seed(7)
+    values = [random.uniform(0, 10) for _ in range(20000)]
+    sketch = KLLSketch(k=200)
+    for value in values:
+        sketch.update(value)
+
+    assert sum(len(items) for items in sketch.levels) < 1000
+    for probe in (1, 2.5, 5, 7.5, 9):
+        assert abs(sketch.rank(probe) - exact_rank(values, probe)) < 0.03
+    assert abs(sketch.quantile(0.5) - 5) < 0.3
+
+
+def test_merge_matches_one_sketch_over_all_values():
+    random.seed(11)
+    left_values = [random.uniform(0, 5) for _ in range(5000)]
+    right_values = [random.uniform(5, 10) for _ in range(5000)]
+    left, right = KLLSketch(), KLLSketch()
+    for value in left_values:
+        left.update(value)
+    for value in right_values:
+        right.update(value)
+
+    left.merge(right)
+
+    assert left.n == 10000
+    assert sum((1 << level) * len(items) for level, items in enumerate(left.levels)) == left.n
+    assert abs(left.rank(5) - 0.5) < 0.03
+
+
+def test_json_round_trip():
+    sketch = KLLSketch(k=50)
+    for value in range(1000):
+        sketch.update(value % 10)
+
+    restored = KLLSketch.from_json(sketch.to_json())
+
+    assert (restored.k, restored.n, restored.levels) == (sketch.k, sketch.n, sketch.levels)
+    assert restored.rank(5) == sketch.rank(5)
+    restored.update(3)
+    assert restored.n == sketch.n + 1
+
+
+def test_empty_sketch():
+    sketch = KLLSketch()
+    assert sketch.rank(5) == 0.0
+    assert sketch.quantile(0.5) is None
+
+
+def test_unscored_applications_are_left_out(database):
+    app.create_user('hr', 'hr@example.com', 'pw', 'HR', 'hr')
+    app.create_job('Engineer', 'Build things', 'Python', 'Eng', 'Remote', '', 1)
+    records = [{'job_id': 1, 'candidate_email': f'c{i}@example.com', 'cv_text': 'cv',
+                'match_score': 6 if i < 2 else ''} for i in range(5)]
+    app.bulk_import('applications', records)
+
+    distribution = app.get_score_distribution(1)
+
+    assert distribution['overall']['count'] == 2
+    assert distribution['overall'][0.5] == 6
+    assert 'skills' not in distribution